@@ -1,34 +1,41 @@
 from __future__ import annotations
-import json
-from pathlib import Path
-from typing import List, Dict, Any
+from typing import Callable, List, Dict, Any
+from agentic_playlist.agents.policy import SECURITY_DIR, Policy, policy_store
+from agentic_playlist.tracing.metrics import STAGE_SECONDS
 
-SECURITY_DIR = Path(__file__).resolve().parent.parent / 'security'
+def policy_version() -> str:
+    """Content hash of the live policy files; changes when an edit is picked up."""
+    return policy_store.current().version
 
 class Compliance:
-    def __init__(self, max_calls: int, tracer):
+    def __init__(self, max_calls: int, tracer, policy: Policy | None = None):
         self.max_calls = max_calls
         self.calls = 0
         self.tracer = tracer
-        with open(SECURITY_DIR / 'denylist.json', 'r', encoding='utf-8') as f:
-            self.deny = set(json.load(f).get('explicit_artists', []))
-        with open(SECURITY_DIR / 'allowlist.json', 'r', encoding='utf-8') as f:
-            self.allow = set(json.load(f).get('allowed_regions', ['US']))
+        # compiled once per process and hot-swapped on edit; a run keeps the one it started with
+        self.policy = policy if policy is not None else policy_store.current()
 
     def enforce(self, tracks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         if self.calls >= self.max_calls:
             self.tracer.span(agent='compliance', tool='policy.enforce', status='budget_exceeded')
             return tracks
-        out = []
-        for t in tracks:
-            artist = t.get('artist', '')
-            if artist in self.deny:
-                self.tracer.span(agent='compliance', tool='policy.block', details={'artist': artist}, status='deny')
-                continue
-            region = t.get('region', 'US')
-            if region not in self.allow:
-                self.tracer.span(agent='compliance', tool='policy.region_block', details={'region': region}, status='deny')
-                continue
-            out.append(t)
+        with STAGE_SECONDS.time("compliance"):
+            out = [t for t in tracks if self._allowed(t)]
         self.calls += 1
         return out
+
+    def checker(self) -> Callable[[Dict[str, Any]], bool]:
+        """One `enforce` call as a per-track predicate, for streaming candidates in order."""
+        if self.calls >= self.max_calls:
+            self.tracer.span(agent='compliance', tool='policy.enforce', status='budget_exceeded')
+            return lambda t: True
+        self.calls += 1
+        return self._allowed
+
+    def _allowed(self, t: Dict[str, Any]) -> bool:
+        verdict = self.policy.check(t)
+        if verdict is None:
+            return True
+        tool, details = verdict
+        self.tracer.span(agent='compliance', tool=tool, details=details, status='deny')
+        return False
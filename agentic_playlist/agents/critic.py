@@ -1,6 +1,8 @@
 from __future__ import annotations
-from typing import List, Dict, Any
-from agentic_playlist.tools.filters import dedupe_by_artist, ensure_diversity
+from typing import Callable, List, Dict, Any
+from agentic_playlist.tools.columnar import COLUMNAR_MIN, TrackColumns, review_rows
+from agentic_playlist.tools.filters import artist_deduper, dedupe_by_artist, diversity_guard, ensure_diversity
+from agentic_playlist.tracing.metrics import STAGE_SECONDS
 
 class Critic:
     def __init__(self, max_calls: int, tracer):
@@ -12,7 +14,20 @@ class Critic:
         if self.calls >= self.max_calls:
             self.tracer.span(agent='critic', tool='filters.review', status='budget_exceeded')
             return candidates
-        step1 = dedupe_by_artist(candidates, tracer=self.tracer)
-        step2 = ensure_diversity(step1, tracer=self.tracer)
         self.calls += 1
-        return step2
+        with STAGE_SECONDS.time("critic"):
+            if len(candidates) >= COLUMNAR_MIN:
+                # same rows, one aggregated span per filter instead of one per drop
+                cols = TrackColumns.from_tracks(candidates)
+                return [candidates[i] for i in review_rows(cols, tracer=self.tracer)]
+            step1 = dedupe_by_artist(candidates, tracer=self.tracer)
+            return ensure_diversity(step1, tracer=self.tracer)
+
+    def reviewer(self) -> Callable[[Dict[str, Any]], bool]:
+        """One `review` call as a per-track predicate, for streaming candidates in order."""
+        if self.calls >= self.max_calls:
+            self.tracer.span(agent='critic', tool='filters.review', status='budget_exceeded')
+            return lambda t: True
+        dedupe, diversity = artist_deduper(self.tracer), diversity_guard(self.tracer)
+        self.calls += 1
+        return lambda t: dedupe(t) and diversity(t)
@@ -1,10 +1,17 @@
 from __future__ import annotations
-import random
+import math, random
 from dataclasses import dataclass
-from typing import Dict, Any, List
+from itertools import islice
+from typing import AsyncIterator, Dict, Any, List, Tuple
+import numpy as np
+from agentic_playlist.config import RERANK_DEFAULTS
+from agentic_playlist.tracing.metrics import STAGE_SECONDS, StageClock
 from agentic_playlist.tracing.tracer import Tracer
 from agentic_playlist.agents.critic import Critic
 from agentic_playlist.agents.compliance import Compliance
+from agentic_playlist.agents.reranker import Reranker
+
+MAX_CANDIDATES = 30  # catalog candidates a run reads at most
 
 @dataclass
 class Orchestrator:
@@ -13,23 +20,127 @@ class Orchestrator:
     catalog: Any  # injected
 
     async def arun(self) -> Dict[str, Any]:
+        """One run through the streaming pipeline (see `astream`), collected."""
+        summary = None
+        async for event, data in self.astream():
+            if event == "summary":
+                summary = data
+        return summary
+
+    async def arun_batch(self) -> Dict[str, Any]:
+        """The same run with every stage materialized: fetch all candidates,
+        review the whole list, then select. The reference `astream` must match."""
+        seed, rng, critic, reranker, compliance = self._stages()
+        k, pool_size = self._sizes(reranker)
+
+        candidates = await self.catalog.acurate(n=MAX_CANDIDATES, seed=seed, rng=rng)
+        reviewed = critic.review(candidates)
+        # compliance before the pool is cut, so a blocked track leaves room for the next survivor
+        pool = list(islice(filter(compliance.checker(), reviewed), pool_size if reranker.enabled else k))
+        final = self._select(pool, reranker, k)
+        return {"playlist": final, "metrics": self._metrics(final, reranker), "seed": seed}
+
+    async def astream(self) -> AsyncIterator[Tuple[str, Any]]:
+        """The run as a pipeline: yields ("track", t) as soon as t is accepted,
+        then ("summary", {"playlist", "metrics", "seed"}).
+
+        Candidates go through the critic one at a time and the catalog stops
+        fetching once the run has what it needs: `playlist_size` accepted
+        tracks, or with re-ranking on, a pool of `rerank.pool * playlist_size`
+        tracks that passed both filters (MMR needs the whole pool before its
+        first pick).
+        The catalog is asked for that many up front and fetches more only
+        while the filters keep dropping candidates."""
+        seed, rng, critic, reranker, compliance = self._stages()
+        k, pool_size = self._sizes(reranker)
+        # per-track stages: their time over the run is observed once, at the end
+        review = StageClock(critic.reviewer())
+        allowed = StageClock(compliance.checker())
+        source = self.catalog.astream(n=MAX_CANDIDATES, seed=seed, rng=rng,
+                                      target=pool_size if reranker.enabled else k)
+        read = 0
+
+        final: List[Dict[str, Any]] = []
+        try:
+            if reranker.enabled:
+                pool: List[Dict[str, Any]] = []
+                async for t in source:
+                    read += 1
+                    # the critic only looks at earlier tracks, so per-track == whole-list
+                    if review(t) and allowed(t):
+                        pool.append(t)
+                        if len(pool) >= pool_size:
+                            break
+                final = self._select(pool, reranker, k)
+                for t in final:
+                    yield "track", t
+            else:
+                reviewed = 0
+                async for t in source:
+                    read += 1
+                    if not review(t):
+                        continue
+                    reviewed += 1
+                    if allowed(t):
+                        final.append(t)
+                        yield "track", t
+                        if len(final) >= k:
+                            break
+                reranker.stats = {"pool": reviewed, "picks": reviewed}
+        finally:
+            await source.aclose()  # cancels pages still in flight
+            STAGE_SECONDS.observe(review.seconds, "critic")
+            STAGE_SECONDS.observe(allowed.seconds, "compliance")
+        metrics = self._metrics(final, reranker)
+        metrics["candidates"] = read
+        plan = getattr(self.catalog, "plan", None)
+        if plan is not None:
+            metrics["search"] = plan.metrics
+        yield "summary", {"playlist": final, "metrics": metrics, "seed": seed}
+
+    def _sizes(self, reranker: Reranker) -> Tuple[int, int]:
+        k = int(self.cfg.get("playlist_size", 10))
+        return k, max(k, math.ceil(reranker.pool * k))
+
+    @staticmethod
+    def _select(pool: List[Dict[str, Any]], reranker: Reranker, k: int) -> List[Dict[str, Any]]:
+        ranked = reranker.rank(pool)
+        try:
+            return list(islice(ranked, k))
+        finally:
+            ranked.close()
+
+    def _stages(self) -> Tuple[int, random.Random, Critic, Reranker, Compliance]:
+        # one RNG per run for the catalog, the only stage with random choices to
+        # make: never the global `random` state, which concurrent requests would
+        # share and reseed under each other. The other stages are deterministic.
         seed = int(self.cfg.get("seed", 42))
-        random.seed(seed)
+        rng = random.Random(seed)
         budgets = self.cfg.get("budgets", {})
         critic = Critic(max_calls=budgets.get("critic_max_calls", 3), tracer=self.tracer)
+        rerank = {**RERANK_DEFAULTS, **(self.cfg.get("rerank") or {})}
+        reranker = Reranker(lam=float(rerank["lambda"]), tracer=self.tracer, pool=float(rerank["pool"]))
         compliance = Compliance(max_calls=budgets.get("compliance_max_calls", 3), tracer=self.tracer)
+        return seed, rng, critic, reranker, compliance
 
-        candidates = await self.catalog.acurate(n=30, seed=seed)
-        reviewed = critic.review(candidates)
-        compliant = compliance.enforce(reviewed)
-        k = int(self.cfg.get("playlist_size", 10))
-        final = compliant[:k]
-        metrics = {
+    def _metrics(self, final: List[Dict[str, Any]], reranker: Reranker) -> Dict[str, Any]:
+        return {
             "dup_rate": self._dup_rate(final),
             "unique_artists": len({t["artist"] for t in final}),
             "size": len(final),
+            "similarity": self._similarity(final, reranker),
+            "rerank": {"lambda": reranker.lam, **reranker.stats},
         }
-        return {"playlist": final, "metrics": metrics, "seed": seed}
+
+    @staticmethod
+    def _similarity(tracks: List[Dict[str, Any]], reranker: Reranker) -> float:
+        """Mean pairwise cosine similarity of the playlist's feature vectors (lower = more varied)."""
+        n = len(tracks)
+        if n < 2:
+            return 0.0
+        x = reranker.store.matrix(tracks)
+        gram = x @ x.T
+        return round(float((gram.sum() - np.trace(gram)) / (n * (n - 1))), 4)
 
     @staticmethod
     def _dup_rate(tracks: List[Dict[str, Any]]) -> float:
@@ -0,0 +1,184 @@
+"""Compiled compliance policy, loaded once and swapped when its files change.
+
+`Policy` is immutable: a normalized per-artist deny index plus the allowed
+regions. `PolicyStore.current()` hands out the live one; at most once per
+`check_every_s` it stats the policy files and, if they changed, builds the
+replacement off-thread and swaps the reference (readers never see a
+half-loaded policy, and a broken edit keeps the old one in force).
+
+Small denylists are a frozenset of normalized names. Past
+`HASHED_THRESHOLD` entries the names are dropped and only 64-bit hashes are
+kept, in one open-addressing table (`HashIndex`): still O(1) per artist, at
+16 bytes per entry instead of a str object plus a set slot.
+"""
+from __future__ import annotations
+import hashlib, json, os, threading, time, unicodedata
+from array import array
+from pathlib import Path
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+SECURITY_DIR = Path(__file__).resolve().parent.parent / 'security'
+POLICY_FILES = ('denylist.json', 'allowlist.json')
+HASHED_THRESHOLD = int(os.getenv('POLICY_HASHED_THRESHOLD', '100000'))
+
+_MASK64 = (1 << 64) - 1
+
+
+def normalize_artist(name: str) -> str:
+    """Canonical artist key: NFKC, case-folded, whitespace collapsed."""
+    name = name or ''
+    if not name.isascii():
+        name = unicodedata.normalize('NFKC', name)
+    return ' '.join(name.casefold().split())
+
+
+class HashIndex:
+    """Set of strings stored as 64-bit hashes in a linear-probing `array('Q')`.
+
+    Kept at most half full, so a probe touches ~1.5 slots. Hashes are the
+    process's own `hash(str)`, which is fine because the table is rebuilt
+    in every process; 0 marks an empty slot. A false positive needs a full
+    64-bit collision.
+    """
+
+    def __init__(self, keys: Iterable[str], capacity: int):
+        size = 8
+        while size < 2 * capacity:  # capacity: upper bound on len(keys)
+            size <<= 1
+        self._mask = size - 1
+        self._table = array('Q', bytes(8 * size))
+        self._n = 0
+        for k in keys:
+            self._insert(k)
+
+    @staticmethod
+    def _h(key: str) -> int:
+        return (hash(key) & _MASK64) or 1
+
+    def _insert(self, key: str) -> None:
+        h, t, mask = self._h(key), self._table, self._mask
+        i = h & mask
+        while t[i]:
+            if t[i] == h:
+                return
+            i = (i + 1) & mask
+        t[i] = h
+        self._n += 1
+
+    def __contains__(self, key: str) -> bool:
+        h, t, mask = self._h(key), self._table, self._mask
+        i = h & mask
+        while True:
+            v = t[i]
+            if v == h:
+                return True
+            if not v:
+                return False
+            i = (i + 1) & mask
+
+    def __len__(self) -> int:
+        return self._n
+
+
+class Policy:
+    def __init__(self, deny: Iterable[str], allowed_regions: Iterable[str], version: str = '',
+                 hashed: Optional[bool] = None):
+        deny = deny if isinstance(deny, (list, tuple)) else list(deny)
+        self.hashed = len(deny) > HASHED_THRESHOLD if hashed is None else hashed
+        names = (n for n in map(normalize_artist, deny) if n)
+        self._deny = HashIndex(names, capacity=len(deny)) if self.hashed else frozenset(names)
+        self.allowed_regions: FrozenSet[str] = frozenset(allowed_regions)
+        self.version = version
+
+    def __len__(self) -> int:
+        return len(self._deny)
+
+    def denies(self, artist: str) -> bool:
+        return normalize_artist(artist) in self._deny
+
+    def check(self, track: Dict) -> Optional[Tuple[str, Dict[str, str]]]:
+        """None if the track may play, else the (tool, details) of the rule it broke."""
+        artists: List[str] = track.get('artists') or [track.get('artist', '')]
+        for a in artists:
+            if self.denies(a):
+                return 'policy.block', {'artist': a}
+        joined = track.get('artist', '')
+        if len(artists) > 1 and self.denies(joined):  # entries written as the joined credit
+            return 'policy.block', {'artist': joined}
+        region = track.get('region', 'US')
+        if region not in self.allowed_regions:
+            return 'policy.region_block', {'region': region}
+        return None
+
+
+def load_policy(directory: Path | str = SECURITY_DIR) -> Policy:
+    directory = Path(directory)
+    raw = [(directory / name).read_bytes() for name in POLICY_FILES]
+    deny, allow = (json.loads(r) for r in raw)
+    version = hashlib.sha1(b'\0'.join(raw)).hexdigest()[:12]
+    return Policy(deny.get('explicit_artists', []), allow.get('allowed_regions', ['US']), version=version)
+
+
+class PolicyStore:
+    def __init__(self, directory: Path | str = SECURITY_DIR, check_every_s: float = 1.0):
+        self.directory = Path(directory)
+        self.check_every_s = check_every_s
+        self._lock = threading.Lock()
+        self._reloading = False
+        self.stats = {'loads': 0, 'reload_errors': 0, 'last_load_ms': 0.0}
+        self._stamp = self._file_stamp()
+        self._policy = self._load()
+        self._next_check = time.monotonic() + check_every_s
+
+    def _file_stamp(self) -> Tuple:
+        out = []
+        for name in POLICY_FILES:
+            try:
+                st = (self.directory / name).stat()
+                out.append((st.st_mtime_ns, st.st_size))
+            except FileNotFoundError:
+                out.append(None)
+        return tuple(out)
+
+    def _load(self) -> Policy:
+        t0 = time.perf_counter()
+        policy = load_policy(self.directory)
+        self.stats['loads'] += 1
+        self.stats['last_load_ms'] = (time.perf_counter() - t0) * 1000
+        return policy
+
+    def current(self) -> Policy:
+        now = time.monotonic()
+        if now >= self._next_check:
+            self._next_check = now + self.check_every_s
+            self.refresh(background=True)
+        return self._policy
+
+    def refresh(self, background: bool = False) -> bool:
+        """Reload if the files changed since the last load; True if a reload started."""
+        stamp = self._file_stamp()
+        if stamp == self._stamp:
+            return False
+        with self._lock:
+            if self._reloading:
+                return False
+            self._reloading = True
+        if background:
+            threading.Thread(target=self._reload, args=(stamp,), name='policy-reload', daemon=True).start()
+        else:
+            self._reload(stamp)
+        return True
+
+    def _reload(self, stamp: Tuple) -> None:
+        try:
+            policy = self._load()
+        except (OSError, ValueError):
+            self.stats['reload_errors'] += 1  # half-written edit: keep the old policy, retry next check
+        else:
+            self._policy, self._stamp = policy, stamp
+        finally:
+            with self._lock:
+                self._reloading = False
+
+
+policy_store = PolicyStore()
@@ -0,0 +1,68 @@
+from __future__ import annotations
+import time
+from typing import Any, Dict, Iterator, List
+
+import numpy as np
+
+from agentic_playlist.tools.features import FeatureStore, feature_store
+
+
+class Reranker:
+    """Maximal marginal relevance over the critic's survivors.
+
+    Relevance is catalog rank (Spotify's search order, 1.0 for the first
+    candidate down to 1/n); each pick maximizes
+    `lam * relevance - (1 - lam) * max cosine similarity to earlier picks`.
+    `lam=1` keeps the catalog order. Picks are yielded one at a time, so the
+    caller can stop as soon as it has enough compliant tracks; each pick is
+    one (n, dim) mat-vec, ~k * n * dim flops for k picks.
+    """
+
+    def __init__(self, lam: float, tracer, store: FeatureStore | None = None, pool: float = 1.5):
+        self.lam = lam
+        self.pool = pool  # candidates ranked, as a multiple of the playlist size
+        self.tracer = tracer
+        self.store = store or feature_store
+        self.stats: Dict[str, Any] = {'pool': 0, 'picks': 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.lam < 1.0
+
+    def rank(self, tracks: List[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        self.stats = {'pool': len(tracks), 'picks': 0}
+        if not self.enabled:
+            for t in tracks:
+                self.stats['picks'] += 1
+                yield t
+            return
+        t0 = time.perf_counter()
+        picked = 0
+        try:
+            for i in mmr(self.store.matrix(tracks), self.lam):
+                picked += 1
+                yield tracks[i]
+        finally:
+            self.stats['picks'] = picked
+            self.tracer.span(agent='reranker', tool='rerank.mmr', details={
+                'pool': len(tracks), 'picks': picked, 'lambda': self.lam,
+                'ms': round((time.perf_counter() - t0) * 1000, 3),
+            })
+
+
+def mmr(vectors: np.ndarray, lam: float) -> Iterator[int]:
+    """Row indices of `vectors` (unit rows, in relevance order) in MMR order."""
+    n = len(vectors)
+    if not n:
+        return
+    relevance = lam * (1.0 - np.arange(n, dtype=np.float32) / n)
+    closest = np.zeros(n, dtype=np.float32)  # max similarity to any pick, floored at 0
+    taken = np.zeros(n, dtype=bool)
+    score = relevance.copy()
+    for _ in range(n):
+        j = int(np.argmax(score))  # first index wins ties, so the order is deterministic
+        yield j
+        taken[j] = True
+        np.maximum(closest, vectors @ vectors[j], out=closest)
+        np.subtract(relevance, (1.0 - lam) * closest, out=score)
+        score[taken] = -np.inf
@@ -0,0 +1,35 @@
+from __future__ import annotations
+from pathlib import Path
+from typing import Any, Dict
+import yaml
+
+CONFIG_PATH = Path(__file__).resolve().parent / "config.yaml"
+
+def load_config(path: Path | str = CONFIG_PATH) -> Dict[str, Any]:
+    with open(path, "r", encoding="utf-8") as f:
+        return yaml.safe_load(f) or {}
+
+def tool_timeout_s(cfg: Dict[str, Any] | None = None) -> float | None:
+    """`timeouts_ms.tool` in seconds, or None when unset/0."""
+    ms = (cfg if cfg is not None else load_config()).get("timeouts_ms", {}).get("tool")
+    return ms / 1000 if ms else None
+
+TRACING_DEFAULTS: Dict[str, Any] = {
+    "buffered": True, "queue_max": 10000, "batch": 512, "overflow": "drop",
+    "sample_rate": 1.0, "sampling": "tail", "format": "jsonl",
+    "rotate_bytes": 1 << 20, "rotate_age_s": 86400,
+    "retention_age_s": 7 * 86400, "retention_max_files": 2000, "retention_max_bytes": 256 << 20,
+    "sweep_every_s": 300,
+}
+
+def tracing_config(cfg: Dict[str, Any] | None = None) -> Dict[str, Any]:
+    """`tracing` section merged over TRACING_DEFAULTS."""
+    section = (cfg if cfg is not None else load_config()).get("tracing") or {}
+    return {**TRACING_DEFAULTS, **section}
+
+RERANK_DEFAULTS: Dict[str, Any] = {"lambda": 0.7, "pool": 1.5}
+
+def rerank_config(cfg: Dict[str, Any] | None = None) -> Dict[str, Any]:
+    """`rerank` section merged over RERANK_DEFAULTS."""
+    section = (cfg if cfg is not None else load_config()).get("rerank") or {}
+    return {**RERANK_DEFAULTS, **section}
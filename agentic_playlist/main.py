@@ -1,6 +1,7 @@
 from pathlib import Path
 import argparse, json
 from agentic_playlist.agents.orchestrator import Orchestrator
+from agentic_playlist.config import rerank_config
 from agentic_playlist.tracing.tracer import Tracer
 from agentic_playlist.tools.music_catalog import MusicCatalog
 
@@ -21,7 +22,7 @@ def main():
     catalog = MusicCatalog(tracer=tracer, limit=args.limit, variant=args.variant, seed_genres=["pop","indie","chill"])
     orch = Orchestrator(cfg={"seed": args.seed, "playlist_size": args.limit, "budgets": {
         "curator_max_calls": 8, "critic_max_calls": 3, "compliance_max_calls": 3
-    }}, tracer=tracer, catalog=catalog)
+    }, "rerank": rerank_config()}, tracer=tracer, catalog=catalog)
 
     import asyncio
     result = asyncio.run(orch.arun())
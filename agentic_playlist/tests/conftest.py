@@ -0,0 +1,24 @@
+import os
+
+# backend.spotify_client refuses to import without credentials; tests never
+# reach the real Spotify API so placeholders are enough.
+os.environ.setdefault("SPOTIFY_CLIENT_ID", "test-client-id")
+os.environ.setdefault("SPOTIFY_CLIENT_SECRET", "test-client-secret")
+
+import pytest
+
+@pytest.fixture
+def fake_spotify(monkeypatch):
+    """Point backend.spotify_client at a local FakeSpotify with a fresh scheduler/token."""
+    from benchmarks.fake_spotify import FakeSpotify
+    from backend import scheduler, spotify_client
+    from backend.cache import MemoryBackend
+    from backend.token_manager import TokenManager
+
+    fake = FakeSpotify().start()
+    monkeypatch.setattr(spotify_client, "API_BASE", fake.api_base)
+    monkeypatch.setattr(spotify_client, "ACCOUNTS_URL", fake.accounts_url)
+    monkeypatch.setattr(scheduler, "spotify_scheduler", scheduler.OutboundScheduler(rate=1000, burst=1000))
+    monkeypatch.setattr(spotify_client, "token_manager", TokenManager(spotify_client._request_token, store=MemoryBackend()))
+    yield fake
+    fake.stop()
@@ -0,0 +1,50 @@
+import asyncio
+from backend.mood_map import MOOD_PRESETS
+from backend.search import fetch_pages, fetch_pages_shared, plan_windows
+from benchmarks.fake_spotify import search_items
+
+def _fake_get():
+    calls = []
+
+    async def get(path, params=None, cache=True):
+        calls.append(dict(params))
+        await asyncio.sleep(0)
+        return {"tracks": {"items": search_items(params["q"], params["offset"], params["limit"])}}
+
+    return get, calls
+
+def test_plan_windows_merges_nearby_pages():
+    params = [{"q": "a", "offset": o, "limit": 20} for o in (0, 5, 10, 60, 70)] + [{"q": "b", "offset": 0, "limit": 20}]
+    assert plan_windows(params) == [
+        {"q": "a", "offset": 0, "limit": 30},
+        {"q": "a", "offset": 60, "limit": 30},
+        {"q": "b", "offset": 0, "limit": 20},
+    ]
+
+def test_shared_pages_equal_individual_pages():
+    lists = [
+        [{"q": 'genre:"pop"', "type": "track", "limit": 12, "offset": o, "market": "US"} for o in (0, 5)],
+        [{"q": 'genre:"pop"', "type": "track", "limit": 20, "offset": 7, "market": "US"},
+         {"q": 'genre:"edm"', "type": "track", "limit": 20, "offset": 12, "market": "US"}],
+    ]
+    get, calls = _fake_get()
+    shared, n = asyncio.run(fetch_pages_shared(get, lists))
+    assert n == len(calls) == 2
+    for pl, pages in zip(lists, shared):
+        solo = asyncio.run(fetch_pages(_fake_get()[0], pl))
+        assert [p["tracks"]["items"] for p in pages] == [p["tracks"]["items"] for p in solo]
+
+def test_batch_endpoint_matches_single_calls(monkeypatch):
+    import backend.app as app_module
+
+    get, calls = _fake_get()
+    monkeypatch.setattr(app_module, "spotify_get", get)
+    items = [app_module.BatchItem(mood=m, limit=12) for m in MOOD_PRESETS] + [app_module.BatchItem(mood="rainy day", variant=3)]
+    batch = asyncio.run(app_module.recommend_batch(app_module.BatchRequest(items=items)))
+    assert batch.upstream_calls == len(calls) < batch.pages
+
+    for item, got in zip(items, batch.items):
+        single = asyncio.run(app_module.recommend(mood=item.mood, limit=item.limit, variant=item.variant, nocache=False))
+        # same tracks; call counts differ since batch calls are shared and yield rates keep learning
+        assert got.model_dump(exclude={"metrics"}) == single.model_dump(exclude={"metrics"})
+        assert got.metrics["search_calls"] >= 1 and single.metrics["calls_per_track"] > 0
@@ -0,0 +1,123 @@
+import asyncio
+import pytest
+from backend.cache import ResponseCache
+
+def test_key_is_normalized():
+    a = ResponseCache.make_key("/search/", {"q": "x", "limit": 20, "offset": None})
+    b = ResponseCache.make_key("search", {"limit": "20", "q": "x"})
+    assert a == b
+
+def test_lru_eviction_by_entries_and_bytes():
+    c = ResponseCache(max_entries=2, max_bytes=10_000)
+    c.set("a", {"v": 1}); c.set("b", {"v": 2})
+    assert c.get("a") == {"v": 1}  # a is now most recent
+    c.set("c", {"v": 3})
+    assert c.get("b") is None and c.get("a") is not None
+    assert c.stats["evictions"] == 1
+
+    c = ResponseCache(max_entries=100, max_bytes=30)
+    c.set("a", {"v": "x" * 10}); c.set("b", {"v": "y" * 10})
+    assert len(c) == 1 and c.get("b") is not None
+
+def test_ttl_expiry():
+    c = ResponseCache(ttl=0)
+    c.set("a", {"v": 1})
+    assert c.get("a") is None and c.stats["expired"] == 1
+
+def test_inflight_requests_are_collapsed():
+    c = ResponseCache()
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"n": calls}
+
+    async def main():
+        return await asyncio.gather(*(c.get_or_fetch("k", fetch) for _ in range(50)))
+
+    out = asyncio.run(main())
+    assert calls == 1 and all(o == {"n": 1} for o in out)
+    assert c.stats["coalesced"] == 49
+
+    asyncio.run(c.get_or_fetch("k", fetch, bypass=True))
+    assert calls == 2 and c.get("k") == {"n": 2}
+
+def test_errors_are_not_cached():
+    c = ResponseCache()
+
+    async def boom():
+        raise RuntimeError("upstream")
+
+    async def main():
+        return await asyncio.gather(*(c.get_or_fetch("k", boom) for _ in range(3)), return_exceptions=True)
+
+    out = asyncio.run(main())
+    assert all(isinstance(o, RuntimeError) for o in out)
+    assert c.get("k") is None
+
+def test_sqlite_backend_is_shared_between_instances(tmp_path):
+    from backend.cache import SQLiteBackend
+    path = tmp_path / "cache.sqlite3"
+    a = ResponseCache(backend=SQLiteBackend(path))
+    b = ResponseCache(backend=SQLiteBackend(path))  # e.g. another uvicorn worker
+
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        return {"tracks": {"items": [{"id": "t1"}]}}
+
+    asyncio.run(a.get_or_fetch("search?q=pop", fetch))
+    assert asyncio.run(b.get_or_fetch("search?q=pop", fetch)) == {"tracks": {"items": [{"id": "t1"}]}}
+    assert calls == 1 and b.stats["hits"] == 1
+
+    b.set("short", {"v": 1}, ttl=0)
+    assert a.get("short") is None
+
+def test_sqlite_backend_trims_to_max_entries(tmp_path):
+    from backend.cache import SQLiteBackend
+    be = SQLiteBackend(tmp_path / "c.sqlite3", max_entries=3, trim_every=1)
+    for i in range(5):
+        be.set(f"k{i}", {"i": i}, ttl=60)
+    assert len(be) == 3 and be.get("k0") is None and be.get("k4") == {"i": 4}
+
+def test_sqlite_backend_trims_to_max_bytes(tmp_path):
+    from backend.cache import SQLiteBackend
+    be = SQLiteBackend(tmp_path / "c.sqlite3", max_bytes=40, trim_every=1)
+    be.set("big", {"v": "x" * 50}, ttl=60)  # larger than the whole cache: not stored
+    for i in range(4):
+        be.set(f"k{i}", {"v": "y" * 10}, ttl=60)  # 16 bytes each
+    assert be.get("big") is None and len(be) == 2 and be.get("k3") is not None
+
+def test_sqlite_io_runs_off_the_event_loop(tmp_path, monkeypatch):
+    import threading
+    from backend.cache import SQLiteBackend
+    be = SQLiteBackend(tmp_path / "c.sqlite3")
+    threads = set()
+    for name in ("get", "set"):
+        orig = getattr(be, name)
+        monkeypatch.setattr(be, name, lambda *a, _orig=orig: threads.add(threading.get_ident()) or _orig(*a))
+
+    async def fetch():
+        return {"v": 1}
+
+    async def main():
+        c = ResponseCache(backend=be)
+        await c.get_or_fetch("k", fetch)
+        return await c.get_or_fetch("k", fetch), threading.get_ident()
+
+    value, loop_thread = asyncio.run(main())
+    assert value == {"v": 1} and threads and loop_thread not in threads
+
+def test_backends_must_implement_the_interface():
+    from backend.cache import CacheBackend
+
+    class Partial(CacheBackend):
+        def get(self, key):
+            return None
+
+    with pytest.raises(TypeError):
+        Partial()
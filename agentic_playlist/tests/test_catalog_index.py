@@ -0,0 +1,89 @@
+import asyncio, time
+from backend import catalog_index, spotify_client
+from backend.catalog_index import CatalogIndex
+from benchmarks.fake_spotify import search_items
+
+def test_ingest_then_serve_without_upstream_calls(fake_spotify, tmp_path):
+    seeds = [["pop", "indie", "chill"]]
+
+    async def build():
+        return await catalog_index.ingest(seeds, depth=160)
+
+    index = asyncio.run(build())
+    index.save(tmp_path / "catalog.json")
+    index = CatalogIndex.load(tmp_path / "catalog.json")
+    assert index.tracks_for_genre("pop")[:2] == ["pop-0", "pop-1"]
+
+    async def search(variant):
+        return await spotify_client.search_tracks_by_genres_only(["pop", "indie", "chill"], limit=20, variant=variant, cache=False)
+
+    live = [asyncio.run(search(v)) for v in range(3)]
+    catalog_index.set_index(index)
+    try:
+        before = fake_spotify.calls["search"]
+        spotify_client.spotify_cache.clear()
+
+        async def served(variant):
+            return await spotify_client.search_tracks_by_genres_only(["pop", "indie", "chill"], limit=20, variant=variant)
+
+        local = [asyncio.run(served(v)) for v in range(3)]
+        assert fake_spotify.calls["search"] == before
+        assert [[t["id"] for t in r] for r in local] == [[t["id"] for t in r] for r in live]
+        assert local[0][0]["album"]["images"][0]["url"] == live[0][0]["album"]["images"][0]["url"]
+    finally:
+        catalog_index.set_index(None)
+
+def test_window_past_snapshot_depth_falls_back():
+    q = 'genre:"rock"'
+    rows = {t["id"]: catalog_index.compact(t) for t in search_items(q, 0, 30)}
+    index = CatalogIndex(rows, {q: {"ids": list(rows), "exhausted": False}})
+    assert index.page({"q": q, "offset": 10, "limit": 20}) is not None
+    assert index.page({"q": q, "offset": 11, "limit": 20}) is None
+    assert index.page({"q": 'genre:"jazz"', "offset": 0, "limit": 5}) is None
+
+    t0 = time.perf_counter()
+    for _ in range(1000):
+        index.page({"q": q, "offset": 5, "limit": 20})
+    assert (time.perf_counter() - t0) / 1000 < 0.001
+
+def test_columnar_store_matches_json_index(tmp_path):
+    from backend.track_store import TrackStore, build
+
+    rows, queries = {}, {}
+    for q in ['genre:"pop"', 'genre:"indie"', '(genre:"pop" OR genre:"indie")']:
+        items = search_items(q, 0, 120)
+        queries[q] = {"ids": [t["id"] for t in items], "exhausted": q == 'genre:"indie"'}
+        for t in items:
+            rows.setdefault(t["id"], catalog_index.compact(t))
+    index = CatalogIndex(rows, queries)
+    store = catalog_index.load_catalog(build(index, tmp_path / "catalog.m2p"))
+    assert isinstance(store, TrackStore)
+
+    for q in queries:
+        for offset, limit in ((0, 20), (37, 20), (110, 20), (200, 5)):
+            p = {"q": q, "offset": offset, "limit": limit, "type": "track", "market": "US"}
+            assert store.page(p) == index.page(p)
+    assert store.tracks_for_genre("pop") == index.tracks_for_genre("pop")
+    row = store.query_rows('genre:"indie"')[0]
+    assert store.genres_of(row) == ["indie"] and store.in_genre(row, "indie")
+    store.close()
+
+def test_columnar_store_is_little_endian_on_any_host(tmp_path, monkeypatch):
+    import struct
+    from backend import track_store
+
+    q = 'genre:"rock"'
+    items = search_items(q, 0, 70)
+    index = CatalogIndex({t["id"]: catalog_index.compact(t) for t in items},
+                         {q: {"ids": [t["id"] for t in items], "exhausted": True}})
+    native = track_store.TrackStore(track_store.build(index, tmp_path / "le.m2p"))
+    off, size = native.header["sections"]["query_ptr"]
+    assert struct.unpack_from("<2I", native._mm, off) == (0, 70)  # explicit byte order on disk
+    expected = native.page({"q": q, "offset": 60, "limit": 10}), [native.genres_of(r) for r in range(70)]
+    native.close()
+
+    # the big-endian paths: swapping on write and on read must undo each other
+    monkeypatch.setattr(track_store, "_SWAP", True)
+    swapped = track_store.TrackStore(track_store.build(index, tmp_path / "be.m2p"))
+    assert (swapped.page({"q": q, "offset": 60, "limit": 10}), [swapped.genres_of(r) for r in range(70)]) == expected
+    swapped.close()
@@ -0,0 +1,49 @@
+import random
+import numpy as np
+from agentic_playlist.agents.critic import Critic
+from agentic_playlist.tools.columnar import TrackColumns, cap_per_group, dedupe_by_artist_batch, ensure_diversity_batch, review_rows
+from agentic_playlist.tools.filters import dedupe_by_artist, ensure_diversity
+
+class _Spans:
+    def __init__(self):
+        self.spans = []
+
+    def span(self, **kw):
+        self.spans.append((kw["tool"], kw.get("status"), kw.get("details")))
+
+def _pool(rng, n):
+    genres = ["pop", "rock", "jazz", None, ""]
+    artists = [f"A{i}" for i in range(max(1, n // 3))] + [None]
+    return [{"id": i, "artist": rng.choice(artists), "genre": rng.choice(genres)} for i in range(n)]
+
+def test_matches_list_filters_exactly():
+    rng = random.Random(7)
+    for n in (0, 1, 5, 30, 257, 2000):
+        tracks = _pool(rng, n)
+        assert dedupe_by_artist_batch(tracks) == dedupe_by_artist(tracks)
+        assert ensure_diversity_batch(tracks) == ensure_diversity(tracks)
+        rows = review_rows(TrackColumns.from_tracks(tracks))
+        assert [tracks[i] for i in rows] == ensure_diversity(dedupe_by_artist(tracks))
+
+def test_cap_per_group_keeps_first_rows_in_order():
+    ids = np.array([2, 1, 2, 2, 1, 2, 0])
+    assert cap_per_group(ids, 2).tolist() == [True, True, True, False, True, False, True]
+
+def test_one_aggregated_span_per_filter():
+    tracks = [{"artist": a, "genre": None} for a in ["x", "x", "x", "y", "z", "w", "v"]]
+    spans = _Spans()
+    out = dedupe_by_artist_batch(tracks, spans)
+    ensure_diversity_batch(out, spans)
+    assert spans.spans == [
+        ("filters.dedupe", "drop", {"in": 7, "dropped": 2, "top": [["x", 2]]}),
+        ("filters.diversity", "drop", {"in": 5, "dropped": 2, "top": [["na", 2]]}),
+    ]
+
+def test_critic_switches_to_columns_for_large_pools(monkeypatch):
+    monkeypatch.setattr("agentic_playlist.agents.critic.COLUMNAR_MIN", 10)
+    tracks = _pool(random.Random(1), 40)
+    small, large = _Spans(), _Spans()
+    assert Critic(3, small).review(tracks[:9]) == ensure_diversity(dedupe_by_artist(tracks[:9]))
+    assert Critic(3, large).review(tracks) == ensure_diversity(dedupe_by_artist(tracks))
+    assert all(d.get("top") is None for _, _, d in small.spans)  # per-drop spans
+    assert [tool for tool, _, _ in large.spans] == ["filters.dedupe", "filters.diversity"]
@@ -0,0 +1,56 @@
+import asyncio, random
+from agentic_playlist.agents import reranker
+from agentic_playlist.agents.orchestrator import Orchestrator
+from agentic_playlist.tools.features import FeatureStore
+from agentic_playlist.tools.music_catalog import MusicCatalog
+
+class _Spans:
+    def span(self, **kw):
+        pass
+
+class _ShufflingCatalog(MusicCatalog):
+    """Real catalog, plus a stage that draws from the run's RNG across awaits."""
+
+    async def astream(self, n=30, seed=42, rng=None, target=None):
+        tracks = [t async for t in super().astream(n=n, seed=seed, rng=rng, target=n)]
+        while tracks:
+            await asyncio.sleep(0)  # let other runs interleave between draws
+            yield tracks.pop(rng.randrange(len(tracks)))
+
+def _orch(seed, variant, genres=("pop", "indie", "chill")):
+    catalog = _ShufflingCatalog(tracer=_Spans(), limit=8, variant=variant, seed_genres=list(genres), timeout_s=30)
+    return Orchestrator(cfg={"seed": seed, "playlist_size": 8}, tracer=_Spans(), catalog=catalog)
+
+def test_parallel_runs_match_serial_runs(fake_spotify, monkeypatch):
+    configs = [(seed, seed % 4) for seed in range(300)]
+    global_state = random.getstate()
+
+    async def serial():
+        return [await _orch(s, v).arun() for s, v in configs]
+
+    async def parallel():
+        return await asyncio.gather(*(_orch(s, v).arun() for s, v in configs))
+
+    # each pass starts from a cold feature store, so a history dependence can't hide
+    monkeypatch.setattr(reranker, "feature_store", FeatureStore())
+    expected = asyncio.run(serial())
+    assert len({tuple(t["title"] for t in r["playlist"]) for r in expected}) > 4  # seeds actually matter
+    monkeypatch.setattr(reranker, "feature_store", FeatureStore())
+    assert asyncio.run(parallel()) == expected
+    assert random.getstate() == global_state  # no run touched the global RNG
+
+def test_same_run_is_unchanged_by_an_unrelated_run_between(fake_spotify, monkeypatch):
+    async def runs(seed):
+        monkeypatch.setattr(reranker, "feature_store", FeatureStore())
+        cold = await _orch(seed, 1).arun()
+        monkeypatch.setattr(reranker, "feature_store", FeatureStore())  # shared by what follows, as in a worker
+        out = []
+        # variants 0 and 2 find some of variant 1's tracks through other queries, so with other genres
+        for between in (0, 2):
+            await _orch(seed, between).arun()
+            out.append(await _orch(seed, 1).arun())
+        return cold, out
+
+    for seed in range(6):
+        cold, out = asyncio.run(runs(seed))
+        assert out == [cold, cold], seed
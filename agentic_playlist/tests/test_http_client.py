@@ -0,0 +1,65 @@
+import asyncio, http.server, threading
+import pytest
+from backend import http_client
+
+class _Quiet(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.send_response(200); self.send_header("Content-Length", "2"); self.end_headers()
+        self.wfile.write(b"{}")
+
+    def log_message(self, *args):
+        pass
+
+def test_pool_wait_is_recorded_when_connections_saturate():
+    srv = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _Quiet)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    before = dict(http_client.pool_stats)
+
+    async def main():
+        import httpx
+        c = http_client.create_client(limits=httpx.Limits(max_connections=1), http2=False)
+        async with c:
+            await asyncio.gather(*(c.get(f"http://127.0.0.1:{srv.server_port}/") for _ in range(8)))
+
+    asyncio.run(main())
+    srv.shutdown()
+    assert http_client.pool_stats["requests"] - before["requests"] == 8
+    assert http_client.pool_stats["wait_ms_total"] > before["wait_ms_total"]
+
+def test_shared_client_is_closed_with_its_loop():
+    srv = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _Quiet)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+
+    async def main():
+        c = await http_client.get_client()
+        await c.get(f"http://127.0.0.1:{srv.server_port}/")
+        return c
+
+    first, second = asyncio.run(main()), asyncio.run(main())
+    srv.shutdown()
+    assert first is not second
+    assert first.is_closed and second.is_closed  # no pooled sockets outlive asyncio.run
+
+def test_catalog_call_enforces_tool_timeout(monkeypatch):
+    from agentic_playlist.tools import music_catalog
+    from agentic_playlist.tracing.tracer import Tracer
+
+    async def slow_search(*args, **kwargs):
+        await asyncio.sleep(1)
+        return []
+
+    monkeypatch.setattr(music_catalog, "search_tracks_by_genres_only", slow_search)
+    assert music_catalog.TOOL_TIMEOUT_S == 0.8  # from config.yaml
+
+    class _Spans(Tracer):
+        def __init__(self):
+            self.spans = []
+
+        def span(self, agent, tool, details=None, status="ok"):
+            self.spans.append(status)
+
+    tracer = _Spans()
+    cat = music_catalog.MusicCatalog(tracer=tracer, limit=5, variant=0, timeout_s=0.05)
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(cat.acurate())
+    assert tracer.spans == ["timeout"]
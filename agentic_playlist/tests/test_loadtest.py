@@ -0,0 +1,38 @@
+import asyncio
+import httpx
+from benchmarks.loadtest import RouteReport, _local_counters, check, drive, percentile, request_params
+
+def test_percentile_is_nearest_rank():
+    lat = [float(i) for i in range(1, 101)]
+    assert (percentile(lat, 50), percentile(lat, 95), percentile(lat, 99), percentile(lat, 100)) == (50, 95, 99, 100)
+    assert percentile([7.0], 99) == 7.0 and percentile([], 50) is None
+
+def test_check_flags_each_threshold():
+    s = RouteReport("agentic", sent=10, seconds=1.0, latencies_ms=[10.0] * 9 + [900.0],
+                    upstream={"search": 40, "token": 1, "429": 0}).summary()
+    s["errors"] = {"504": 1}
+    assert check([s], max_p99_ms=1000, max_calls=4, max_error_rate=0.1) == []
+    fails = check([s], max_p99_ms=500, max_calls=3, max_error_rate=0.0)
+    assert len(fails) == 3 and all(f.startswith("agentic:") for f in fails)
+
+def test_request_params_rotate_moods_then_variants():
+    got = [request_params("agentic", i, ["a", "b"], 2, 5, True) for i in range(5)]
+    assert [(p["mood"], p["variant"]) for p in got] == [("a", 0), ("b", 0), ("a", 1), ("b", 1), ("a", 0)]
+    assert got[0]["seed"] == 42 and got[0]["nocache"] == "true"
+    assert "seed" not in request_params("recommend", 0, ["a"], 1, 5, False)
+
+def test_drive_counts_upstream_calls_per_route(fake_spotify):
+    from backend.app import app
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://app") as client:
+            params_for = lambda i: request_params("recommend", i, ["happy", "chill"], 2, 6, True)
+            return await drive(client, "recommend", rps=40, duration=0.2, params_for=params_for,
+                               counters=_local_counters(fake_spotify))
+
+    report = asyncio.run(run())
+    s = report.summary()
+    assert s["requests"] == 8 and s["errors"] == {}
+    assert len(report.latencies_ms) == 8 and s["p50_ms"] <= s["p99_ms"] == s["max_ms"]
+    assert report.upstream["search"] == fake_spotify.calls["search"] > 0  # nocache: every request goes upstream
+    assert s["search_calls_per_request"] == round(fake_spotify.calls["search"] / 8, 3)
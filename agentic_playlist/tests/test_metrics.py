@@ -0,0 +1,93 @@
+import asyncio, subprocess, sys
+import httpx
+from agentic_playlist.tracing import metrics
+from agentic_playlist.tracing.metrics import Counter, Histogram, StageClock, collect, render, write_snapshot
+
+def _value(text, series):
+    for line in text.splitlines():
+        if line.startswith(series + " "):
+            return float(line.rsplit(" ", 1)[1])
+    return None
+
+def _scoped(monkeypatch):
+    # a private registry so counts from other tests don't leak in
+    monkeypatch.setattr(metrics, "registry", [])
+
+def test_histogram_renders_cumulative_buckets(monkeypatch):
+    _scoped(monkeypatch)
+    h = Histogram("t_seconds", "help", ("stage",), buckets=(0.1, 1.0))
+    c = Counter("t_total", "help", ("path", "status"))
+    for v in (0.05, 0.1, 0.5, 3.0):
+        h.observe(v, "critic")
+    c.inc("search", 200)
+    c.labels("search", 200).inc(2)
+    with h.time('a"b'):
+        pass
+    text = render()
+    assert "# TYPE t_seconds histogram" in text and "# TYPE t_total counter" in text
+    assert _value(text, 't_seconds_bucket{stage="critic",le="0.1"}') == 2  # le is inclusive
+    assert _value(text, 't_seconds_bucket{stage="critic",le="1.0"}') == 3
+    assert _value(text, 't_seconds_bucket{stage="critic",le="+Inf"}') == 4
+    assert _value(text, 't_seconds_count{stage="critic"}') == 4
+    assert abs(_value(text, 't_seconds_sum{stage="critic"}') - 3.65) < 1e-9
+    assert _value(text, 't_seconds_count{stage="a\\"b"}') == 1
+    assert _value(text, 't_total{path="search",status="200"}') == 3
+
+def test_stage_clock_sums_per_item_time():
+    clock = StageClock(lambda t: t % 2 == 0)
+    assert [t for t in range(6) if clock(t)] == [0, 2, 4]
+    assert clock.seconds > 0
+
+def test_snapshots_from_several_processes_are_summed(monkeypatch, tmp_path):
+    _scoped(monkeypatch)
+    h = Histogram("mood2playlist_stage_seconds", "help", ("stage",))
+    h.observe(0.002, "critic")
+    worker = (
+        "import sys; from agentic_playlist.tracing.metrics import STAGE_SECONDS, SPOTIFY_UPSTREAM, write_snapshot\n"
+        "for _ in range(int(sys.argv[1])): STAGE_SECONDS.observe(0.002, 'critic')\n"
+        "SPOTIFY_UPSTREAM.inc('search', 429)\n"
+        "write_snapshot(sys.argv[2])\n"
+    )
+    for n in (2, 3):
+        subprocess.run([sys.executable, "-c", worker, str(n), str(tmp_path)], check=True)
+    write_snapshot(str(tmp_path))
+    assert len(list(tmp_path.glob("metrics-*.json"))) == 3
+    merged = collect(str(tmp_path))
+    assert merged["mood2playlist_stage_seconds"]['["critic"]'][-2] == 0  # nothing above 10 s
+    text = render(str(tmp_path))
+    assert _value(text, 'mood2playlist_stage_seconds_count{stage="critic"}') == 6  # 1 here + 2 + 3
+    assert _value(text, 'mood2playlist_stage_seconds_bucket{stage="critic",le="0.0025"}') == 6
+
+def test_a_reused_pid_does_not_overwrite_a_dead_workers_file(monkeypatch, tmp_path):
+    _scoped(monkeypatch)
+    c = Counter("t_total", "help", ("path",))
+    c.inc("search")
+    write_snapshot(str(tmp_path))
+    monkeypatch.setattr(metrics, "_process", (0, ""))  # a new worker that got the same pid
+    write_snapshot(str(tmp_path))
+    assert len(list(tmp_path.glob("metrics-*.json"))) == 2
+    assert _value(render(str(tmp_path)), 't_total{path="search"}') == 2  # the old file is still counted
+
+def test_metrics_endpoint_covers_routes_and_stages(fake_spotify):
+    from backend.app import app
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://app") as client:
+            assert (await client.get("/api/recommend", params={"mood": "happy", "limit": 5, "nocache": "true"})).status_code == 200
+            r = await client.get("/api/agentic/recommend", params={"mood": "chill", "limit": 5, "nocache": "true"})
+            assert r.status_code == 200
+            assert (await client.get("/api/agentic/traces/missing.jsonl")).status_code == 404
+            return await client.get("/metrics")
+
+    r = asyncio.run(run())
+    assert r.headers["content-type"].startswith("text/plain; version=0.0.4")
+    text = r.text
+    assert _value(text, 'mood2playlist_request_seconds_count{route="/api/recommend",status="200"}') >= 1
+    assert _value(text, 'mood2playlist_request_seconds_count{route="/api/agentic/recommend",status="200"}') >= 1
+    # the template, with the include_router prefix, never the concrete path
+    assert _value(text, 'mood2playlist_request_seconds_count{route="/api/agentic/traces/{name}",status="404"}') >= 1
+    assert "missing.jsonl" not in text
+    assert _value(text, 'mood2playlist_spotify_get_seconds_count{path="search",status="200"}') >= 1
+    assert _value(text, 'mood2playlist_spotify_upstream_total{path="search",status="200"}') >= 1
+    for stage in ("token", "catalog", "critic", "compliance", "trace_span", "trace_flush"):
+        assert _value(text, f'mood2playlist_stage_seconds_count{{stage="{stage}"}}') >= 1, stage
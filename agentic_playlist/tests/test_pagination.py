@@ -0,0 +1,73 @@
+import asyncio
+import pytest
+from backend.pagination import BLOCK, PagePlan, YieldStats, iter_plan, run_plan, start_offset
+from backend.search import build_queries_from_genres
+from benchmarks.fake_spotify import search_items
+
+QUERIES = build_queries_from_genres(["pop", "indie", "chill"])  # 3 genres + an overlapping OR query
+
+def _fake_get(fail=None, depth=1000):
+    calls = []
+
+    async def get(path, params=None, cache=True):
+        calls.append(dict(params))
+        await asyncio.sleep(0)
+        if fail and fail(params):
+            raise RuntimeError("boom")
+        end = min(params["offset"] + params["limit"], depth)
+        return {"tracks": {"items": search_items(params["q"], params["offset"], max(0, end - params["offset"]))}}
+
+    return get, calls
+
+def _reference(queries, limit, variant, depth=1000):
+    """The answer spelled out: blocks round-robin from the variant's offset, first-seen ids."""
+    start = start_offset(variant, limit, len(queries))
+    streams = [search_items(q, start, max(0, min(200, depth - start))) for q in queries]
+    seen, out, r = set(), [], 0
+    while len(out) < limit and any(r * BLOCK < len(s) for s in streams):
+        for s in streams:
+            for t in s[r * BLOCK:(r + 1) * BLOCK]:
+                if t["id"] not in seen and len(out) < limit:
+                    seen.add(t["id"])
+                    out.append(t)
+        r += 1
+    return out
+
+def test_answer_depends_on_variant_not_on_what_was_learned():
+    for limit in (1, 12, 50):
+        for variant in (0, 3):
+            want = [t["id"] for t in _reference(QUERIES, limit, variant)]
+            for prior in (0.05, 0.7, 1.0):
+                plan = PagePlan(QUERIES, limit, variant, stats=YieldStats(prior=prior))
+                asyncio.run(run_plan(_fake_get()[0], plan))
+                assert [t["id"] for t in plan.tracks] == want
+
+def test_learning_cuts_calls_and_never_underfills():
+    stats = YieldStats()
+    get, calls = _fake_get()
+    first = PagePlan(QUERIES, 50, stats=stats)
+    asyncio.run(run_plan(get, first))
+    for v in range(1, 6):
+        asyncio.run(run_plan(get, PagePlan(QUERIES, 50, v, stats=stats)))
+    assert stats.rate('(genre:"pop" OR genre:"indie")') < stats.rate('genre:"pop"') == 1.0  # overlaps what was read
+    plan = PagePlan(QUERIES, 12, stats=stats)
+    asyncio.run(run_plan(get, plan))
+    assert len(plan.tracks) == 12 and plan.calls <= 3 and plan.rounds == 1  # OR query never called
+    assert len(first.tracks) == 50 and first.metrics["calls_per_track"] == round(first.calls / 50, 3)
+
+def test_short_results_and_failures():
+    get, _ = _fake_get(depth=7)
+    plan = asyncio.run(run_plan(get, PagePlan(['genre:"pop"'], 50, stats=YieldStats())))
+    assert len(plan.tracks) == 7 and plan.done
+
+    failing, _ = _fake_get(fail=lambda p: "OR" in p["q"])
+    ok = asyncio.run(run_plan(failing, PagePlan(QUERIES, 5, stats=YieldStats(prior=1.0))))
+    assert len(ok.tracks) == 5  # the failed page was never needed
+    with pytest.raises(RuntimeError):
+        asyncio.run(run_plan(failing, PagePlan(QUERIES, 40, stats=YieldStats())))
+
+def test_stream_yields_the_same_tracks():
+    async def collect():
+        return [t async for t in iter_plan(_fake_get()[0], PagePlan(QUERIES, 30, 2, stats=YieldStats(prior=0.3)))]
+
+    assert asyncio.run(collect()) == _reference(QUERIES, 30, 2)
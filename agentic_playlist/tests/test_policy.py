@@ -0,0 +1,47 @@
+import json
+from agentic_playlist.agents.compliance import Compliance
+from agentic_playlist.agents.policy import Policy, PolicyStore, normalize_artist
+
+class _Spans:
+    def __init__(self):
+        self.spans = []
+
+    def span(self, **kw):
+        self.spans.append((kw["tool"], kw.get("details")))
+
+def _track(*artists, region="US"):
+    return {"title": "t", "artist": ", ".join(artists), "artists": list(artists), "region": region}
+
+def test_blocks_any_credited_artist_after_normalization():
+    for hashed in (False, True):
+        policy = Policy(["NSFW Rapper", "Tyler, The Creator"], ["US"], hashed=hashed)
+        assert policy.check(_track("A", "nsfw  RAPPER")) == ("policy.block", {"artist": "nsfw  RAPPER"})
+        assert policy.check(_track("ＮＳＦＷ Rapper")) is not None  # full-width folds via NFKC
+        assert policy.check(_track("Tyler", "The Creator")) is not None  # joined credit still matches
+        assert policy.check({"artist": "NSFW Rapper"}) is not None  # tracks without an artists list
+        assert policy.check(_track("A", "B")) is None
+        assert policy.check(_track("A", region="FR")) == ("policy.region_block", {"region": "FR"})
+    assert normalize_artist("  Foo\tBAR ") == "foo bar"
+
+def test_compliance_uses_the_policy_in_one_pass():
+    spans = _Spans()
+    c = Compliance(max_calls=3, tracer=spans, policy=Policy(["NSFW Rapper"], ["US", "CA"]))
+    out = c.enforce([_track("A", "NSFW Rapper"), _track("B"), _track("C", region="FR")])
+    assert [t["artist"] for t in out] == ["B"]
+    assert spans.spans == [("policy.block", {"artist": "NSFW Rapper"}), ("policy.region_block", {"region": "FR"})]
+
+def test_store_swaps_on_edit_and_survives_bad_writes(tmp_path):
+    (tmp_path / "denylist.json").write_text(json.dumps({"explicit_artists": ["X"]}))
+    (tmp_path / "allowlist.json").write_text(json.dumps({"allowed_regions": ["US"]}))
+    store = PolicyStore(tmp_path, check_every_s=3600)
+    first = store.current()
+    assert first.denies("x") and not store.refresh()
+
+    (tmp_path / "denylist.json").write_text('{"explicit_artists": ["X", ')  # mid-write
+    assert store.refresh()
+    assert store.current() is first and store.stats["reload_errors"] == 1
+
+    (tmp_path / "denylist.json").write_text(json.dumps({"explicit_artists": ["Y", "Z"]}))
+    assert store.refresh()
+    assert store.current().denies("y") and not store.current().denies("x")
+    assert store.current().version != first.version
@@ -0,0 +1,81 @@
+import asyncio
+from backend.cache import ResponseCache
+from backend.prefetch import Prefetcher
+from backend.scheduler import BATCH, current_lane
+
+def test_prefetch_next_variants_and_count_use():
+    cache = ResponseCache()
+    fetched, lanes, peak, active = [], [], 0, 0
+
+    async def page(key):
+        return {"items": [key]}
+
+    async def fetch(key, limit, variant):
+        nonlocal peak, active
+        active += 1; peak = max(peak, active)
+        lanes.append(current_lane.get())
+        await asyncio.sleep(0.01)
+        for offset in (0, 50):  # two search pages per variant
+            await cache.get_or_fetch(f"{key}/{variant}/{offset}", lambda: page(key))
+        active -= 1
+        fetched.append((key, limit, variant))
+
+    async def main():
+        p = Prefetcher(fetch, ahead=2, concurrency=1)
+        p.after_serve("cozy", 12, 0)
+        p.after_serve("cozy", 12, 0)  # in flight already: not scheduled twice
+        await p.drain()
+        assert p.note_request("cozy", 12, 1) and not p.note_request("cozy", 12, 5)
+        assert p.stats["used"] == 0  # a matching request isn't a hit until the cache serves one
+        await cache.get_or_fetch("cozy/1/0", lambda: page("live"))
+        await cache.get_or_fetch("cozy/1/0", lambda: page("live"))  # counted once per entry
+        await cache.get_or_fetch("cozy/0/0", lambda: page("live"))  # never prefetched
+        return p
+
+    p = asyncio.run(main())
+    assert sorted(fetched) == [("cozy", 12, 1), ("cozy", 12, 2)]
+    assert peak == 1 and set(lanes) == {BATCH}
+    assert p.stats["completed"] == 2 and p.stats["pages"] == 4
+    assert p.stats["used"] == 1 and p.hit_rate == 0.25
+
+def test_live_request_joining_a_prefetch_counts_as_used():
+    cache = ResponseCache()
+
+    async def page():
+        await asyncio.sleep(0.02)
+        return {"items": ["a"]}
+
+    async def fetch(key, limit, variant):
+        await cache.get_or_fetch("k", page)
+
+    async def main():
+        p = Prefetcher(fetch)
+        p.schedule("cozy", 12, 1)
+        await asyncio.sleep(0.005)  # the prefetch is in flight
+        assert await cache.get_or_fetch("k", page) == {"items": ["a"]}
+        await p.drain()
+        return p
+
+    p = asyncio.run(main())
+    assert cache.stats["coalesced"] == 1 and p.stats["pages"] == 1 and p.stats["used"] == 1
+
+def test_warm_and_stand_down_when_busy():
+    fetched = []
+
+    async def fetch(key, limit, variant):
+        fetched.append((key, limit, variant))
+
+    busy = {"on": False}
+
+    async def main():
+        p = Prefetcher(fetch, concurrency=2, max_pending=1, busy=lambda: busy["on"])
+        assert await p.warm(["hype", "cozy"], limit=12) == 2
+        busy["on"] = True
+        p.after_serve("hype", 12, 0)
+        assert not p.schedule("hype", 12, 7)  # max_pending reached
+        await p.drain()
+        return p
+
+    p = asyncio.run(main())
+    assert fetched == [("hype", 12, 0), ("cozy", 12, 0)]
+    assert p.stats["warmed"] == 2 and p.stats["skipped_busy"] == 1 and p.stats["skipped_budget"] == 1
@@ -0,0 +1,66 @@
+import asyncio, sys, time
+import httpx
+from backend import profiler
+
+def test_fold_is_root_first_and_bounded():
+    def leaf():
+        return profiler.fold(sys._getframe())
+    names = leaf()
+    assert names[-1].startswith("leaf (agentic_playlist/tests/test_profiler.py:")
+    assert names[-2].startswith("test_fold_is_root_first_and_bounded (")
+    assert len(profiler.fold(sys._getframe(), depth=2)) == 2
+
+def test_session_collapsed_format():
+    s = profiler.Session(seconds=1)
+    s.samples.update({"GET /api/x;a (m.py:1);b (m.py:2)": 3, "(idle)": 1})
+    assert s.collapsed() == "GET /api/x;a (m.py:1);b (m.py:2) 3\n(idle) 1\n"
+    assert s.report()["busy_share"] == 0.75
+
+def test_debug_routes_are_off_without_a_token(monkeypatch):
+    from backend.app import app
+    monkeypatch.setattr(profiler, "PROFILE_TOKEN", None)
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://app") as client:
+            return (await client.post("/api/debug/profile", headers={"X-Profile-Token": "x"})).status_code
+
+    assert asyncio.run(run()) == 404
+
+def test_profile_flags_a_blocking_section(fake_spotify, monkeypatch):
+    import backend.app as app_module
+    monkeypatch.setattr(profiler, "PROFILE_TOKEN", "secret")
+    monkeypatch.setattr(profiler, "_last", None)
+    resolve = app_module.resolve_mood
+
+    def slow_resolve(key):
+        time.sleep(0.12)  # sync work on the loop, like a file read or a JSON load
+        return resolve(key)
+
+    monkeypatch.setattr(app_module, "resolve_mood", slow_resolve)
+    auth = {"X-Profile-Token": "secret"}
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app_module.app), base_url="http://app") as client:
+            assert (await client.post("/api/debug/profile", headers={"X-Profile-Token": "nope"})).status_code == 403
+            r = await client.post("/api/debug/profile", params={"seconds": 5, "requests": 1, "block_ms": 50}, headers=auth)
+            assert r.status_code == 200 and r.json()["session"]["running"]
+            assert (await client.post("/api/debug/profile", headers=auth)).status_code == 409
+            assert (await client.get("/api/recommend", params={"mood": "happy", "limit": 5, "nocache": "true"})).status_code == 200
+            await asyncio.sleep(0.05)  # the monitor notices the request limit on its next tick
+            status = (await client.get("/api/debug/profile", headers=auth)).json()
+            collapsed = (await client.get("/api/debug/profile/collapsed", headers=auth)).text
+            return status, collapsed
+
+    try:
+        status, collapsed = asyncio.run(run())
+    finally:
+        profiler.shutdown()
+    session = status["session"]
+    assert not session["running"] and session["requests"] == 1
+    stalls = [s for s in session["stalls"] if s["route"] == "GET /api/recommend"]
+    assert stalls and stalls[0]["ms"] >= 100
+    assert any(f.startswith("slow_resolve (") for f in stalls[0]["stack"])
+    assert status["loop"]["stalls"] >= 1 and status["recent_stalls"]
+    lines = [l for l in collapsed.splitlines() if "slow_resolve" in l]
+    assert lines and all(l.startswith("GET /api/recommend;") for l in lines)
+    assert sum(int(l.rsplit(" ", 1)[1]) for l in lines) >= 5  # ~24 samples at 5 ms over 120 ms
@@ -0,0 +1,105 @@
+import asyncio, time
+import numpy as np
+from agentic_playlist.agents.orchestrator import Orchestrator
+from agentic_playlist.agents.reranker import Reranker, mmr
+from agentic_playlist.tools.features import FeatureStore, hashed_vector
+
+class _Spans:
+    def __init__(self):
+        self.spans = []
+
+    def span(self, **kw):
+        self.spans.append((kw["tool"], kw.get("details")))
+
+class _Catalog:
+    def __init__(self, tracks):
+        self.tracks = tracks
+
+    async def acurate(self, n=30, seed=42, rng=None):
+        return self.tracks[:n]
+
+    async def astream(self, n=30, seed=42, rng=None, target=None):
+        for t in self.tracks[:n]:
+            await asyncio.sleep(0)
+            yield t
+
+def _track(i, artist, album):
+    return {"id": str(i), "title": f"t{i}", "artist": artist, "artists": [artist], "album": album, "genre": artist,
+            "region": "US"}
+
+def test_similar_tracks_are_pushed_down():
+    same = [_track(i, "Solo", "Only Album") for i in range(3)]
+    other = [_track(10 + i, f"A{i}", f"B{i}") for i in range(3)]
+    assert np.isclose(hashed_vector(same[0]) @ hashed_vector(same[1]), 1.0)
+    assert abs(float(hashed_vector(other[0]) @ hashed_vector(other[1]))) < 0.5
+    ranked = list(Reranker(0.5, _Spans(), store=FeatureStore()).rank(same + other))
+    assert [t["id"] for t in ranked[:4]] == ["0", "10", "11", "12"]
+    assert list(Reranker(1.0, _Spans()).rank(same + other)) == same + other  # lambda 1: catalog order
+
+def test_ranking_does_not_depend_on_earlier_runs():
+    import random
+    rng = random.Random(5)
+    genres = ["pop", "indie", "chill", "rock"]
+    for _ in range(50):
+        pool = [{"id": str(i), "artist": f"a{rng.randrange(8)}", "album": f"b{rng.randrange(6)}",
+                 "genre": rng.choice(genres)} for i in range(25)]
+        earlier = [{**t, "genre": rng.choice(genres)} for t in pool]  # same ids, found by other queries
+        warm = FeatureStore()
+        warm.matrix(earlier)
+        fresh = [t["id"] for t in Reranker(0.5, _Spans(), store=FeatureStore()).rank(pool)]
+        assert [t["id"] for t in Reranker(0.5, _Spans(), store=warm).rank(pool)] == fresh
+
+def test_put_vectors_win_over_hashing():
+    store = FeatureStore(dim=4)
+    store.put("x", [3.0, 4.0, 0.0, 0.0])
+    x = store.matrix([{"id": "x", "artist": "A"}, {"id": "y", "artist": "A"}])
+    assert np.allclose(x[0], [0.6, 0.8, 0.0, 0.0]) and np.isclose(np.linalg.norm(x[1]), 1.0)
+
+def test_mmr_k50_from_10k_is_fast():
+    rng = np.random.default_rng(0)
+    x = rng.standard_normal((10_000, 64)).astype(np.float32)
+    x /= np.linalg.norm(x, axis=1, keepdims=True)
+    picks = mmr(x, 0.7)
+    t0 = time.perf_counter()
+    out = [next(picks) for _ in range(50)]
+    assert time.perf_counter() - t0 < 0.2  # ~ a few ms; loose for slow CI
+    assert out[0] == 0 and len(set(out)) == 50
+
+def test_orchestrator_reports_rerank_metrics_and_stream_matches():
+    tracks = [_track(i, f"a{i % 5}", f"alb{i % 3}") for i in range(5)]
+    tracks += [_track(100 + i, "Same", "Same") for i in range(10)]
+    tracks = [t for pair in zip(tracks[5:], tracks[:5]) for t in pair] + tracks[10:]
+    for lam in (0.3, 1.0):
+        cfg = {"seed": 1, "playlist_size": 4, "rerank": {"lambda": lam}}
+
+        async def collect():
+            return [e async for e in Orchestrator(cfg=cfg, tracer=_Spans(), catalog=_Catalog(tracks)).astream()]
+
+        batch = asyncio.run(Orchestrator(cfg=cfg, tracer=_Spans(), catalog=_Catalog(tracks)).arun_batch())
+        events = asyncio.run(collect())
+        assert events[-1][1]["playlist"] == batch["playlist"]
+        m = events[-1][1]["metrics"]
+        # critic keeps one track per artist (6); MMR ranks all of them, lambda 1 stops at the 4th
+        assert m["rerank"]["lambda"] == lam and m["rerank"]["pool"] == (6 if lam < 1 else 4)
+        assert "similarity" in m and m["size"] == 4
+
+def test_blocked_tracks_in_the_pool_dont_shorten_the_playlist(monkeypatch):
+    from agentic_playlist.agents import compliance
+    from agentic_playlist.agents.policy import Policy
+
+    class _Store:
+        def current(self):
+            return Policy([f"a{i}" for i in range(6)], ["US"])  # every track of the first full pool
+
+    monkeypatch.setattr(compliance, "policy_store", _Store())
+    tracks = [_track(i, f"a{i}", f"alb{i}") for i in range(20)]
+    cfg = {"seed": 1, "playlist_size": 4, "rerank": {"lambda": 0.5}}  # pool of 6
+
+    async def collect():
+        return [e async for e in Orchestrator(cfg=cfg, tracer=_Spans(), catalog=_Catalog(tracks)).astream()]
+
+    batch = asyncio.run(Orchestrator(cfg=cfg, tracer=_Spans(), catalog=_Catalog(tracks)).arun_batch())
+    summary = asyncio.run(collect())[-1][1]
+    assert summary["playlist"] == batch["playlist"] and len(batch["playlist"]) == 4
+    assert {t["artist"] for t in batch["playlist"]} <= {f"a{i}" for i in range(6, 12)}
+    assert summary["metrics"]["rerank"]["pool"] == 6
@@ -0,0 +1,75 @@
+import asyncio, json, shutil, time
+import pytest
+from agentic_playlist.agents import compliance
+from agentic_playlist.agents.policy import PolicyStore
+
+@pytest.fixture
+def agentic(fake_spotify, tmp_path, monkeypatch):
+    from backend.routers import agentic
+
+    security = tmp_path / "security"
+    shutil.copytree(compliance.SECURITY_DIR, security)
+    store = PolicyStore(security, check_every_s=3600)
+    monkeypatch.setattr(compliance, "policy_store", store)
+    monkeypatch.setattr(agentic, "TRACES_DIR", tmp_path / "traces")
+    agentic.run_cache.clear()
+    runs = []
+    real_run = agentic._run
+
+    async def counting_run(*args):
+        runs.append(args)
+        return await real_run(*args)
+
+    monkeypatch.setattr(agentic, "_run", counting_run)
+    yield agentic, runs, store
+    agentic.run_cache.clear()
+
+def _call(agentic, **kw):
+    params = {"mood": "cozy", "limit": 5, "seed": 42, "variant": 0, "nocache": False, **kw}
+    return agentic.agentic_recommend(**params)
+
+def test_hits_return_original_trace_and_coalesce(agentic):
+    router, runs, _ = agentic
+
+    async def main():
+        first = await asyncio.gather(*(_call(router) for _ in range(20)))
+        t0 = time.perf_counter()
+        again = await _call(router)
+        return first, again, time.perf_counter() - t0
+
+    first, again, hit_s = asyncio.run(main())
+    assert len(runs) == 1  # 20 identical concurrent requests, one pipeline run
+    assert all(r == first[0] for r in first) and again == first[0]
+    assert again.trace_url and again.trace_url.endswith(".jsonl")
+    assert hit_s < 0.01
+
+    asyncio.run(_call(router, seed=43))
+    asyncio.run(_call(router, nocache=True))
+    assert len(runs) == 3
+
+def test_hits_drop_a_swept_trace(agentic):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    router, runs, _ = agentic
+    first = asyncio.run(_call(router))
+    (router.TRACES_DIR / first.trace_url.rsplit("/", 1)[-1]).unlink()  # retention got to it
+
+    assert asyncio.run(_call(router)).trace_url is None
+    app = FastAPI()
+    app.include_router(router.router, prefix="/api/agentic")
+    with TestClient(app) as client:
+        r = client.get("/api/agentic/recommend/stream", params={"mood": "cozy", "limit": 5, "format": "ndjson"})
+    summary = json.loads(r.text.splitlines()[-1])
+    assert summary["event"] == "summary" and summary["data"]["trace_url"] is None
+    assert len(runs) == 1  # both were cache hits
+
+def test_policy_edit_invalidates(agentic):
+    router, runs, store = agentic
+    asyncio.run(_call(router))
+    asyncio.run(_call(router))
+    assert len(runs) == 1
+    deny = store.directory / "denylist.json"
+    deny.write_text(json.dumps({"explicit_artists": ["NSFW Rapper", "Someone New"]}))
+    assert store.refresh()
+    asyncio.run(_call(router))
+    assert len(runs) == 2
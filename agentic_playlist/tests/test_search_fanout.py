@@ -0,0 +1,56 @@
+import asyncio
+from backend.search import build_queries_from_genres, fetch_pages, merge_pages
+
+def _page(ids):
+    return {"tracks": {"items": [{"id": i, "name": i, "artists": []} for i in ids]}}
+
+PAGES = {
+    'genre:"pop"': ["a", "b", "c"],
+    'genre:"indie"': ["c", "d", "e"],
+    'genre:"chill"': ["f", "a", "g"],
+    '(genre:"pop" OR genre:"indie")': ["h", "i"],
+}
+
+def _sequential(queries, limit):
+    seen, out = set(), []
+    for q in queries:
+        for t in _page(PAGES[q])["tracks"]["items"]:
+            if t["id"] in seen:
+                continue
+            seen.add(t["id"]); out.append(t)
+            if len(out) >= limit:
+                return out
+    return out
+
+def test_concurrent_merge_matches_sequential_order():
+    in_flight, peak = 0, 0
+
+    async def get(path, params=None, cache=True):
+        nonlocal in_flight, peak
+        in_flight += 1; peak = max(peak, in_flight)
+        # later queries answer first; merge order must not depend on it
+        await asyncio.sleep(0.01 * (4 - len(params["q"]) % 4))
+        in_flight -= 1
+        return _page(PAGES[params["q"]])
+
+    queries = build_queries_from_genres(["pop", "indie", "chill"])
+    for limit in (1, 4, 7, 50):
+        pages = asyncio.run(fetch_pages(get, [{"q": q} for q in queries], concurrency=2))
+        assert merge_pages(pages, limit) == _sequential(queries, limit)
+    assert peak <= 2
+
+def test_failed_page_only_raises_when_reached():
+    async def get(path, params=None, cache=True):
+        if params["q"] == 'genre:"chill"':
+            raise RuntimeError("boom")
+        return _page(PAGES[params["q"]])
+
+    queries = build_queries_from_genres(["pop", "indie", "chill"])
+    pages = asyncio.run(fetch_pages(get, [{"q": q} for q in queries]))
+    assert [t["id"] for t in merge_pages(pages, 5)] == ["a", "b", "c", "d", "e"]
+    try:
+        merge_pages(pages, 6)
+    except RuntimeError:
+        pass
+    else:
+        raise AssertionError("expected the failed page to surface")
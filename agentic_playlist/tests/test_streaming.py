@@ -0,0 +1,138 @@
+import asyncio, json, time
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from agentic_playlist.agents.orchestrator import Orchestrator
+from backend.search import iter_pages, merge_pages, merge_stream, fetch_pages
+
+def _page(ids):
+    return {"tracks": {"items": [{"id": i, "name": i, "artists": [{"name": i.upper()}]} for i in ids]}}
+
+PAGES = {"q1": ["a", "b", "c"], "q2": ["c", "d"], "q3": ["e", "a", "f"]}
+DELAY = {"q1": 0.01, "q2": 0.2, "q3": 0.05}
+
+async def _get(path, params=None, cache=True):
+    await asyncio.sleep(DELAY[params["q"]])
+    return _page(PAGES[params["q"]])
+
+def test_stream_matches_batch_merge_and_starts_early():
+    params = [{"q": q} for q in PAGES]
+
+    async def run(limit):
+        t0, first, out = time.perf_counter(), None, []
+        async for t in merge_stream(iter_pages(_get, params), limit):
+            first = first or time.perf_counter() - t0
+            out.append(t)
+        return out, first
+
+    for limit in (1, 3, 5, 50):
+        streamed, first = asyncio.run(run(limit))
+        assert streamed == merge_pages(asyncio.run(fetch_pages(_get, params)), limit)
+        assert first < 0.15  # q1's tracks don't wait for the slow q2 page
+
+def test_closing_the_stream_cancels_pending_pages():
+    started, finished = [], []
+
+    async def get(path, params=None, cache=True):
+        started.append(params["q"])
+        await asyncio.sleep(DELAY[params["q"]])
+        finished.append(params["q"])
+        return _page(PAGES[params["q"]])
+
+    async def run():
+        out = [t async for t in merge_stream(iter_pages(get, [{"q": q} for q in PAGES]), 2)]
+        await asyncio.sleep(0.3)
+        return out
+
+    assert [t["id"] for t in asyncio.run(run())] == ["a", "b"]
+    assert started == ["q1", "q2", "q3"] and finished == ["q1"]
+
+def test_errors_after_the_headers_become_error_events(caplog):
+    import httpx
+    from fastapi import HTTPException
+    from backend.streaming import stream_response
+
+    def app_for(exc):
+        async def events():
+            yield "track", {"id": "a"}
+            raise exc
+
+        app = FastAPI()
+        app.get("/s")(lambda: stream_response(events(), "ndjson"))
+        return app
+
+    cases = [
+        (HTTPException(status_code=504, detail="slow"), 504),
+        (httpx.ConnectTimeout("connect timed out"), 502),
+        (httpx.RemoteProtocolError("peer closed"), 502),
+        (KeyError("items"), 500),
+    ]
+    for exc, status in cases:
+        with TestClient(app_for(exc)) as client:
+            events = [json.loads(l) for l in client.get("/s").text.splitlines()]
+        assert events[0] == {"event": "track", "data": {"id": "a"}}
+        assert events[-1]["event"] == "error" and events[-1]["data"]["status"] == status, exc
+    assert sum(r.name == "backend.streaming" and r.exc_info is not None for r in caplog.records) == 3
+
+class _Spans:
+    def span(self, **kw):
+        pass
+
+class _Catalog:
+    def __init__(self, tracks):
+        self.tracks = tracks
+
+    async def acurate(self, n=30, seed=42, rng=None):
+        return self.tracks[:n]
+
+    async def astream(self, n=30, seed=42, rng=None, target=None):
+        for t in self.tracks[:n]:
+            await asyncio.sleep(0)
+            yield t
+
+def test_orchestrator_stream_matches_arun():
+    tracks = [{"title": f"t{i}", "artist": f"a{i % 7}", "genre": ["pop", None, "edm"][i % 3], "region": "US"} for i in range(40)]
+    cfg = {"seed": 7, "playlist_size": 5}
+
+    async def collect():
+        return [e async for e in Orchestrator(cfg=cfg, tracer=_Spans(), catalog=_Catalog(tracks)).astream()]
+
+    events = asyncio.run(collect())
+    batch = asyncio.run(Orchestrator(cfg=cfg, tracer=_Spans(), catalog=_Catalog(tracks)).arun_batch())
+    assert [d for e, d in events if e == "track"] == batch["playlist"] == events[-1][1]["playlist"]
+    assert events[-1] == ("summary", asyncio.run(Orchestrator(cfg=cfg, tracer=_Spans(), catalog=_Catalog(tracks)).arun()))
+
+def test_agentic_stream_endpoint(fake_spotify, tmp_path, monkeypatch):
+    from backend.routers import agentic
+
+    monkeypatch.setattr(agentic, "TRACES_DIR", tmp_path)
+    app = FastAPI()
+    app.include_router(agentic.router, prefix="/api/agentic")
+    with TestClient(app) as client:
+        r = client.get("/api/agentic/recommend/stream", params={"mood": "cozy", "limit": 4, "format": "ndjson"})
+        events = [json.loads(l) for l in r.text.splitlines()]
+        batch = client.get("/api/agentic/recommend", params={"mood": "cozy", "limit": 4}).json()
+    assert r.headers["content-type"].startswith("application/x-ndjson")
+    assert [e["data"] for e in events[:-1]] == batch["playlist"]
+    summary = events[-1]
+    assert summary["event"] == "summary"
+    assert summary["data"]["metrics"] == batch["metrics"] and summary["data"]["trace_url"].endswith(".jsonl")
+
+def test_pipeline_stops_fetching_early_with_batch_output(fake_spotify, monkeypatch):
+    from backend import pagination
+    from agentic_playlist.tools.music_catalog import MusicCatalog
+
+    def run(lam, method):
+        monkeypatch.setattr(pagination, "yield_stats", pagination.YieldStats())  # same estimates every run
+        catalog = MusicCatalog(tracer=_Spans(), limit=3, variant=1, seed_genres=["pop", "indie", "chill"], cache=False,
+                               timeout_s=30)
+        orch = Orchestrator(cfg={"seed": 3, "playlist_size": 3, "rerank": {"lambda": lam}}, tracer=_Spans(), catalog=catalog)
+        before = fake_spotify.calls["search"]
+        result = asyncio.run(getattr(orch, method)())
+        return result, fake_spotify.calls["search"] - before
+
+    for lam in (1.0, 0.7):
+        batch, batch_calls = run(lam, "arun_batch")
+        piped, piped_calls = run(lam, "arun")
+        assert piped["playlist"] == batch["playlist"] and len(piped["playlist"]) == 3  # genre-less: capped at 3
+        assert piped_calls < batch_calls
+        assert piped["metrics"]["candidates"] < 20 and piped["metrics"]["search"]["search_calls"] >= piped_calls  # planned; some cancelled
@@ -0,0 +1,74 @@
+import asyncio, time
+from backend.cache import MemoryBackend
+from backend.token_manager import TokenManager
+
+def _fetcher(expires_in=3600, delay=0.01, fail=False):
+    calls = {"n": 0}
+
+    async def fetch():
+        calls["n"] += 1
+        await asyncio.sleep(delay)
+        if fail:
+            raise RuntimeError("accounts down")
+        return {"access_token": f"tok{calls['n']}", "expires_in": expires_in}
+
+    return fetch, calls
+
+def test_concurrent_callers_share_one_refresh():
+    fetch, calls = _fetcher()
+    tm = TokenManager(fetch)
+
+    async def main():
+        toks = await asyncio.gather(*(tm.get() for _ in range(100)))
+        await tm.stop()
+        return toks
+
+    assert set(asyncio.run(main())) == {"tok1"}
+    assert calls["n"] == 1 and tm.stats["refreshes"] == 1
+    assert tm.stats["last_latency_ms"] > 0
+
+def test_background_renewal_before_margin():
+    fetch, calls = _fetcher(expires_in=2)
+    tm = TokenManager(fetch, margin=0.5, renew_ahead=0.5)
+
+    async def main():
+        first = await tm.get()
+        await asyncio.sleep(1.3)  # renewer fires at ~1s, before the 1.5s cut-off
+        t0 = time.perf_counter()
+        second = await tm.get()
+        waited = time.perf_counter() - t0
+        await tm.stop()
+        return first, second, waited
+
+    first, second, waited = asyncio.run(main())
+    assert first == "tok1" and second == "tok2"
+    assert waited < 0.005  # served from memory, no auth round trip
+    assert tm.stats["background_refreshes"] >= 1
+
+def test_failures_are_counted_and_raised():
+    fetch, _ = _fetcher(fail=True)
+    tm = TokenManager(fetch, retry_after=60)
+
+    async def main():
+        out = await asyncio.gather(tm.get(), tm.get(), return_exceptions=True)
+        await tm.stop()
+        return out
+
+    out = asyncio.run(main())
+    assert all(isinstance(o, RuntimeError) for o in out)
+    assert tm.stats["failures"] == 1 and tm.stats["last_error"] == "accounts down"
+
+def test_token_adopted_from_shared_store():
+    store = MemoryBackend()
+    fetch_a, calls_a = _fetcher()
+    fetch_b, calls_b = _fetcher()
+    a = TokenManager(fetch_a, store=store)
+    b = TokenManager(fetch_b, store=store)  # a second worker
+
+    async def main():
+        ta = await a.get(); tb = await b.get()
+        await a.stop(); await b.stop()
+        return ta, tb
+
+    assert asyncio.run(main()) == ("tok1", "tok1")
+    assert calls_a["n"] == 1 and calls_b["n"] == 0 and b.stats["adopted"] == 1
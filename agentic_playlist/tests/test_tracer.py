@@ -0,0 +1,107 @@
+import json, os, threading, time
+from agentic_playlist.tracing import tracer as tracer_mod
+from agentic_playlist.tracing.store import read_trace, sweep, trace_name
+from agentic_playlist.tracing.tracer import Tracer, TraceWriter, trace_stats
+
+def _read(path):
+    return [json.loads(l) for l in path.read_text().splitlines()]
+
+def test_buffered_spans_keep_order_and_ids(tmp_path):
+    writer = TraceWriter(batch=7)
+    a, b = Tracer(tmp_path / "a.jsonl", writer=writer), Tracer(tmp_path / "b.jsonl", writer=writer)
+    for i in range(100):
+        a.span(agent="curator", tool="spotify.search", details={"i": i})
+        if i % 3 == 0:
+            b.span(agent="critic", tool="filters.dedupe", details={"i": i}, status="drop")
+    assert a.flush() and b.flush()
+    recs = _read(tmp_path / "a.jsonl")
+    assert [r["span_id"] for r in recs] == list(range(1, 101))
+    assert [r["details"]["i"] for r in recs] == list(range(100))
+    assert [r["span_id"] for r in _read(tmp_path / "b.jsonl")] == list(range(1, 35))
+
+def test_full_queue_drops_without_gaps(tmp_path, monkeypatch):
+    writer = TraceWriter(max_queue=5, overflow="drop")
+    gate, real_write = threading.Event(), tracer_mod.append_records
+    monkeypatch.setattr(tracer_mod, "append_records", lambda path, recs: (gate.wait(), real_write(path, recs)))
+    t = Tracer(tmp_path / "t.jsonl", writer=writer)
+    dropped = trace_stats["dropped"]
+    for i in range(20):
+        t.span(agent="curator", tool="spotify.search", details={"i": i})
+    assert trace_stats["dropped"] - dropped > 0
+    gate.set()
+    assert t.flush()
+    recs = _read(tmp_path / "t.jsonl")
+    assert [r["span_id"] for r in recs] == list(range(1, len(recs) + 1))
+    assert recs[-1]["tool"] == "tracer.dropped"
+    assert recs[-1]["details"]["count"] == 20 - (len(recs) - 1)
+
+def test_sync_overflow_is_lossless(tmp_path):
+    writer = TraceWriter(max_queue=2, overflow="sync")
+    t = Tracer(tmp_path / "t.jsonl", writer=writer)
+    for i in range(50):
+        t.span(agent="compliance", tool="policy.block", details={"i": i}, status="deny")
+    assert t.flush()
+    assert [r["details"]["i"] for r in _read(tmp_path / "t.jsonl")] == list(range(50))
+
+def test_unbuffered_tracer_writes_immediately(tmp_path):
+    t = Tracer(tmp_path / "t.jsonl")
+    t.span(agent="critic", tool="filters.review", status="budget_exceeded")
+    assert _read(tmp_path / "t.jsonl")[0]["span_id"] == 1
+
+def test_binary_format_round_trips(tmp_path):
+    path = tmp_path / trace_name("agent-run", "cozy", 42, 0, "binary")
+    writer = TraceWriter(batch=3)
+    t = Tracer(path, writer=writer)
+    for i in range(10):
+        t.span(agent="curator", tool="spotify.search", details={"name": f"song {i}"})
+    assert t.flush()
+    recs = list(read_trace(path))
+    assert [r["span_id"] for r in recs] == list(range(1, 11))
+    with open(path, "ab") as f:
+        f.write(b"\x10\x00\x00\x00partial")  # torn append is ignored
+    assert len(list(read_trace(path))) == 10
+
+def test_trace_names_are_safe_for_free_text():
+    assert trace_name("agent-run", "cozy", 42, 0) == "agent-run-cozy-seed42-v0.jsonl"
+    name = trace_name("agent-run", "../../etc/passwd rain!", 1, 2, "binary")
+    assert "/" not in name and name.endswith("-seed1-v2.m2t")
+    assert name != trace_name("agent-run", "etc passwd rain", 1, 2, "binary")
+
+def test_head_sampled_out_run_keeps_only_errors(tmp_path, monkeypatch):
+    monkeypatch.setattr(tracer_mod._sample_rng, "random", lambda: 0.99)
+    t = Tracer(tmp_path / "t.jsonl", sample_rate=0.1, sampling="head")
+    t.span(agent="curator", tool="spotify.search")
+    assert not t.finish() and not (tmp_path / "t.jsonl").exists()
+    t = Tracer(tmp_path / "t.jsonl", sample_rate=0.1, sampling="head")
+    t.span(agent="curator", tool="spotify.search")
+    t.span(agent="curator", tool="spotify.search", status="timeout")
+    assert t.finish()
+    assert [(r["span_id"], r["status"]) for r in _read(tmp_path / "t.jsonl")] == [(2, "timeout")]
+
+def test_tail_sampling_keeps_whole_failed_runs(tmp_path, monkeypatch):
+    monkeypatch.setattr(tracer_mod._sample_rng, "random", lambda: 0.99)
+    ok = Tracer(tmp_path / "ok.jsonl", sample_rate=0.1, sampling="tail")
+    ok.span(agent="curator", tool="spotify.search")
+    assert not ok.finish() and not (tmp_path / "ok.jsonl").exists()
+    bad = Tracer(tmp_path / "bad.jsonl", sample_rate=0.1, sampling="tail")
+    bad.span(agent="curator", tool="spotify.search")
+    bad.span(agent="critic", tool="filters.dedupe", status="drop")
+    assert bad.finish(error=True)
+    assert [r["span_id"] for r in _read(tmp_path / "bad.jsonl")] == [1, 2]
+
+def test_rotation_and_retention(tmp_path):
+    path = tmp_path / "agent-run-cozy-seed42-v0.jsonl"
+    for _ in range(3):
+        t = Tracer(path, rotate_bytes=200)
+        for i in range(5):
+            t.span(agent="curator", tool="spotify.search", details={"i": i})
+    files = sorted(tmp_path.iterdir())
+    assert len(files) == 3 and all(len(_read(f)) == 5 for f in files)
+
+    old = files[0]
+    os.utime(old, (time.time() - 3600, time.time() - 3600))
+    assert sweep(tmp_path, max_age_s=60)["removed"] == 1 and not old.exists()
+    os.utime(files[1], (time.time() - 10, time.time() - 10))
+    stats = sweep(tmp_path, max_files=1)
+    assert stats["removed"] == 1 and stats["files"] == 1
+    assert list(tmp_path.iterdir()) == [path]  # the oldest rotated file went first
@@ -0,0 +1,101 @@
+import random
+from typing import Dict, List
+from backend.search import build_queries_from_genres
+from backend.vibe import (
+    LEX, DEFAULT_GENRES, SHORTCUTS, PhraseMatcher, normalize_vibe, parse_vibe, resolve_mood, vibe_memo_stats,
+)
+
+def reference_parse_vibe(text: str) -> List[str]:
+    """The original substring-scan implementation, kept verbatim as the oracle."""
+    s = (text or "").lower()
+    if any(w in s for w in ["fireplace","snow","blanket","cocoa","candle","knit","sweater","winter"]):
+        return ["acoustic","singer-songwriter","indie","folk","chill","piano"][:3]
+    if any(w in s for w in ["rain","rainy","monsoon"]):
+        return ["lo-fi","indie","chill","ambient","piano"][:3]
+    if any(w in s for w in ["gym","lift","sprint","pr","max","preworkout"]):
+        return ["edm","electro","hip-hop","dance","pop"][:3]
+    if any(w in s for w in ["club","night out","party","rave","dj"]):
+        return ["dance","edm","house","pop","hip-hop"][:3]
+    scores: Dict[str,int] = {}
+    for label, conf in LEX.items():
+        hits = sum(1 for w in conf["words"] if w in s)
+        if hits:
+            scores[label] = hits
+    if scores:
+        label = max(scores, key=scores.get)
+        return LEX[label]["genres"][:3]
+    return DEFAULT_GENRES[:3]
+
+VOCAB = sorted({w for conf in LEX.values() for w in conf["words"]} | {w for cues, _ in SHORTCUTS for w in cues})
+FILLER = ["the", "a", "vibes", "with", "my", "cat", "Ünïcode", "late", "o", "ut", "ni", "ght", "!", "  ", "\t", "-"]
+
+def test_known_prompts():
+    cases = {
+        "sitting by a fireplace while it snows": ["acoustic", "singer-songwriter", "indie"],
+        "rainy day": ["lo-fi", "indie", "chill"],
+        "Night Out with friends": ["dance", "edm", "house"],
+        "brooding noir storm": ["industrial", "electro", "rock"],
+        "deep work essay": ["lo-fi", "ambient", "piano"],
+        "": DEFAULT_GENRES[:3],
+        None: DEFAULT_GENRES[:3],
+    }
+    for text, genres in cases.items():
+        assert parse_vibe(text) == genres == reference_parse_vibe(text)
+
+def test_matches_reference_on_random_prompts():
+    rng = random.Random(1234)
+    for _ in range(5000):
+        parts = [rng.choice(VOCAB + FILLER) for _ in range(rng.randint(0, 12))]
+        # glue some tokens together and upper-case some so substring hits cross word edges
+        text = "".join(p + rng.choice(["", " ", " ", ", "]) for p in parts)
+        if rng.random() < 0.3:
+            text = text.upper()
+        assert parse_vibe(text) == reference_parse_vibe(text), text
+
+def test_matcher_finds_overlapping_phrases():
+    m = PhraseMatcher(["he", "she", "his", "hers", "angry gym", "gym"])
+    assert m.find("ushers") == {"he", "she", "hers"}
+    assert m.find("so angry gym time") == {"angry gym", "gym"}
+    assert m.find("") == set()
+
+def test_normalize_folds_case_order_and_filler():
+    assert normalize_vibe("  Rainy,   DAY!! ") == normalize_vibe("day rainy") == "rain|rainy"
+    assert normalize_vibe("gym gym GYM") == normalize_vibe("my gym") == "gym"
+    assert normalize_vibe("Night out, friends") == "night|night out"
+    assert normalize_vibe("out night") == "night"
+    assert normalize_vibe("") == normalize_vibe("late vibes") == ""
+
+def test_normalized_parse_matches_the_raw_text():
+    # separators inside a phrase stay significant, as they are for parse_vibe
+    cases = {
+        "night-out": ["industrial", "electro", "rock"],
+        "night  out": ["industrial", "electro", "rock"],
+        "night\tout": ["industrial", "electro", "rock"],
+        "night out": ["dance", "edm", "house"],
+        "deep-work": DEFAULT_GENRES[:3],
+        "deep work": ["lo-fi", "ambient", "piano"],
+    }
+    for text, genres in cases.items():
+        assert parse_vibe(text) == genres, text
+        assert parse_vibe(normalize_vibe(text)) == genres, text
+        assert list(resolve_mood(text).seed_genres) == genres, text
+
+def test_normalized_parse_matches_on_random_prompts():
+    rng = random.Random(99)
+    for _ in range(3000):
+        parts = [rng.choice(VOCAB + FILLER) for _ in range(rng.randint(0, 8))]
+        text = "".join(p + rng.choice(["", " ", " ", ", ", "-", "\t"]) for p in parts)
+        if rng.random() < 0.3:
+            text = text.upper()
+        assert parse_vibe(normalize_vibe(text)) == parse_vibe(text), text
+
+def test_resolve_mood_memoizes_genres_and_queries():
+    res = resolve_mood("cozy sunday fireplace blanket")
+    assert res.parsed_from == "vibe"
+    assert list(res.seed_genres) == parse_vibe("cozy sunday fireplace blanket")
+    assert list(res.queries) == build_queries_from_genres(list(res.seed_genres))
+
+    before = vibe_memo_stats()["normalized"]["hits"]
+    assert resolve_mood("blanket, FIREPLACE sunday cozy") is res  # same normalized key
+    assert vibe_memo_stats()["normalized"]["hits"] == before + 1
+    
\ No newline at end of file
@@ -0,0 +1,116 @@
+"""Columnar batch path for the critic filters, for candidate pools in the thousands.
+
+`TrackColumns.from_tracks` factorizes the per-track keys the filters look at
+into integer id arrays (first-seen order); the filters then run as NumPy
+passes over those ids and return kept *indices*, so callers can take rows
+from the original list or from any other column (tempo, energy, ...) they
+carry alongside. Each filter records one aggregated span with its drop
+counts instead of one span per dropped track.
+
+Kept rows are exactly those of `filters.dedupe_by_artist` followed by
+`filters.ensure_diversity`, in the same order.
+"""
+from __future__ import annotations
+import os
+from dataclasses import dataclass, field
+from typing import Any, Dict, Hashable, List, Sequence, Tuple
+
+import numpy as np
+
+from agentic_playlist.tools.filters import DIVERSITY_CAP, Track
+
+# Critic.review switches to this path at this many candidates. Below it the
+# per-drop spans are cheap enough, and more useful to read, than the aggregate.
+COLUMNAR_MIN = int(os.getenv('CRITIC_COLUMNAR_MIN', '256'))
+TOP_DROPS = 5  # most-dropped keys listed in each aggregated span
+
+
+def factorize(values: Sequence[Hashable]) -> Tuple[np.ndarray, List[Hashable]]:
+    """Integer codes for `values` in first-seen order, plus the code -> value table."""
+    index: Dict[Hashable, int] = {}
+    codes = np.fromiter((index.setdefault(v, len(index)) for v in values), dtype=np.int64, count=len(values))
+    return codes, list(index)
+
+
+@dataclass(frozen=True)
+class TrackColumns:
+    artist_ids: np.ndarray
+    genre_ids: np.ndarray
+    artists: List[Hashable] = field(default_factory=list)  # id -> artist
+    genres: List[str] = field(default_factory=list)  # id -> genre ('na' for missing)
+
+    @classmethod
+    def from_tracks(cls, tracks: Sequence[Track]) -> 'TrackColumns':
+        artist_ids, artists = factorize([t.get('artist') for t in tracks])
+        genre_ids, genres = factorize([t.get('genre') or 'na' for t in tracks])
+        return cls(artist_ids, genre_ids, artists, genres)
+
+    def __len__(self) -> int:
+        return len(self.artist_ids)
+
+
+def first_occurrence(ids: np.ndarray) -> np.ndarray:
+    """Boolean mask of the first row holding each id."""
+    mask = np.zeros(len(ids), dtype=bool)
+    if len(ids):
+        _, first = np.unique(ids, return_index=True)
+        mask[first] = True
+    return mask
+
+
+def cap_per_group(ids: np.ndarray, cap: int) -> np.ndarray:
+    """Boolean mask keeping the first `cap` rows of each id, in row order."""
+    n = len(ids)
+    order = np.argsort(ids, kind='stable')  # stable: rows of a group stay in input order
+    grouped = ids[order]
+    pos = np.arange(n)
+    starts = np.ones(n, dtype=bool)
+    starts[1:] = grouped[1:] != grouped[:-1]
+    rank = pos - np.maximum.accumulate(np.where(starts, pos, 0))
+    mask = np.empty(n, dtype=bool)
+    mask[order] = rank < cap
+    return mask
+
+
+def _drop_span(tracer, tool: str, ids: np.ndarray, names: List[Hashable], kept: np.ndarray) -> None:
+    if not tracer:
+        return
+    dropped = ids[~kept]
+    details: Dict[str, Any] = {'in': int(len(ids)), 'dropped': int(len(dropped))}
+    if len(dropped):
+        uniq, counts = np.unique(dropped, return_counts=True)
+        top = np.argsort(-counts, kind='stable')[:TOP_DROPS]
+        details['top'] = [[names[uniq[i]], int(counts[i])] for i in top]
+    tracer.span(agent='critic', tool=tool, details=details, status='drop' if len(dropped) else 'ok')
+
+
+def dedupe_rows(cols: TrackColumns, rows: np.ndarray, tracer=None) -> np.ndarray:
+    """Of `rows`, those whose artist was not seen in an earlier row."""
+    ids = cols.artist_ids[rows]
+    kept = first_occurrence(ids)
+    _drop_span(tracer, 'filters.dedupe', ids, cols.artists, kept)
+    return rows[kept]
+
+
+def diversity_rows(cols: TrackColumns, rows: np.ndarray, tracer=None, cap: int = DIVERSITY_CAP) -> np.ndarray:
+    """Of `rows`, the first `cap` of each genre."""
+    ids = cols.genre_ids[rows]
+    kept = cap_per_group(ids, cap)
+    _drop_span(tracer, 'filters.diversity', ids, cols.genres, kept)
+    return rows[kept]
+
+
+def review_rows(cols: TrackColumns, tracer=None) -> np.ndarray:
+    """Indices kept by dedupe then diversity, ascending."""
+    rows = np.arange(len(cols))
+    return diversity_rows(cols, dedupe_rows(cols, rows, tracer), tracer)
+
+
+def dedupe_by_artist_batch(tracks: List[Track], tracer=None) -> List[Track]:
+    cols = TrackColumns.from_tracks(tracks)
+    return [tracks[i] for i in dedupe_rows(cols, np.arange(len(cols)), tracer)]
+
+
+def ensure_diversity_batch(tracks: List[Track], tracer=None) -> List[Track]:
+    cols = TrackColumns.from_tracks(tracks)
+    return [tracks[i] for i in diversity_rows(cols, np.arange(len(cols)), tracer)]
@@ -0,0 +1,119 @@
+"""Per-track feature vectors for the re-ranker, kept in a local LRU store.
+
+With no audio features to hand, a track's vector is a hashed bag of what the
+catalog does carry: each credited artist, the album and the genre become a
+token whose blake2b digest picks `HASH_SLOTS` signed slots in a
+`dim`-wide vector; the weighted sum is L2-normalized, so the dot product of
+two tracks is their cosine similarity (same artist ~ 0.8, same album alone
+~ 0.4, nothing shared ~ 0). Vectors computed elsewhere (audio features,
+learned embeddings) can be `put()` under the track id and win over hashing.
+
+Hashed vectors are cached under their tokens, not the track id: a track's
+genre comes from the query that found it, so the same id can need a
+different vector in another run, and a run's order must not depend on the
+runs before it.
+"""
+from __future__ import annotations
+import hashlib
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, Hashable, List, Sequence, Tuple
+
+import numpy as np
+
+FEATURE_DIM = 64
+HASH_SLOTS = 4
+WEIGHTS = {'artist': 1.0, 'album': 0.6, 'genre': 0.4}
+
+Track = Dict[str, Any]
+
+
+@lru_cache(maxsize=65536)
+def _token(kind: str, value: str, dim: int) -> Tuple[Tuple[int, ...], Tuple[float, ...]]:
+    """Slots and signed weights of one feature token."""
+    digest = hashlib.blake2b(f'{kind}:{value}'.encode('utf-8'), digest_size=2 * HASH_SLOTS).digest()
+    raw = [int.from_bytes(digest[2 * i:2 * i + 2], 'little') for i in range(HASH_SLOTS)]
+    w = WEIGHTS[kind] / HASH_SLOTS ** 0.5
+    return tuple((r >> 1) % dim for r in raw), tuple(-w if r & 1 else w for r in raw)
+
+
+def _tokens(track: Track) -> List[Tuple[str, str]]:
+    out = [('artist', a.casefold()) for a in track.get('artists') or [track.get('artist') or ''] if a]
+    if track.get('album'):
+        out.append(('album', track['album'].casefold()))
+    if track.get('genre'):
+        out.append(('genre', track['genre']))
+    return out
+
+
+def hashed_vectors(tracks: Sequence[Track], dim: int = FEATURE_DIM) -> np.ndarray:
+    """(len(tracks), dim) float32 unit rows, built with one scatter-add for the batch."""
+    cells: List[int] = []
+    weights: List[float] = []
+    for row, t in enumerate(tracks):
+        base = row * dim
+        for kind, value in _tokens(t):
+            slots, signs = _token(kind, value, dim)
+            cells.extend(base + c for c in slots)
+            weights.extend(signs)
+    flat = np.bincount(np.array(cells, dtype=np.int64), weights=weights, minlength=len(tracks) * dim)
+    x = flat.reshape(len(tracks), dim).astype(np.float32)
+    norms = np.linalg.norm(x, axis=1, keepdims=True)
+    return np.divide(x, norms, out=x, where=norms > 0)
+
+
+def hashed_vector(track: Track, dim: int = FEATURE_DIM) -> np.ndarray:
+    return hashed_vectors([track], dim)[0]
+
+
+class FeatureStore:
+    def __init__(self, dim: int = FEATURE_DIM, max_entries: int = 100_000):
+        self.dim = dim
+        self.max_entries = max_entries
+        self._vecs: 'OrderedDict[Hashable, np.ndarray]' = OrderedDict()
+        self.stats = {'hits': 0, 'misses': 0}
+
+    @staticmethod
+    def _key(t: Track) -> Hashable:
+        return ('hashed',) + tuple(_tokens(t))  # every input of hashed_vectors
+
+    def put(self, track_id: Hashable, vec: Sequence[float]) -> None:
+        v = np.asarray(vec, dtype=np.float32)
+        if v.shape != (self.dim,):
+            raise ValueError(f'expected a {self.dim}-dim vector, got shape {v.shape}')
+        norm = float(np.linalg.norm(v))
+        self._remember(track_id, v / norm if norm else v)
+
+    def _remember(self, key: Hashable, vec: np.ndarray) -> None:
+        self._vecs[key] = vec
+        self._vecs.move_to_end(key)
+        while len(self._vecs) > self.max_entries:
+            self._vecs.popitem(last=False)
+
+    def matrix(self, tracks: Sequence[Track]) -> np.ndarray:
+        """(len(tracks), dim) float32, one unit row per track; misses are hashed in one batch."""
+        x = np.empty((len(tracks), self.dim), dtype=np.float32)
+        keys = []
+        missing = []
+        for i, t in enumerate(tracks):
+            key = t.get('id')
+            vec = self._vecs.get(key) if key is not None else None  # put() wins
+            if vec is None:
+                key = self._key(t)
+                vec = self._vecs.get(key)
+            keys.append(key)
+            if vec is None:
+                missing.append(i)
+            else:
+                x[i] = vec
+                self._vecs.move_to_end(key)
+        self.stats['hits'] += len(tracks) - len(missing)
+        self.stats['misses'] += len(missing)
+        if missing:
+            x[missing] = hashed_vectors([tracks[i] for i in missing], self.dim)
+            for i in missing:
+                self._remember(keys[i], x[i].copy())
+        return x
+
+
+feature_store = FeatureStore()  # shared by runs in this process
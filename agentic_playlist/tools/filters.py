@@ -1,25 +1,40 @@
 from __future__ import annotations
-from typing import List, Dict, Any
+from typing import Any, Callable, Dict, List
 
-def dedupe_by_artist(tracks: List[Dict[str, Any]], tracer=None) -> List[Dict[str, Any]]:
-    seen = set(); out = []
-    for t in tracks:
+Track = Dict[str, Any]
+
+DIVERSITY_CAP = 3  # tracks per genre
+
+def artist_deduper(tracer=None) -> Callable[[Track], bool]:
+    """Stateful per-track form of `dedupe_by_artist`: call it on tracks in order."""
+    seen = set()
+    def keep(t: Track) -> bool:
         a = t.get('artist')
         if a in seen:
             if tracer: tracer.span(agent='critic', tool='filters.dedupe', details={'artist': a}, status='drop')
-            continue
-        seen.add(a); out.append(t)
-    return out
+            return False
+        seen.add(a)
+        return True
+    return keep
 
-def ensure_diversity(tracks: List[Dict[str, Any]], tracer=None) -> List[Dict[str, Any]]:
-    # toy: max 3 per (inferred) genre field (often None in Spotify track payloads)
-    count = {}; out = []
-    for t in tracks:
+def diversity_guard(tracer=None) -> Callable[[Track], bool]:
+    """Stateful per-track form of `ensure_diversity`."""
+    # toy: max DIVERSITY_CAP per (inferred) genre field (often None in Spotify track payloads)
+    count = {}
+    def keep(t: Track) -> bool:
         g = t.get('genre') or 'na'
         n = count.get(g, 0)
-        if n >= 3:
+        if n >= DIVERSITY_CAP:
             if tracer: tracer.span(agent='critic', tool='filters.diversity', details={'genre': g}, status='drop')
-            continue
+            return False
         count[g] = n + 1
-        out.append(t)
-    return out
+        return True
+    return keep
+
+def dedupe_by_artist(tracks: List[Track], tracer=None) -> List[Track]:
+    keep = artist_deduper(tracer)
+    return [t for t in tracks if keep(t)]
+
+def ensure_diversity(tracks: List[Track], tracer=None) -> List[Track]:
+    keep = diversity_guard(tracer)
+    return [t for t in tracks if keep(t)]
@@ -1,29 +1,94 @@
 from __future__ import annotations
-from typing import Dict, Any, List
+import asyncio, random, time
+from typing import AsyncIterator, Dict, Any, List, Sequence
+from agentic_playlist.config import tool_timeout_s
+from agentic_playlist.tracing.metrics import STAGE_SECONDS
 from agentic_playlist.tracing.tracer import Tracer
-from backend.spotify_client import search_tracks_by_genres_only  # bridge
+from backend.search import query_genre
+from backend.spotify_client import search_plan, search_tracks_by_genres_only, stream_tracks_by_genres_only  # bridge
+
+TOOL_TIMEOUT_S = tool_timeout_s()  # read config.yaml once, not per request
 
 class MusicCatalog:
-    def __init__(self, tracer: Tracer, limit: int, variant: int, seed_genres: List[str] | None = None):
+    def __init__(self, tracer: Tracer, limit: int, variant: int, seed_genres: List[str] | None = None, cache: bool = True,
+                 timeout_s: float | None = None, queries: Sequence[str] | None = None):
         self.tracer = tracer
+        self.cache = cache
+        # config.yaml timeouts_ms.tool bounds each catalog call
+        self.timeout_s = timeout_s if timeout_s is not None else TOOL_TIMEOUT_S
         self.limit = limit
         self.variant = variant
         self.seed_genres = seed_genres or ["pop"]
+        self.queries = queries  # prebuilt by backend.vibe.resolve_mood, else built from seed_genres
+        self.plan = None  # search plan of the last call, for its call counts
+
+    async def acurate(self, n: int = 30, seed: int = 42, rng: random.Random | None = None) -> List[Dict[str, Any]]:
+        """Up to `n` candidates in Spotify's search order.
 
-    async def acurate(self, n: int = 30, seed: int = 42) -> List[Dict[str, Any]]:
-        raw = await search_tracks_by_genres_only(self.seed_genres, limit=max(self.limit * 2, 20), variant=self.variant)
+        `seed` and `rng` are the run's; a catalog that samples must draw from
+        `rng`, never the global `random`. Search order needs neither.
+        """
+        self.plan = search_plan(self.seed_genres, limit=max(self.limit * 2, 20), variant=self.variant, queries=self.queries)
+        search = search_tracks_by_genres_only(self.seed_genres, limit=self.plan.limit, variant=self.variant, cache=self.cache,
+                                              plan=self.plan)
+        try:
+            with STAGE_SECONDS.time("catalog"):
+                raw = await asyncio.wait_for(search, timeout=self.timeout_s)
+        except asyncio.TimeoutError:
+            self.tracer.span(agent="curator", tool="spotify.search", details={"timeout_ms": round(self.timeout_s * 1000)}, status="timeout")
+            raise
         out: List[Dict[str, Any]] = []
         for t in raw:
-            artists = ", ".join(a.get("name", "") for a in t.get("artists", []))
-            self.tracer.span(agent="curator", tool="spotify.search", details={"name": t.get("name", "")})
-            out.append({
-                "title": t.get("name", ""),
-                "artist": artists,
-                "genre": None,
-                "region": "US",
-                "spotify_url": t.get("external_urls", {}).get("spotify"),
-                "image": (t.get("album", {}).get("images") or [{}])[0].get("url"),
-            })
+            out.append(self._candidate(t))
             if len(out) >= n:
                 break
         return out
+
+    async def astream(self, n: int = 30, seed: int = 42, rng: random.Random | None = None,
+                      target: int | None = None) -> AsyncIterator[Dict[str, Any]]:
+        """`acurate` as a stream: candidates arrive as their Spotify page lands, same order.
+
+        Pages are fetched for `target` candidates first and more only as the
+        consumer keeps pulling; closing the stream early stops fetching. The
+        tool timeout bounds the whole stream, not each track.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout_s if self.timeout_s else None
+        self.plan = search_plan(self.seed_genres, limit=max(self.limit * 2, 20), variant=self.variant,
+                                queries=self.queries, target=target)
+        search = stream_tracks_by_genres_only(self.seed_genres, limit=self.plan.limit, variant=self.variant,
+                                              cache=self.cache, plan=self.plan)
+        count, waited = 0, 0.0  # waited: time spent on the catalog, not in the consumer
+        try:
+            while count < n:
+                t0 = time.perf_counter()
+                try:
+                    nxt = search.__anext__()
+                    t = await (asyncio.wait_for(nxt, max(0.0, deadline - loop.time())) if deadline else nxt)
+                except StopAsyncIteration:
+                    return
+                except asyncio.TimeoutError:
+                    self.tracer.span(agent="curator", tool="spotify.search", details={"timeout_ms": round(self.timeout_s * 1000)}, status="timeout")
+                    raise
+                finally:
+                    waited += time.perf_counter() - t0
+                count += 1
+                yield self._candidate(t)
+        finally:
+            await search.aclose()
+            STAGE_SECONDS.observe(waited, "catalog")
+
+    def _candidate(self, t: Dict[str, Any]) -> Dict[str, Any]:
+        names = [a.get("name", "") for a in t.get("artists", [])]
+        self.tracer.span(agent="curator", tool="spotify.search", details={"name": t.get("name", "")})
+        return {
+            "id": t.get("id"),
+            "title": t.get("name", ""),
+            "artist": ", ".join(names),
+            "artists": names,  # per-artist list for the compliance policy
+            "album": t.get("album", {}).get("name"),  # feature for the re-ranker
+            "genre": query_genre(self.plan.origin.get(t.get("id")) if self.plan else None),  # of the query that found it
+            "region": "US",
+            "spotify_url": t.get("external_urls", {}).get("spotify"),
+            "image": (t.get("album", {}).get("images") or [{}])[0].get("url"),
+        }
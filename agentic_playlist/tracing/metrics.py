@@ -0,0 +1,337 @@
+"""Per-stage latency histograms and counters, rendered in Prometheus text format.
+
+Hot-path updates are a bisect and two in-place adds on the calling thread,
+with no lock. Almost all of them happen on the event loop, so they don't
+race. A concurrent increment from another thread can rarely be lost, which a
+sampled histogram tolerates.
+
+Several worker processes (uvicorn --workers N, gunicorn) are summed through
+files. Set METRICS_DIR to a directory the workers share. Each process then
+writes its cumulative counts to `metrics-<pid>-<nonce>.json` there: every
+METRICS_FLUSH_S from a daemon thread, at exit, and whenever it serves a
+scrape. `render()` adds up every file, so any worker can answer /metrics for
+all of them. A dead worker's file is still counted, which keeps counters
+monotonic across restarts; the nonce keeps a new worker that reuses its pid
+from overwriting it. Clear the directory when the whole service
+(re)starts. Without METRICS_DIR, each process reports only itself.
+"""
+from __future__ import annotations
+import abc, atexit, json, os, threading, time, uuid
+from bisect import bisect_left
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+METRICS_DIR = os.getenv("METRICS_DIR") or None
+METRICS_FLUSH_S = float(os.getenv("METRICS_FLUSH_S", "5"))
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# 100 us .. 10 s: a span append sits at the bottom, a cold agentic run near the top
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "total")
+
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # last slot: above every bound
+        self.total = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.total += value
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, n: float = 1.0) -> None:
+        self.value += n
+
+
+class _Metric(abc.ABC):
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], Any] = {}
+        registry.append(self)
+
+    def labels(self, *values: Any):
+        """The series for these label values; bind it once for code that runs often."""
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} takes labels {self.labelnames}, got {key}")
+            child = self._children.setdefault(key, self._new_child())
+        return child
+
+    @abc.abstractmethod
+    def _new_child(self):
+        ...
+
+    @abc.abstractmethod
+    def snapshot(self) -> Dict[str, Any]:
+        ...
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, help, labelnames)
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float, *labels: Any) -> None:
+        self.labels(*labels).observe(value)
+
+    def time(self, *labels: Any) -> "_Timer":
+        return _Timer(self.labels(*labels))
+
+    def snapshot(self) -> Dict[str, Any]:
+        # list() copies under the GIL, so a writer on the loop can't tear a row
+        return {json.dumps(k): list(c.counts) + [c.total] for k, c in list(self._children.items())}
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self) -> _CounterChild:
+        return _CounterChild()
+
+    def inc(self, *labels: Any, n: float = 1.0) -> None:
+        self.labels(*labels).inc(n)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {json.dumps(k): c.value for k, c in list(self._children.items())}
+
+
+class _Timer:
+    """`with hist.time("stage"):` observes the block's wall time, errors included."""
+    __slots__ = ("child", "t0")
+
+    def __init__(self, child: _HistogramChild):
+        self.child = child
+
+    def __enter__(self) -> "_Timer":
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.child.observe(time.perf_counter() - self.t0)
+
+
+class StageClock:
+    """Wraps a per-item predicate and adds up the time spent in it over one
+    run, so a stage that sees candidates one at a time is still observed once."""
+    __slots__ = ("fn", "seconds")
+
+    def __init__(self, fn):
+        self.fn = fn
+        self.seconds = 0.0
+
+    def __call__(self, item) -> bool:
+        t0 = time.perf_counter()
+        try:
+            return self.fn(item)
+        finally:
+            self.seconds += time.perf_counter() - t0
+
+
+registry: List[_Metric] = []
+
+# --- the metrics ---
+REQUEST_SECONDS = Histogram("mood2playlist_request_seconds", "API request time to the last body byte.",
+                            ("route", "status"))
+STAGE_SECONDS = Histogram("mood2playlist_stage_seconds",
+                          "Time per pipeline stage: token, catalog, critic, compliance, trace_span, trace_flush.",
+                          ("stage",))
+SPOTIFY_SECONDS = Histogram("mood2playlist_spotify_get_seconds",
+                            "spotify_get time including cache hits, by API path and outcome.", ("path", "status"))
+SPOTIFY_UPSTREAM = Counter("mood2playlist_spotify_upstream_total",
+                           "Requests that reached Spotify, by API path and final status (after retries).",
+                           ("path", "status"))
+LOOP_BLOCKED_SECONDS = Histogram("mood2playlist_loop_blocked_seconds",
+                                 "Event-loop stalls over the profiler's threshold, by the route that was running.",
+                                 ("route",))
+
+
+# --- export ---
+
+def snapshot() -> Dict[str, Dict[str, Any]]:
+    return {m.name: m.snapshot() for m in registry}
+
+
+def _merge(into: Dict[str, Dict[str, Any]], snap: Dict[str, Dict[str, Any]]) -> None:
+    for name, series in snap.items():
+        dst = into.setdefault(name, {})
+        for key, val in series.items():
+            old = dst.get(key)
+            if old is None:
+                dst[key] = list(val) if isinstance(val, list) else val
+            elif isinstance(val, list):
+                if len(val) == len(old):  # a changed bucket layout can't be summed; keep the first
+                    dst[key] = [a + b for a, b in zip(old, val)]
+            else:
+                dst[key] = old + val
+
+
+_process: Tuple[int, str] = (0, "")
+
+
+def _process_tag() -> str:
+    """`<pid>-<nonce>`, fresh in every process (forked children included)."""
+    global _process
+    pid = os.getpid()
+    if _process[0] != pid:
+        _process = (pid, f"{pid}-{int(time.time())}-{uuid.uuid4().hex[:8]}")
+    return _process[1]
+
+
+def _file(directory: str) -> Path:
+    return Path(directory) / f"metrics-{_process_tag()}.json"
+
+
+def write_snapshot(directory: Optional[str] = None) -> None:
+    """Write this process's counts where the other workers' `render()` can read them."""
+    directory = directory or METRICS_DIR
+    if not directory:
+        return
+    path = _file(directory)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(f".tmp{threading.get_ident()}")
+    tmp.write_text(json.dumps(snapshot()), encoding="utf-8")
+    os.replace(tmp, path)  # readers see the old file or the new one, never half of one
+
+
+def collect(directory: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+    """Counts summed over every process that wrote to `directory` (just this one without it)."""
+    directory = directory or METRICS_DIR
+    if not directory:
+        return snapshot()
+    write_snapshot(directory)
+    merged: Dict[str, Dict[str, Any]] = {}
+    for path in sorted(Path(directory).glob("metrics-*.json")):
+        try:
+            _merge(merged, json.loads(path.read_text(encoding="utf-8")))
+        except (OSError, ValueError):
+            continue  # a worker's file mid-replace on a filesystem without atomic rename
+    return merged
+
+
+def _fmt(v: float) -> str:
+    return "+Inf" if v == float("inf") else repr(float(v))
+
+
+def _labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(v: str) -> str:
+    return v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def render(directory: Optional[str] = None) -> str:
+    """The exposition text for /metrics."""
+    data = collect(directory)
+    lines: List[str] = []
+    for m in registry:
+        lines.append(f"# HELP {m.name} {m.help}")
+        lines.append(f"# TYPE {m.name} {m.kind}")
+        for key, val in sorted(data.get(m.name, {}).items()):
+            values = json.loads(key)
+            if m.kind == "counter":
+                lines.append(f"{m.name}{_labels(m.labelnames, values)} {_fmt(val)}")
+                continue
+            *counts, total = val
+            cum = 0
+            for bound, c in zip(list(m.buckets) + [float("inf")], counts):
+                cum += c
+                le = 'le="%s"' % _fmt(bound)
+                lines.append(f"{m.name}_bucket{_labels(m.labelnames, values, le)} {cum}")
+            lines.append(f"{m.name}_sum{_labels(m.labelnames, values)} {_fmt(total)}")
+            lines.append(f"{m.name}_count{_labels(m.labelnames, values)} {cum}")
+    return "\n".join(lines) + "\n"
+
+
+# --- request timing ---
+
+def route_template(scope) -> str:
+    """The matched route's path template, include_router prefix and all.
+
+    Templates, not raw paths, so ids in URLs can't grow the label set. Routes
+    of an included router may carry only their own path, without the prefix,
+    so the prefix is recovered from the concrete path the route matched.
+    """
+    route = scope.get("route")
+    template = getattr(route, "path", None)
+    if template is None:
+        return "unmatched"
+    try:
+        rendered = getattr(route, "path_format", template).format(**scope.get("path_params", {}))
+    except (KeyError, IndexError, ValueError):
+        return template
+    path = scope.get("path", "")
+    return path[:len(path) - len(rendered)] + template if path.endswith(rendered) else template
+
+
+class MetricsMiddleware:
+    """ASGI middleware: observes REQUEST_SECONDS per matched route when the
+    last body chunk is sent, so streamed responses are timed to the end."""
+
+    def __init__(self, app, prefix: str = "/api"):
+        self.app = app
+        self.prefix = prefix
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope.get("path", "").startswith(self.prefix):
+            return await self.app(scope, receive, send)
+        t0 = time.perf_counter()
+        state = {"status": "500", "done": False}  # 500: what an exception before the response start becomes
+
+        def observe() -> None:
+            if not state["done"]:
+                state["done"] = True
+                REQUEST_SECONDS.observe(time.perf_counter() - t0, route_template(scope), state["status"])
+
+        async def timed_send(message):
+            if message["type"] == "http.response.start":
+                state["status"] = str(message["status"])
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body"):
+                observe()
+
+        try:
+            await self.app(scope, receive, timed_send)
+        finally:
+            observe()  # errors, and clients that went away mid-stream
+
+
+# --- background flush ---
+
+def _flush_loop() -> None:
+    while True:
+        time.sleep(METRICS_FLUSH_S)
+        try:
+            write_snapshot()
+        except OSError:
+            pass
+
+
+if METRICS_DIR:
+    threading.Thread(target=_flush_loop, name="metrics-flush", daemon=True).start()
+    atexit.register(write_snapshot)
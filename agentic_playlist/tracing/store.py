@@ -0,0 +1,122 @@
+"""Trace files on disk: naming, formats, rotation and retention.
+
+Two formats share one append-only model:
+
+    .jsonl   one JSON span per line (served as-is under /traces)
+    .m2t     b"M2PTRC01" then blocks of  u32 length | zlib(JSON lines)
+
+Each writer batch becomes one .m2t block, so the file stays appendable and
+readable while a run is in flight. `read_trace()` reads either format:
+
+    python -m agentic_playlist.tracing.store agentic_playlist/traces/agent-run-cozy-seed42-v0.m2t
+"""
+from __future__ import annotations
+import argparse, json, os, re, struct, sys, time, zlib
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+
+MAGIC = b"M2PTRC01"
+SUFFIXES = {"jsonl": ".jsonl", "binary": ".m2t"}
+
+
+def trace_name(prefix: str, key: str, seed: int, variant: int, fmt: str = "jsonl") -> str:
+    """File name for a run; free-text moods are slugged (and hashed when lossy)."""
+    slug = re.sub(r"[^a-z0-9]+", "-", key.lower()).strip("-")[:40] or "empty"
+    if slug != key:
+        slug = f"{slug}-{zlib.crc32(key.encode('utf-8')):08x}"
+    return f"{prefix}-{slug}-seed{seed}-v{variant}{SUFFIXES[fmt]}"
+
+
+def append_records(path: Path, recs: List[Dict[str, Any]]) -> None:
+    if path.suffix == SUFFIXES["binary"]:
+        block = zlib.compress("".join(json.dumps(r, separators=(",", ":")) + "\n" for r in recs).encode("utf-8"))
+        with open(path, "ab") as f:
+            if f.tell() == 0:
+                f.write(MAGIC)
+            f.write(struct.pack("<I", len(block)) + block)
+    else:
+        with open(path, "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(r) + "\n" for r in recs))
+
+
+def read_trace(path: Path | str) -> Iterator[Dict[str, Any]]:
+    """Spans of a .jsonl or .m2t trace, in write order."""
+    path = Path(path)
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            f.seek(0)
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+            return
+        while True:
+            head = f.read(4)
+            if len(head) < 4:
+                return
+            (n,) = struct.unpack("<I", head)
+            block = f.read(n)
+            if len(block) < n:
+                return  # torn tail from a crash mid-append
+            for line in zlib.decompress(block).splitlines():
+                yield json.loads(line)
+
+
+def rotate_if_needed(path: Path, max_bytes: int | None, max_age_s: float | None) -> Path | None:
+    """Move `path` aside once it is too big or too old; returns the rotated name."""
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return None
+    too_big = bool(max_bytes) and st.st_size >= max_bytes
+    too_old = bool(max_age_s) and time.time() - st.st_mtime >= max_age_s
+    if not (too_big or too_old):
+        return None
+    stem = path.name[: -len(path.suffix)] if path.suffix else path.name
+    rotated = path.with_name(f"{stem}.{time.time_ns()}{path.suffix}")
+    os.replace(path, rotated)
+    return rotated
+
+
+def sweep(directory: Path | str, max_age_s: float | None = None, max_files: int | None = None,
+          max_bytes: int | None = None) -> Dict[str, int]:
+    """Delete trace files older than `max_age_s`, then oldest-first until under the count/size caps."""
+    directory = Path(directory)
+    files = []
+    for p in directory.iterdir() if directory.exists() else []:
+        if p.is_file() and p.suffix in SUFFIXES.values():
+            try:
+                st = p.stat()
+            except FileNotFoundError:
+                continue
+            files.append((st.st_mtime, st.st_size, p))
+    files.sort()  # oldest first
+    now = time.time()
+    removed = freed = 0
+    total = sum(size for _, size, _ in files)
+    count = len(files)
+    for mtime, size, p in files:
+        expired = bool(max_age_s) and now - mtime >= max_age_s
+        over = (bool(max_files) and count > max_files) or (bool(max_bytes) and total > max_bytes)
+        if not (expired or over):
+            continue
+        try:
+            p.unlink()
+        except FileNotFoundError:
+            pass
+        removed += 1
+        freed += size
+        count -= 1
+        total -= size
+    return {"removed": removed, "freed_bytes": freed, "files": count, "bytes": total}
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="Print a trace (.jsonl or .m2t) as JSON lines")
+    p.add_argument("path")
+    args = p.parse_args()
+    for rec in read_trace(args.path):
+        sys.stdout.write(json.dumps(rec) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,269 @@
 from __future__ import annotations
-import json, time
+import atexit, queue, random, threading, time
 from pathlib import Path
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Tuple
+
+from agentic_playlist.tracing.metrics import STAGE_SECONDS
+from agentic_playlist.tracing.store import append_records, rotate_if_needed
+
+# Cost of tracing as seen by the caller (the event loop, for API requests)
+# and what the background writer did with it.
+trace_stats: Dict[str, Any] = {
+    "spans": 0,
+    "span_s_total": 0.0,   # time spent inside Tracer.span()
+    "span_us_max": 0.0,
+    "written": 0,
+    "batches": 0,
+    "dropped": 0,
+    "sync_fallbacks": 0,   # spans written inline because the queue was full
+    "queue_max": 0,
+    "write_errors": 0,
+    "runs_kept": 0,
+    "runs_sampled_out": 0,
+    "rotations": 0,
+}
+
+# span statuses that force a sampled-out run's trace to be kept
+ERROR_STATUSES = {"error", "timeout"}
+
+_sample_rng = random.Random()
+_ROTATE = object()  # queue marker: rotate the file before the next append
+_SPAN_SECONDS = STAGE_SECONDS.labels("trace_span")
+
+
+class TraceWriter:
+    """One background thread appending queued spans, batched per file.
+
+    A single FIFO and a single writer keep every file's lines in `span()`
+    order. When the queue is full `overflow="drop"` discards the span (the
+    tracer records a `tracer.dropped` marker at its next flush) and
+    `overflow="sync"` writes it inline instead, trading loop time for
+    completeness.
+    """
+
+    def __init__(self, max_queue: int = 10000, batch: int = 512, overflow: str = "drop"):
+        if overflow not in ("drop", "sync"):
+            raise ValueError(f"unknown overflow policy {overflow!r}")
+        self.max_queue = max_queue
+        self.batch = batch
+        self.overflow = overflow
+        self._q: "queue.Queue[Tuple[Any, Any]]" = queue.Queue()  # bounded by hand, see put()
+        self._lock = threading.Lock()
+        self._file_locks: Dict[Path, threading.Lock] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+
+    def _file_lock(self, path: Path) -> threading.Lock:
+        with self._lock:
+            return self._file_locks.setdefault(path, threading.Lock())
+
+    def _ensure_thread(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name="trace-writer", daemon=True)
+                    self._thread.start()
+
+    def put(self, path: Path, rec: Dict[str, Any], force: bool = False) -> bool:
+        """Queue one record; False if it was dropped."""
+        if self._closed:
+            self._apply(path, [rec])
+            return True
+        if not force and self._q.qsize() >= self.max_queue:
+            if self.overflow == "drop":
+                trace_stats["dropped"] += 1
+                return False
+            trace_stats["sync_fallbacks"] += 1
+            # inline writes must not overtake what is already queued for this file
+            self.flush()
+            self._apply(path, [rec])
+            return True
+        self._ensure_thread()
+        self._q.put((path, rec))
+        trace_stats["queue_max"] = max(trace_stats["queue_max"], self._q.qsize())
+        return True
+
+    def flush(self, timeout: float | None = 5.0) -> bool:
+        """Block until everything queued before this call is on disk."""
+        if self._thread is None or not self._thread.is_alive():
+            return self._q.empty()
+        done = threading.Event()
+        self._q.put((None, done))
+        return done.wait(timeout)
+
+    def close(self, timeout: float | None = 5.0) -> None:
+        self.flush(timeout)
+        self._closed = True
+
+    def _apply(self, path: Path, recs: List[Any]) -> None:
+        """Append records to `path`, honouring rotation markers in queue order."""
+        try:
+            with self._file_lock(path):
+                _append(path, recs)
+        except OSError:
+            trace_stats["write_errors"] += 1
+
+    def _run(self) -> None:
+        while True:
+            items = [self._q.get()]
+            while len(items) < self.batch:
+                try:
+                    items.append(self._q.get_nowait())
+                except queue.Empty:
+                    break
+            by_path: Dict[Path, List[Dict[str, Any]]] = {}
+            waiters = []
+            for path, rec in items:
+                if path is None:
+                    waiters.append(rec)
+                else:
+                    by_path.setdefault(path, []).append(rec)
+            for path, recs in by_path.items():
+                self._apply(path, recs)
+            trace_stats["batches"] += 1
+            for w in waiters:
+                w.set()
+
+
+def _append(path: Path, recs: List[Any]) -> None:
+    run: List[Dict[str, Any]] = []
+    for rec in recs:
+        if isinstance(rec, tuple) and rec[0] is _ROTATE:
+            if run:
+                append_records(path, run)
+                trace_stats["written"] += len(run)
+                run = []
+            if rotate_if_needed(path, *rec[1:]) is not None:
+                trace_stats["rotations"] += 1
+        else:
+            run.append(rec)
+    if run:
+        append_records(path, run)
+        trace_stats["written"] += len(run)
+
+
+_writer: Optional[TraceWriter] = None
+
+
+def get_writer() -> TraceWriter:
+    global _writer
+    if _writer is None:
+        from agentic_playlist.config import tracing_config
+
+        cfg = tracing_config()
+        _writer = TraceWriter(max_queue=cfg["queue_max"], batch=cfg["batch"], overflow=cfg["overflow"])
+    return _writer
+
+
+def shutdown_writer(timeout: float | None = 5.0) -> None:
+    if _writer is not None:
+        _writer.close(timeout)
+
+
+atexit.register(shutdown_writer)
+
 
 class Tracer:
-    def __init__(self, path: Path | str):
+    """Spans for one run, appended to `path` (.jsonl or .m2t, see tracing.store).
+
+    `sample_rate` < 1 keeps only that share of runs. With `sampling="head"`
+    the decision is made up front and a sampled-out run writes nothing but
+    its error spans; with `"tail"` spans are held until `finish()` and the
+    whole run is kept if it was sampled or anything went wrong.
+    """
+
+    def __init__(self, path: Path | str, buffered: bool = False, writer: TraceWriter | None = None,
+                 sample_rate: float = 1.0, sampling: str = "head",
+                 rotate_bytes: int | None = None, rotate_age_s: float | None = None):
+        if sampling not in ("head", "tail"):
+            raise ValueError(f"unknown sampling mode {sampling!r}")
         self.path = Path(path)
         self.path.parent.mkdir(parents=True, exist_ok=True)
         self._span_id = 0
+        self.buffered = buffered
+        self._writer = writer if writer is not None else (get_writer() if buffered else None)
+        self._dropped = 0
+        self.sampled = sample_rate >= 1 or _sample_rng.random() < sample_rate
+        self._hold: List[Dict[str, Any]] | None = [] if sampling == "tail" and not self.sampled else None
+        self._errored = False
+        self._written = 0
+        self.kept: bool | None = None  # set by finish()
+        if rotate_bytes or rotate_age_s:
+            self._put((_ROTATE, rotate_bytes, rotate_age_s), force=True)
+
+    def _put(self, rec: Any, force: bool = False) -> bool:
+        if self._writer is None:
+            _append(self.path, [rec])
+            return True
+        return self._writer.put(self.path, rec, force=force)
 
     def span(self, agent: str, tool: str, details: Optional[Dict[str, Any]] = None, status: str = 'ok') -> None:
-        self._span_id += 1
-        rec = {
-            'span_id': self._span_id,
-            'ts': time.time(),
-            'agent': agent,
-            'tool': tool,
-            'status': status,
-            'details': details or {},
-        }
-        with open(self.path, 'a', encoding='utf-8') as f:
-            f.write(json.dumps(rec) + '\n')
+        t0 = time.perf_counter()
+        error = status in ERROR_STATUSES
+        self._errored |= error
+        if self.sampled or error or self._hold is not None:
+            rec = {
+                'span_id': self._span_id + 1,
+                'ts': time.time(),
+                'agent': agent,
+                'tool': tool,
+                'status': status,
+                'details': details or {},
+            }
+            if self._hold is not None:
+                self._hold.append(rec)
+                self._span_id += 1
+            elif self._put(rec):
+                self._span_id += 1  # dropped spans don't consume an id, so ids stay gapless
+                self._written += 1
+            else:
+                self._dropped += 1
+        else:
+            self._span_id += 1  # head-sampled out: ids still count every span
+        dt = time.perf_counter() - t0
+        trace_stats["spans"] += 1
+        trace_stats["span_s_total"] += dt
+        trace_stats["span_us_max"] = max(trace_stats["span_us_max"], dt * 1e6)
+        _SPAN_SECONDS.observe(dt)
+
+    def finish(self, error: bool = False) -> bool:
+        """End of run: settle tail sampling. Returns whether a trace file was written."""
+        if self.kept is not None:
+            return self.kept
+        if self._hold is not None:
+            hold, self._hold = self._hold, None
+            if error or self._errored:
+                for rec in hold:
+                    if self._put(rec, force=True):
+                        self._written += 1
+        self.kept = self.sampled or self._written > 0
+        trace_stats["runs_kept" if self.kept else "runs_sampled_out"] += 1
+        return self.kept
+
+    def _note_drops(self) -> None:
+        if self._dropped:
+            self._span_id += 1
+            self._writer.put(self.path, {
+                'span_id': self._span_id,
+                'ts': time.time(),
+                'agent': 'tracer',
+                'tool': 'tracer.dropped',
+                'status': 'dropped',
+                'details': {'count': self._dropped},
+            }, force=True)
+            self._dropped = 0
+
+    def flush(self, timeout: float | None = 5.0) -> bool:
+        """Wait until this run's spans are on disk (no-op when unbuffered)."""
+        if self._writer is None:
+            return True
+        self._note_drops()
+        return self._writer.flush(timeout)
+
+    async def aflush(self, timeout: float | None = 5.0) -> bool:
+        """`flush()` from a coroutine without blocking the event loop."""
+        if self._writer is None:
+            return True
+        import asyncio
+
+        return await asyncio.to_thread(self.flush, timeout)
@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 import os, time, re
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Sequence
 import random
 import httpx
 from fastapi import FastAPI, HTTPException, Query
@@ -11,10 +11,27 @@ from dotenv import load_dotenv
 from fastapi import FastAPI
 #from backend.spotify_client import spotify_get, shutdown_http  # NEW shared client
 from backend.mood_map import MOOD_PRESETS
+from backend.search import build_queries_from_genres
+from backend.pagination import PagePlan, iter_plan, run_plan, run_plans_shared, yield_stats
+from backend.streaming import stream_response
+from backend.prefetch import Prefetcher, WARM_ON_STARTUP
+from backend.vibe import resolve_mood, vibe_memo_stats
+from backend.cache import spotify_cache
+from backend import spotify_client
+from backend.spotify_client import shutdown_http
+from agentic_playlist.tracing.tracer import shutdown_writer, trace_stats
+from agentic_playlist.tracing import metrics
+from agentic_playlist.tracing.metrics import SPOTIFY_SECONDS, SPOTIFY_UPSTREAM, STAGE_SECONDS, MetricsMiddleware
+from backend import scheduler
+from backend.catalog_index import get_index
+from backend.http_client import get_client, pool_stats
+from backend import profiler
+from backend.profiler import ProfilingMiddleware, loop_stats
 #from mood_map import MOOD_PRESETS
 from pathlib import Path
 from pathlib import Path
 from fastapi.staticfiles import StaticFiles
+from fastapi.responses import PlainTextResponse
 
 # --- env ---
 load_dotenv()
@@ -38,14 +55,18 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(ProfilingMiddleware)  # request attribution for /api/debug/profile
+app.add_middleware(MetricsMiddleware)  # per-route latency for /metrics
 app.mount(
     "/traces",
     StaticFiles(directory="agentic_playlist/traces"),
     name="traces",
 )
 # --- Agent Mode routes ---
-from backend.routers.agentic import router as agentic_router
+from backend.routers.agentic import router as agentic_router, run_cache as agentic_run_cache
 app.include_router(agentic_router, prefix="/api/agentic", tags=["agentic"])
+from backend.routers.debug import router as debug_router
+app.include_router(debug_router, prefix="/api/debug", tags=["debug"])
 
 
 # --- models ---
@@ -62,40 +83,54 @@ class RecommendResponse(BaseModel):
     mood: str
     count: int
     tracks: List[Track] = Field(default_factory=list)
+    metrics: Dict[str, Any] = Field(default_factory=dict)  # search calls, calls per delivered track
 
-# --- http + token cache ---
-_http: Optional[httpx.AsyncClient] = None
-_token: Dict[str, Any] = {"access_token": None, "expires_at": 0}
+class BatchItem(BaseModel):
+    mood: str
+    limit: int = Field(12, ge=1, le=50)
+    variant: int = Field(0, ge=0)
+
+class BatchRequest(BaseModel):
+    items: List[BatchItem] = Field(..., min_length=1, max_length=64)
+    nocache: bool = False
+
+class BatchResponse(BaseModel):
+    items: List[RecommendResponse] = Field(default_factory=list)
+    pages: int            # search calls the items planned
+    upstream_calls: int   # calls actually made after sharing windows
 
+# --- http + token ---
 async def http() -> httpx.AsyncClient:
-    global _http
-    if _http is None:
-        _http = httpx.AsyncClient(timeout=30)
-    return _http
+    # one pooled client for the whole backend (see backend.http_client)
+    return await get_client()
 
 async def get_token() -> str:
-    now = time.time()
-    if _token["access_token"] and now < _token["expires_at"] - 30:
-        return _token["access_token"]
-    client = await http()
-    r = await client.post(
-        "https://accounts.spotify.com/api/token",
-        data={"grant_type": "client_credentials"},
-        auth=(CLIENT_ID, CLIENT_SECRET),
-    )
-    if r.status_code != 200:
-        raise HTTPException(status_code=502, detail=f"Spotify auth failed: {r.text}")
-    data = r.json()
-    _token["access_token"] = data["access_token"]
-    _token["expires_at"] = now + int(data.get("expires_in", 3600))
-    return _token["access_token"]
+    # single-flight refresh + background renewal live in the shared manager
+    with STAGE_SECONDS.time("token"):
+        return await spotify_client.token_manager.get()
+
+async def spotify_get(path: str, params: dict | None = None, cache: bool = True) -> dict:
+    # cache=False skips the lookup (and in-flight join) but refreshes the entry
+    key = spotify_cache.make_key(path, params)
+    t0, status = time.perf_counter(), "error"
+    try:
+        out = await spotify_cache.get_or_fetch(key, lambda: _spotify_fetch(path, params), bypass=not cache)
+        status = "200"
+        return out
+    except HTTPException as e:
+        status = str(e.status_code)
+        raise
+    finally:
+        SPOTIFY_SECONDS.observe(time.perf_counter() - t0, path.strip("/"), status)
 
-async def spotify_get(path: str, params: dict | None = None) -> dict:
+async def _spotify_fetch(path: str, params: dict | None = None) -> dict:
     token = await get_token()
     headers = {"Authorization": f"Bearer {token}", "Accept": "application/json"}
     client = await http()
-    url = f"https://api.spotify.com/v1/{path.strip('/')}"
-    r = await client.get(url, headers=headers, params=params)
+    url = f"{spotify_client.API_BASE}/{path.strip('/')}"
+    # rate budget, Retry-After and 429/5xx retries live in the shared scheduler
+    r = await scheduler.spotify_scheduler.send(lambda: client.get(url, headers=headers, params=params))
+    SPOTIFY_UPSTREAM.inc(path.strip("/"), r.status_code)
     if r.status_code != 200:
         body = r.text
         try:
@@ -107,58 +142,10 @@ async def spotify_get(path: str, params: dict | None = None) -> dict:
     return r.json()
 
 # --- Vibe Parser ---
-# Rule-based scoring: map free-text to a vibe profile, then to seed genres.
-LEX = {
-    "cozy": {"words": {"fireplace","blanket","candle","warm","cocoa","snow","reading","rain","chai"}, "genres": ["acoustic","singer-songwriter","indie","folk","chill","lo-fi","piano"]},
-    "focus": {"words": {"study","focus","deep work","flow","concentrate","essay","reading"}, "genres": ["lo-fi","ambient","piano","classical","chill"]},
-    "party": {"words": {"club","dancefloor","party","friday","dj","festival","rave", "dance"}, "genres": ["dance","edm","house","pop","hip-hop"]},
-    "hype": {"words": {"gym","workout","max","pr","anthem","hype","run"}, "genres": ["edm","electro","dance","hip-hop","pop"]},
-    "sad": {"words": {"heartbreak","alone","cry","melancholy","nostalgic","blue", "sad"}, "genres": ["indie","indie-pop","singer-songwriter","alt-rock","pop"]},
-    "romantic": {"words": {"date","romantic","kiss","slow","candlelight","valentine", "love"}, "genres": ["r-n-b","soul","latin","pop","indie-pop"]},
-    "dark": {"words": {"noir","brooding","night","storm","industrial"}, "genres": ["industrial","electro","rock","trap","alt-rock"]},
-    "rage": {"words": {"rage","sprint","angry","angry gym","metal","mosh", "rock", "hard rock"}, "genres": ["rock","metal","trap","alt-rock","edm"]},
-}
-
-DEFAULT_GENRES = ["pop","indie","singer-songwriter","chill"]
-
-def parse_vibe(text: str) -> List[str]:
-    """Return a list of seed genres inferred from free-text."""
-    s = (text or "").lower()
-    # Shortcut seasonal/scene cues
-    if any(w in s for w in ["fireplace","snow","blanket","cocoa","candle","knit","sweater","winter"]):
-        return ["acoustic","singer-songwriter","indie","folk","chill","piano"][:3]
-    if any(w in s for w in ["rain","rainy","monsoon"]):
-        return ["lo-fi","indie","chill","ambient","piano"][:3]
-    if any(w in s for w in ["gym","lift","sprint","pr","max","preworkout"]):
-        return ["edm","electro","hip-hop","dance","pop"][:3]
-    if any(w in s for w in ["club","night out","party","rave","dj"]):
-        return ["dance","edm","house","pop","hip-hop"][:3]
-
-    # Score-based: count lexicon hits
-    scores: Dict[str,int] = {}
-    for label, conf in LEX.items():
-        hits = sum(1 for w in conf["words"] if w in s)
-        if hits:
-            scores[label] = hits
-    if scores:
-        # pick top label
-        label = max(scores, key=scores.get)
-        return LEX[label]["genres"][:3]
-
-    # Fallback
-    return DEFAULT_GENRES[:3]
+# LEX, shortcut cues and the compiled matcher live in backend.vibe
 
 # --- Query builder & search ---
-
-def build_queries_from_genres(seed_genres: List[str]) -> List[str]:
-    sg = [g for g in (seed_genres or [])][:3] or ["pop"]
-    # Build 2–4 queries using only genre filters; avoid title keyword bias entirely
-    queries: List[str] = []
-    for g in sg:
-        queries.append(f'genre:"{g}"')
-    if len(sg) >= 2:
-        queries.append("(" + " OR ".join([f'genre:"{g}"' for g in sg[:2]]) + ")")
-    return queries
+# build_queries_from_genres lives in backend.search (shared with spotify_client)
 '''
 async def search_tracks_by_genre_only(seed_genres: List[str], limit: int) -> List[Track]:
     queries = build_queries_from_genres(seed_genres)
@@ -197,56 +184,57 @@ async def search_tracks_by_genre_only(seed_genres: List[str], limit: int) -> Lis
                 return results
     return results
 '''
-async def search_tracks_by_genre_only(seed_genres: List[str], limit: int, variant: int = 0) -> List[Track]:
-    # deterministic RNG based on variant so the same variant -> same set (debuggable)
-    rng = random.Random(variant)
+def _search_plan(
+    seed_genres: List[str], limit: int, variant: int = 0, queries: Sequence[str] | None = None
+) -> PagePlan:
+    # deterministic in `variant` alone (rotation + start offset), no RNG involved
 
-    queries = build_queries_from_genres(seed_genres)
+    # callers holding a memoized MoodResolution pass its prebuilt queries
+    queries = list(queries) if queries is not None else build_queries_from_genres(seed_genres)
     if queries:
         # rotate query order based on variant, so different starting genre each time
         r = variant % len(queries)
         queries = queries[r:] + queries[:r]
+    # offsets and page sizes are chosen by the planner (see backend.pagination)
+    return PagePlan(queries, limit, variant, market="US")
 
-    seen: set[str] = set()
-    results: List[Track] = []
-    per_call = min(max(limit, 1), 20)
+async def search_tracks_by_genre_only(
+    seed_genres: List[str], limit: int, variant: int = 0, concurrency: int | None = None, cache: bool = True,
+    queries: Sequence[str] | None = None, plan: PagePlan | None = None,
+) -> List[Track]:
+    plan = plan or _search_plan(seed_genres, limit, variant, queries)
+    await run_plan(spotify_get, plan, concurrency=concurrency, cache=cache)
+    return [_to_track(t) for t in plan.tracks]
 
-    # use offset to paginate within Spotify search results without changing query
-    # keep it modest; most searches have useful results within first few hundred
-    base_offset = (variant * 7) % 120  # 0..119, step of 7 to jump pages
+async def stream_tracks_by_genre_only(
+    seed_genres: List[str], limit: int, variant: int = 0, concurrency: int | None = None, cache: bool = True,
+    queries: Sequence[str] | None = None, plan: PagePlan | None = None,
+):
+    """Same tracks as `search_tracks_by_genre_only`, each yielded once the pages before it are in."""
+    plan = plan or _search_plan(seed_genres, limit, variant, queries)
+    async for t in iter_plan(spotify_get, plan, concurrency, cache):
+        yield _to_track(t)
 
-    for i, q in enumerate(queries):
-        data = await spotify_get(
-            "search",
-            params={
-                "q": q,
-                "type": "track",
-                "limit": per_call,
-                "offset": base_offset + i * 5,  # nudge each query differently
-                "market": "US",
-            },
-        )
-        for t in data.get("tracks", {}).get("items", []):
-            tid = t.get("id")
-            if not tid or tid in seen:
-                continue
-            seen.add(tid)
-            images = (t.get("album", {}).get("images") or [])
-            img = images[0]["url"] if images else ""
-            results.append(
-                Track(
-                    id=tid,
-                    name=t.get("name", ""),
-                    artists=", ".join(a.get("name", "") for a in t.get("artists", [])),
-                    album=t.get("album", {}).get("name", ""),
-                    image=img,
-                    preview_url=t.get("preview_url"),
-                    spotify_url=t.get("external_urls", {}).get("spotify"),
-                )
-            )
-            if len(results) >= limit:
-                return results
-    return results
+def _to_track(t: dict) -> Track:
+    images = (t.get("album", {}).get("images") or [])
+    img = images[0]["url"] if images else ""
+    return Track(
+        id=t["id"],
+        name=t.get("name", ""),
+        artists=", ".join(a.get("name", "") for a in t.get("artists", [])),
+        album=t.get("album", {}).get("name", ""),
+        image=img,
+        preview_url=t.get("preview_url"),
+        spotify_url=t.get("external_urls", {}).get("spotify"),
+    )
+
+# --- prefetch ---
+async def _prefetch(key: str, limit: int, variant: int) -> None:
+    # same params (and so the same cache keys) as /api/recommend for that variant
+    res = resolve_mood(key)
+    await search_tracks_by_genre_only(list(res.seed_genres), limit, variant=variant, queries=res.queries)
+
+prefetcher = Prefetcher(_prefetch, busy=lambda: scheduler.spotify_scheduler.stats["queue_depth"] > 0)
 
 # --- routes ---
 @app.get("/api/health")
@@ -256,7 +244,27 @@ async def health():
         await get_token()
     except HTTPException:
         token_ok = False
-    return {"ok": True, "token": token_ok, "moods": len(MOOD_PRESETS)}
+    return {
+        "ok": True,
+        "token": token_ok,
+        "moods": len(MOOD_PRESETS),
+        "cache": spotify_cache.stats,
+        "auth": spotify_client.token_manager.stats,
+        "http": pool_stats,
+        "scheduler": scheduler.spotify_scheduler.stats,
+        "catalog_index": get_index().stats if get_index() else None,
+        "vibe_memo": vibe_memo_stats(),
+        "tracing": trace_stats,
+        "prefetch": {**prefetcher.stats, "hit_rate": prefetcher.hit_rate},
+        "agentic_cache": agentic_run_cache.stats,
+        "pagination": yield_stats.stats,
+        "event_loop": loop_stats,
+    }
+
+@app.get("/metrics")
+def prometheus_metrics():
+    # sync: reading the other workers' snapshot files runs in the threadpool, off the loop
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
 
 @app.get("/api/moods")
 async def moods():
@@ -267,18 +275,62 @@ async def recommend(
     mood: str = Query(...),
     limit: int = Query(12, ge=1, le=50),
     variant: int = Query(0, ge=0),  # NEW
+    nocache: bool = Query(False),
 ):
     key = (mood or "").strip().lower()
-    preset = MOOD_PRESETS.get(key)
-    if preset:
-        seed_genres = preset.get("seed_genres", [])
-        parsed_from = "preset"
-    else:
-        seed_genres = parse_vibe(key)
-        parsed_from = "vibe"
+    res = resolve_mood(key)  # preset or memoized vibe parse
+    prefetcher.note_request(key, limit, variant)
 
-    tracks = await search_tracks_by_genre_only(seed_genres, limit, variant=variant)  # pass variant
-    return RecommendResponse(mood=f"{key} ({parsed_from})", count=len(tracks), tracks=tracks)
+    plan = _search_plan(list(res.seed_genres), limit, variant, res.queries)
+    tracks = await search_tracks_by_genre_only(
+        list(res.seed_genres), limit, variant=variant, cache=not nocache, plan=plan
+    )  # pass variant
+    if not nocache:
+        prefetcher.after_serve(key, limit, variant)  # the next shuffle click is predictable
+    return RecommendResponse(mood=f"{key} ({res.parsed_from})", count=len(tracks), tracks=tracks, metrics=plan.metrics)
+
+@app.post("/api/recommend/batch", response_model=BatchResponse)
+async def recommend_batch(req: BatchRequest):
+    """Many `/api/recommend` calls in one: shared genre queries are fetched once."""
+    plans = []
+    for item in req.items:
+        key = (item.mood or "").strip().lower()
+        res = resolve_mood(key)
+        plans.append((key, res, _search_plan(list(res.seed_genres), item.limit, item.variant, res.queries)))
+    calls = await run_plans_shared(spotify_get, [p for _, _, p in plans], cache=not req.nocache)
+    out = []
+    for key, res, plan in plans:
+        tracks = [_to_track(t) for t in plan.tracks]
+        out.append(RecommendResponse(mood=f"{key} ({res.parsed_from})", count=len(tracks), tracks=tracks,
+                                     metrics=plan.metrics))
+    return BatchResponse(items=out, pages=sum(p.calls for _, _, p in plans), upstream_calls=calls)
+
+@app.get("/api/recommend/stream")
+async def recommend_stream(
+    mood: str = Query(...),
+    limit: int = Query(12, ge=1, le=50),
+    variant: int = Query(0, ge=0),
+    nocache: bool = Query(False),
+    format: str = Query("sse", pattern="^(sse|ndjson)$"),
+):
+    """`/api/recommend` as a stream: one `track` event per track, then a `summary`."""
+    key = (mood or "").strip().lower()
+    res = resolve_mood(key)
+    prefetcher.note_request(key, limit, variant)
+
+    async def events():
+        count = 0
+        plan = _search_plan(list(res.seed_genres), limit, variant, res.queries)
+        async for t in stream_tracks_by_genre_only(
+            list(res.seed_genres), limit, variant=variant, cache=not nocache, plan=plan
+        ):
+            count += 1
+            yield "track", t.model_dump()
+        if not nocache:
+            prefetcher.after_serve(key, limit, variant)
+        yield "summary", {"mood": f"{key} ({res.parsed_from})", "count": count, "metrics": plan.metrics}
+
+    return stream_response(events(), format)
 
 '''
 @app.get("/api/recommend", response_model=RecommendResponse)
@@ -298,9 +350,16 @@ async def recommend(mood: str = Query(...), limit: int = Query(12, ge=1, le=50))
     return RecommendResponse(mood=f"{key} ({parsed_from})", count=len(tracks), tracks=tracks)
 '''
 
+@app.on_event("startup")
+async def _startup():
+    profiler.start_watchdog()  # LOOP_WATCHDOG=1 only
+    if WARM_ON_STARTUP:
+        # variant 0 of every preset, in the background so startup isn't blocked
+        prefetcher.start_warm(MOOD_PRESETS)
+
 @app.on_event("shutdown")
 async def _shutdown():
-    global _http
-    if _http is not None:
-        await _http.aclose()
-        _http = None
\ No newline at end of file
+    prefetcher.cancel()
+    profiler.shutdown()
+    await shutdown_http()
+    shutdown_writer()
\ No newline at end of file
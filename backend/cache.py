@@ -0,0 +1,348 @@
+from __future__ import annotations
+import abc, asyncio, json, os, sqlite3, tempfile, threading, time
+from collections import OrderedDict
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+
+class CacheBackend(abc.ABC):
+    """Storage for JSON-able values with a per-entry TTL.
+
+    Backends own eviction and keep `evictions` / `expired` counters in
+    `stats`; `ResponseCache` adds hit/miss accounting and single-flight on top.
+    Code on the event loop goes through `aget` / `aset`, which a backend that
+    blocks on I/O overrides to run off the loop.
+    """
+
+    def __init__(self) -> None:
+        self.stats: Dict[str, int] = {"evictions": 0, "expired": 0}
+
+    @abc.abstractmethod
+    def get(self, key: str) -> Any:
+        ...
+
+    @abc.abstractmethod
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        ...
+
+    @abc.abstractmethod
+    def delete(self, key: str) -> None:
+        ...
+
+    @abc.abstractmethod
+    def clear(self) -> None:
+        ...
+
+    @abc.abstractmethod
+    def __len__(self) -> int:
+        ...
+
+    async def aget(self, key: str) -> Any:
+        return self.get(key)
+
+    async def aset(self, key: str, value: Any, ttl: float) -> None:
+        self.set(key, value, ttl)
+
+
+class MemoryBackend(CacheBackend):
+    """Per-process LRU bounded by entry count and approximate JSON size."""
+
+    def __init__(self, max_entries: int = 2048, max_bytes: int = 32 * 1024 * 1024):
+        super().__init__()
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._data: "OrderedDict[str, Tuple[float, int, Any]]" = OrderedDict()  # key -> (expires_at, size, value)
+        self._bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    def get(self, key: str) -> Any:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, _, value = entry
+        if expires_at <= time.monotonic():
+            self._drop(key)
+            self.stats["expired"] += 1
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        size = len(json.dumps(value, separators=(",", ":")))
+        if size > self.max_bytes:
+            return
+        if key in self._data:
+            self._drop(key)
+        self._data[key] = (time.monotonic() + ttl, size, value)
+        self._bytes += size
+        while len(self._data) > self.max_entries or self._bytes > self.max_bytes:
+            self._drop(next(iter(self._data)))
+            self.stats["evictions"] += 1
+
+    def delete(self, key: str) -> None:
+        if key in self._data:
+            self._drop(key)
+
+    def clear(self) -> None:
+        self._data.clear()
+        self._bytes = 0
+
+    def _drop(self, key: str) -> None:
+        _, size, _ = self._data.pop(key)
+        self._bytes -= size
+
+
+class SQLiteBackend(CacheBackend):
+    """Cache shared by every worker process on the host through one SQLite file.
+
+    Uses wall-clock expiry so entries written by one process are valid in the
+    others. Trimming is oldest-written first, down to `max_entries` and to
+    `max_bytes` of stored JSON, checked every `trim_every` sets, so reads
+    never have to write. `aget` / `aset` run in a worker thread: a query can
+    wait up to `timeout` seconds on another worker's write lock.
+    """
+
+    def __init__(self, path: Path | str, table: str = "responses", max_entries: int = 20000,
+                 max_bytes: int = 256 * 1024 * 1024, trim_every: int = 256):
+        super().__init__()
+        self.path = Path(path)
+        self.table = table
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.trim_every = trim_every
+        self._sets = 0
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.path), timeout=5, isolation_level=None, check_same_thread=False)
+        try:
+            os.chmod(self.path, 0o600)  # holds the client-credentials token too
+        except OSError:
+            pass
+        self._db.execute("PRAGMA journal_mode=WAL").fetchall()
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} (key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+            f"expires_at REAL NOT NULL, stored_at REAL NOT NULL)"
+        )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute(f"SELECT COUNT(*) FROM {self.table}").fetchall()[0][0]
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            # fetchall() so the statement completes; a half-read cursor keeps a
+            # read transaction open and hides other workers' writes
+            rows = self._db.execute(f"SELECT value, expires_at FROM {self.table} WHERE key = ?", (key,)).fetchall()
+            if not rows:
+                return None
+            row = rows[0]
+            if row[1] <= time.time():
+                self._db.execute(f"DELETE FROM {self.table} WHERE key = ? AND expires_at <= ?", (key, time.time()))
+                self.stats["expired"] += 1
+                return None
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        blob = json.dumps(value, separators=(",", ":"))
+        if len(blob) > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at, stored_at) VALUES (?, ?, ?, ?)",
+                (key, blob, now + ttl, now),
+            )
+            self._sets += 1
+            if self._sets % self.trim_every == 0:
+                self._trim(now)
+
+    async def aget(self, key: str) -> Any:
+        return await asyncio.to_thread(self.get, key)
+
+    async def aset(self, key: str, value: Any, ttl: float) -> None:
+        await asyncio.to_thread(self.set, key, value, ttl)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._db.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._db.execute(f"DELETE FROM {self.table}")
+
+    def _trim(self, now: float) -> None:
+        cur = self._db.execute(f"DELETE FROM {self.table} WHERE expires_at <= ?", (now,))
+        self.stats["expired"] += max(cur.rowcount, 0)
+        cur = self._db.execute(
+            f"DELETE FROM {self.table} WHERE key IN (SELECT key FROM {self.table} "
+            f"ORDER BY stored_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+        self.stats["evictions"] += max(cur.rowcount, 0)
+        cur = self._db.execute(
+            f"DELETE FROM {self.table} WHERE key IN (SELECT key FROM (SELECT key, "
+            f"SUM(length(value)) OVER (ORDER BY stored_at DESC, key) AS total FROM {self.table}) WHERE total > ?)",
+            (self.max_bytes,),
+        )
+        self.stats["evictions"] += max(cur.rowcount, 0)
+
+
+# Set while speculative work (backend.prefetch) fills the cache: the entries
+# it stores are remembered, and the first later lookup that one of them
+# serves is reported back through `served(key)`. Per process, like single-flight.
+speculation: ContextVar[Any] = ContextVar("cache_speculation", default=None)
+
+
+class ResponseCache:
+    """TTL cache for Spotify GET responses on top of a `CacheBackend`.
+
+    Identical in-flight fetches are collapsed so a cold key only costs one
+    upstream call per process. Values from the memory backend are shared
+    between callers and must be treated as read-only.
+    """
+
+    def __init__(
+        self,
+        backend: CacheBackend | None = None,
+        ttl: float = 600.0,
+        max_entries: int = 2048,
+        max_bytes: int = 32 * 1024 * 1024,
+    ):
+        self.backend = backend if backend is not None else MemoryBackend(max_entries=max_entries, max_bytes=max_bytes)
+        self.ttl = ttl
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._speculative: "OrderedDict[str, Any]" = OrderedDict()  # key -> who stored it, until served
+        self._remember = max_entries
+        self.stats = self.backend.stats
+        self.stats.update(hits=0, misses=0, coalesced=0)
+
+    @staticmethod
+    def make_key(path: str, params: Optional[dict] = None) -> str:
+        items = sorted((str(k), str(v)) for k, v in (params or {}).items() if v is not None)
+        return path.strip("/") + "?" + "&".join(f"{k}={v}" for k, v in items)
+
+    def __len__(self) -> int:
+        return len(self.backend)
+
+    def get(self, key: str) -> Any:
+        value = self.backend.get(key)
+        self._count(key, value)
+        return value
+
+    def set(self, key: str, value: Any, ttl: float | None = None) -> None:
+        self.backend.set(key, value, self.ttl if ttl is None else ttl)
+
+    async def aget(self, key: str) -> Any:
+        """`get` for code on the event loop."""
+        value = await self.backend.aget(key)
+        self._count(key, value)
+        return value
+
+    async def aset(self, key: str, value: Any, ttl: float | None = None) -> None:
+        await self.backend.aset(key, value, self.ttl if ttl is None else ttl)
+
+    def clear(self) -> None:
+        self.backend.clear()
+        self._speculative.clear()
+
+    def _count(self, key: str, value: Any) -> None:
+        if value is None:
+            self.stats["misses"] += 1
+            return
+        self.stats["hits"] += 1
+        self._served(key)
+
+    def _served(self, key: str) -> None:
+        if self._speculative and speculation.get() is None:
+            spec = self._speculative.pop(key, None)
+            if spec is not None:
+                spec.served(key)
+
+    def _stored(self, key: str) -> None:
+        spec = speculation.get()
+        if spec is None:
+            self._speculative.pop(key, None)  # a live fetch replaced it
+            return
+        self._speculative[key] = spec
+        self._speculative.move_to_end(key)
+        while len(self._speculative) > self._remember:
+            self._speculative.popitem(last=False)
+        spec.stored(key)
+
+    async def get_or_fetch(
+        self, key: str, fetch: Callable[[], Awaitable[Any]], ttl: float | None = None, bypass: bool = False
+    ) -> Any:
+        """Return a cached value or run `fetch` once for all concurrent callers.
+
+        `bypass=True` skips the lookup and in-flight join but still stores the
+        fresh result.
+        """
+        if not bypass:
+            value = await self.aget(key)
+            if value is not None:
+                return value
+            fut = self._inflight.get(key)
+            if fut is not None:
+                self.stats["coalesced"] += 1
+                try:
+                    value = await asyncio.shield(fut)
+                    self._served(key)
+                    return value
+                except asyncio.CancelledError:
+                    if not fut.cancelled():
+                        raise
+                    # the leading request was cancelled; fetch on our own
+                    return await self.get_or_fetch(key, fetch, ttl)
+
+        fut = asyncio.get_running_loop().create_future()
+        if not bypass:
+            self._inflight[key] = fut
+        try:
+            value = await fetch()
+        except asyncio.CancelledError:
+            fut.cancel()
+            raise
+        except BaseException as e:
+            fut.set_exception(e)
+            fut.exception()  # mark retrieved; followers still get it raised
+            raise
+        else:
+            self._stored(key)
+            fut.set_result(value)  # followers don't wait on the store
+            await self.aset(key, value, ttl)
+            return value
+        finally:
+            if self._inflight.get(key) is fut:
+                del self._inflight[key]
+
+
+def make_backend(table: str, max_entries: int, max_bytes: int) -> CacheBackend:
+    """Pick the backend from SPOTIFY_CACHE_BACKEND (`memory` or `sqlite`)."""
+    kind = os.getenv("SPOTIFY_CACHE_BACKEND", "memory").lower()
+    if kind == "sqlite":
+        path = os.getenv("SPOTIFY_CACHE_PATH") or str(Path(tempfile.gettempdir()) / "mood2playlist-cache.sqlite3")
+        return SQLiteBackend(path, table=table, max_entries=max_entries, max_bytes=max_bytes)
+    if kind != "memory":
+        raise RuntimeError(f"Unknown SPOTIFY_CACHE_BACKEND: {kind}")
+    return MemoryBackend(max_entries=max_entries, max_bytes=max_bytes)
+
+
+_MAX_ENTRIES = int(os.getenv("SPOTIFY_CACHE_MAX_ENTRIES", "2048"))
+_MAX_BYTES = int(os.getenv("SPOTIFY_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+
+spotify_cache = ResponseCache(
+    backend=make_backend("responses", _MAX_ENTRIES, _MAX_BYTES),
+    ttl=float(os.getenv("SPOTIFY_CACHE_TTL", "600")),
+)
+
+# client-credentials token, kept apart so search traffic can never evict it
+TOKEN_KEY = "spotify:client_credentials"
+token_store = make_backend("tokens", 8, 64 * 1024)
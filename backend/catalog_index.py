@@ -0,0 +1,207 @@
+"""Offline snapshot of Spotify search results, served in place of live calls.
+
+The ingestion job pages every preset query into a compact JSON file:
+
+    python -m backend.catalog_index --out backend/data/catalog.json --depth 200
+
+At runtime `fetch_pages` asks the active index first; a page is served
+locally only when the snapshot covers the requested `offset`/`limit`
+window, otherwise the call falls through to live search.
+"""
+from __future__ import annotations
+import argparse, asyncio, hashlib, json, os, time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+DEFAULT_PATH = Path(__file__).resolve().parent / "data" / "catalog.json"
+COLUMNAR_PATH = DEFAULT_PATH.with_suffix(".m2p")  # see backend.track_store
+MAX_PAGE = 50  # Spotify's per-call search limit
+
+# compact row layout: [id, name, artists, album, image, preview_url, spotify_url]
+ID, NAME, ARTISTS, ALBUM, IMAGE, PREVIEW, URL = range(7)
+
+
+def compact(t: dict) -> list:
+    images = (t.get("album", {}).get("images") or [])
+    return [
+        t["id"],
+        t.get("name", ""),
+        [a.get("name", "") for a in t.get("artists", [])],
+        t.get("album", {}).get("name", ""),
+        images[0]["url"] if images else "",
+        t.get("preview_url"),
+        t.get("external_urls", {}).get("spotify"),
+    ]
+
+
+def expand(row: list) -> dict:
+    """Rebuild the subset of Spotify's track object the backend reads."""
+    return {
+        "id": row[ID],
+        "name": row[NAME],
+        "artists": [{"name": a} for a in row[ARTISTS]],
+        "album": {"name": row[ALBUM], "images": [{"url": row[IMAGE]}] if row[IMAGE] else []},
+        "preview_url": row[PREVIEW],
+        "external_urls": {"spotify": row[URL]} if row[URL] else {},
+    }
+
+
+class CatalogIndex:
+    def __init__(self, tracks: Dict[str, list], queries: Dict[str, Dict[str, Any]], market: str = "US",
+                 created_at: float = 0.0, version: str = ""):
+        self.tracks = tracks            # track id -> compact row
+        self.queries = queries          # query -> {"ids": [...], "exhausted": bool}
+        self.market = market
+        self.created_at = created_at
+        self.version = version
+        # inverted index genre -> track ids, in Spotify's result order
+        self.genres: Dict[str, List[str]] = {}
+        for q, entry in queries.items():
+            if q.startswith('genre:"') and q.count('genre:') == 1:
+                self.genres[q[len('genre:"'):-1]] = entry["ids"]
+        self.stats = {"hits": 0, "misses": 0}
+
+    def page(self, params: Dict[str, Any]) -> Optional[dict]:
+        """Spotify-shaped search response for `params`, or None to go live."""
+        entry = self.queries.get(params.get("q", ""))
+        if (
+            entry is None
+            or params.get("type", "track") != "track"
+            or params.get("market", self.market) != self.market
+        ):
+            self.stats["misses"] += 1
+            return None
+        offset, limit = int(params.get("offset", 0)), int(params.get("limit", 20))
+        ids = entry["ids"]
+        if offset + limit > len(ids) and not entry["exhausted"]:
+            self.stats["misses"] += 1  # snapshot isn't deep enough for this window
+            return None
+        self.stats["hits"] += 1
+        items = [expand(self.tracks[tid]) for tid in ids[offset:offset + limit]]
+        return {"tracks": {"items": items, "offset": offset, "limit": limit}}
+
+    def tracks_for_genre(self, genre: str) -> List[str]:
+        return self.genres.get(genre, [])
+
+    @classmethod
+    def load(cls, path: Path | str) -> "CatalogIndex":
+        raw = Path(path).read_bytes()
+        data = json.loads(raw)
+        return cls(
+            tracks=data["tracks"],
+            queries=data["queries"],
+            market=data.get("market", "US"),
+            created_at=data.get("created_at", 0.0),
+            version=hashlib.sha1(raw).hexdigest()[:12],
+        )
+
+    def save(self, path: Path | str) -> None:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        body = {"market": self.market, "created_at": self.created_at, "queries": self.queries, "tracks": self.tracks}
+        tmp.write_text(json.dumps(body, separators=(",", ":")), encoding="utf-8")
+        os.replace(tmp, path)  # readers never see a half-written snapshot
+
+
+_index: Optional[CatalogIndex] = None
+_loaded = False
+
+
+def get_index() -> Optional[CatalogIndex]:
+    """The snapshot at CATALOG_INDEX_PATH (or a default path), if one exists."""
+    global _index, _loaded
+    if not _loaded:
+        _loaded = True
+        if os.getenv("CATALOG_INDEX", "1") != "0":
+            path = Path(os.getenv("CATALOG_INDEX_PATH", str(DEFAULT_PATH)))
+            if not path.exists() and path == DEFAULT_PATH and COLUMNAR_PATH.exists():
+                path = COLUMNAR_PATH
+            if path.exists():
+                _index = load_catalog(path)
+    return _index
+
+
+def load_catalog(path: Path | str):
+    """Open either snapshot format: the mmapped columnar store or the JSON index."""
+    from backend.track_store import TrackStore, is_track_store
+
+    return TrackStore(path) if is_track_store(path) else CatalogIndex.load(path)
+
+
+def set_index(index: Optional[CatalogIndex]) -> None:
+    global _index, _loaded
+    _index, _loaded = index, True
+
+
+def seed_lists() -> List[List[str]]:
+    """Every seed-genre list the API can produce: presets plus vibe parser outputs."""
+    from backend.mood_map import MOOD_PRESETS
+    from backend.vibe import LEX, DEFAULT_GENRES, SHORTCUTS
+
+    lists = [p["seed_genres"] for p in MOOD_PRESETS.values()]
+    lists += [conf["genres"][:3] for conf in LEX.values()]
+    lists += [genres[:3] for _, genres in SHORTCUTS]
+    lists.append(DEFAULT_GENRES[:3])
+    return lists
+
+
+async def ingest(seed_genre_lists: Iterable[List[str]], depth: int = 200, market: str = "US") -> CatalogIndex:
+    from backend.search import build_queries_from_genres
+    from backend.spotify_client import spotify_get
+    from backend.scheduler import BATCH, lane
+
+    queries: List[str] = []
+    for sg in seed_genre_lists:
+        for q in build_queries_from_genres(sg):
+            if q not in queries:
+                queries.append(q)
+
+    tracks: Dict[str, list] = {}
+    snap: Dict[str, Dict[str, Any]] = {}
+
+    async def one(q: str) -> None:
+        ids: List[str] = []
+        exhausted = False
+        for offset in range(0, depth, MAX_PAGE):
+            limit = min(MAX_PAGE, depth - offset)
+            data = await spotify_get("search", params={"q": q, "type": "track", "limit": limit, "offset": offset, "market": market})
+            items = data.get("tracks", {}).get("items", [])
+            for t in items:
+                if t and t.get("id"):
+                    tracks.setdefault(t["id"], compact(t))
+                    ids.append(t["id"])
+            if len(items) < limit:
+                exhausted = True
+                break
+        snap[q] = {"ids": ids, "exhausted": exhausted}
+
+    with lane(BATCH):
+        await asyncio.gather(*(one(q) for q in queries))
+    return CatalogIndex(tracks, {q: snap[q] for q in queries}, market=market, created_at=time.time())
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="Snapshot Spotify search results into a local catalog index")
+    p.add_argument("--out", type=str, default=str(DEFAULT_PATH))
+    p.add_argument("--depth", type=int, default=200, help="tracks kept per query (covers variant offsets)")
+    p.add_argument("--genres", action="append", default=[], help="extra comma-separated seed list; repeatable")
+    args = p.parse_args()
+
+    from backend.spotify_client import shutdown_http
+
+    lists = seed_lists() + [g.split(",") for g in args.genres]
+
+    async def run() -> CatalogIndex:
+        try:
+            return await ingest(lists, depth=args.depth)
+        finally:
+            await shutdown_http()
+
+    index = asyncio.run(run())
+    index.save(args.out)
+    print(f"Wrote {args.out}: {len(index.queries)} queries, {len(index.tracks)} tracks")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+from __future__ import annotations
+import asyncio, importlib.util, os, time
+from typing import Any, Dict, Optional
+import httpx
+
+# HTTP/2 needs the optional `h2` package (httpx[http2]); fall back to 1.1 without it.
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+# Time spent waiting for a free pooled connection, as seen by httpcore.
+pool_stats: Dict[str, Any] = {"requests": 0, "wait_ms_total": 0.0, "wait_ms_max": 0.0, "slow_waits": 0}
+SLOW_POOL_WAIT_MS = float(os.getenv("SPOTIFY_HTTP_SLOW_POOL_WAIT_MS", "10"))
+
+_client: Optional[httpx.AsyncClient] = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None
+_closer: Optional[asyncio.Task] = None
+
+
+def _env_float(name: str, default: float) -> float:
+    return float(os.getenv(name, str(default)))
+
+
+def client_settings() -> Dict[str, Any]:
+    """Pool, timeout and protocol settings, overridable through SPOTIFY_HTTP_* env vars."""
+    return {
+        "limits": httpx.Limits(
+            max_connections=int(os.getenv("SPOTIFY_HTTP_MAX_CONNECTIONS", "100")),
+            max_keepalive_connections=int(os.getenv("SPOTIFY_HTTP_MAX_KEEPALIVE", "20")),
+            keepalive_expiry=_env_float("SPOTIFY_HTTP_KEEPALIVE_EXPIRY", 30.0),
+        ),
+        "timeout": httpx.Timeout(
+            connect=_env_float("SPOTIFY_HTTP_CONNECT_TIMEOUT", 3.0),
+            read=_env_float("SPOTIFY_HTTP_READ_TIMEOUT", 10.0),
+            write=_env_float("SPOTIFY_HTTP_WRITE_TIMEOUT", 5.0),
+            pool=_env_float("SPOTIFY_HTTP_POOL_TIMEOUT", 2.0),
+        ),
+        "http2": HTTP2_AVAILABLE and os.getenv("SPOTIFY_HTTP2", "1") != "0",
+    }
+
+
+async def _mark_pool_wait(request: httpx.Request) -> None:
+    # The first httpcore trace event (connect or send headers) fires once a
+    # connection slot is ours; the gap since the request hook is the pool wait.
+    t0 = time.perf_counter()
+    seen = False
+
+    async def trace(event_name: str, info: dict) -> None:
+        nonlocal seen
+        if seen:
+            return
+        seen = True
+        ms = (time.perf_counter() - t0) * 1000
+        pool_stats["requests"] += 1
+        pool_stats["wait_ms_total"] += ms
+        if ms > pool_stats["wait_ms_max"]:
+            pool_stats["wait_ms_max"] = ms
+        if ms >= SLOW_POOL_WAIT_MS:
+            pool_stats["slow_waits"] += 1
+
+    request.extensions["trace"] = trace
+
+
+def create_client(**overrides: Any) -> httpx.AsyncClient:
+    settings = client_settings()
+    settings.update(overrides)
+    hooks = settings.pop("event_hooks", {})
+    hooks = {**hooks, "request": [_mark_pool_wait, *hooks.get("request", [])]}
+    return httpx.AsyncClient(event_hooks=hooks, **settings)
+
+
+async def _close_with_loop(client: httpx.AsyncClient) -> None:
+    # Parked until the loop shuts down: asyncio.run cancels pending tasks before
+    # closing the loop, which is the last point the pool's sockets can be closed.
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await client.aclose()
+
+
+async def _discard(client: httpx.AsyncClient) -> None:
+    if client.is_closed:
+        return
+    try:
+        await client.aclose()
+    except RuntimeError:
+        pass  # its loop is already closed; the sockets go with it
+
+
+async def get_client() -> httpx.AsyncClient:
+    """The backend-wide client; created lazily on first use."""
+    global _client, _client_loop, _closer
+    loop = asyncio.get_running_loop()
+    # pooled connections belong to the loop that opened them (matters for CLI/tests)
+    if _client is None or _client.is_closed or _client_loop is not loop:
+        if _client is not None:
+            await _discard(_client)
+        _client, _client_loop = create_client(), loop
+        _closer = loop.create_task(_close_with_loop(_client))
+    return _client
+
+
+async def close_client() -> None:
+    global _client, _closer
+    if _closer is not None and _client_loop is asyncio.get_running_loop():
+        _closer.cancel()
+    _closer = None
+    if _client is not None:
+        await _client.aclose()
+        _client = None
@@ -0,0 +1,268 @@
+"""Adaptive pagination for genre searches: few calls, same answer per variant.
+
+What a request returns is fixed by (queries, limit, variant) alone. Every
+query is read from `start_offset(variant)` in blocks of `BLOCK` results,
+round-robin in query order, and the first `limit` tracks with an unseen id
+are the answer. A query that runs out (a short page, or `MAX_DEPTH` results
+read) drops out of the rotation.
+
+`PagePlan` only decides how much of each query to fetch. It estimates how
+far into that rotation `limit` unique tracks lie from per-query yield rates
+(the share of a query's results that were new when read) learned across
+requests. Queries the walk is not expected to reach are not called. A short
+fall is topped up in another round, and a surplus costs nothing but page
+size. Learning changes how many calls a request makes, never its tracks.
+"""
+from __future__ import annotations
+import asyncio, math, os
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence
+
+from backend.catalog_index import MAX_PAGE
+from backend.search import SpotifyGet, fetch_pages, fetch_pages_shared, iter_pages
+
+BLOCK = int(os.getenv("PAGINATION_BLOCK", "5"))  # results read from one query before moving to the next
+MAX_DEPTH = int(os.getenv("PAGINATION_MAX_DEPTH", "200"))  # results read per query at most
+VARIANT_SPAN = 120  # start offsets cycle through the first results, where relevance is
+PRIOR_YIELD = 0.7   # yield assumed for a query never seen before
+SLACK = 1.25        # fetch this much beyond the estimate; a bigger page is cheaper than a second round
+
+
+class YieldStats:
+    """EWMA per query of the share of its results that were new to the request."""
+
+    def __init__(self, alpha: float = 0.2, max_entries: int = 4096, prior: float = PRIOR_YIELD):
+        self.alpha = alpha
+        self.max_entries = max_entries
+        self.prior = prior
+        self._rates: "OrderedDict[str, float]" = OrderedDict()
+
+    def rate(self, query: str) -> float:
+        return self._rates.get(query, self.prior)
+
+    def observe(self, query: str, new: int, read: int) -> None:
+        if not read:
+            return
+        old = self._rates.get(query)
+        r = new / read
+        self._rates[query] = r if old is None else old + self.alpha * (r - old)
+        self._rates.move_to_end(query)
+        while len(self._rates) > self.max_entries:
+            self._rates.popitem(last=False)
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        return {"queries": len(self._rates), "rates": {q: round(r, 3) for q, r in list(self._rates.items())[-16:]}}
+
+
+yield_stats = YieldStats()
+
+
+def start_offset(variant: int, limit: int, n_queries: int) -> int:
+    """Where every query starts reading: one rotation's share per variant step."""
+    per_query = BLOCK * math.ceil(max(limit, 1) / (BLOCK * max(n_queries, 1)))
+    return (variant * per_query) % VARIANT_SPAN
+
+
+class PagePlan:
+    def __init__(self, queries: Sequence[str], limit: int, variant: int = 0, market: str = "US",
+                 stats: YieldStats | None = None, target: int | None = None):
+        self.queries = list(dict.fromkeys(queries))
+        self.limit = limit
+        # tracks to size the next round for; a lazy consumer (`iter_plan`) that
+        # keeps pulling past it doubles it, up to `limit`
+        self.target = min(limit, target or limit)
+        self.market = market
+        self.stats = stats if stats is not None else yield_stats
+        self.start = start_offset(variant, limit, len(self.queries))
+        n = len(self.queries)
+        self._pages: List[Dict[int, Any]] = [{} for _ in range(n)]  # offset -> items or exception
+        self._items: List[List[dict]] = [[] for _ in range(n)]  # contiguous results from `start`
+        self._ended = [False] * n  # no results past _items
+        self._failed: List[Optional[BaseException]] = [None] * n  # error right after _items
+        self._asked = [self.start] * n  # fetched or in flight up to this offset
+        self._taken = [0] * n  # results of each query already walked
+        self._new = [0] * n
+        self._turn = 0
+        self._seen: set[str] = set()
+        self.tracks: List[dict] = []
+        self.origin: Dict[str, str] = {}  # track id -> the query it was taken from
+        self.calls = 0
+        self.rounds = 0
+        self.done = not self.queries or limit <= 0
+        self._learned = False
+
+    # --- fetching ---
+
+    def next_calls(self) -> List[Dict[str, Any]]:
+        """Search params for the next round; [] once the answer is settled."""
+        if self.done:
+            return []
+        if len(self.tracks) >= self.target:
+            self.target = min(self.limit, max(2 * self.target, len(self.tracks) + BLOCK))
+        want = self._estimate()
+        calls = []
+        for q, end in enumerate(want):
+            end = min(end, self.start + MAX_DEPTH)
+            off = self._asked[q]
+            while off < end and not self._ended[q]:
+                lim = min(MAX_PAGE, end - off)
+                calls.append({"q": self.queries[q], "type": "track", "limit": lim, "offset": off, "market": self.market})
+                off += lim
+            self._asked[q] = max(self._asked[q], off)
+        if not calls:  # nothing left to read anywhere: settle with what we have
+            self._finish()
+            return []
+        self.calls += len(calls)
+        self.rounds += 1
+        return calls
+
+    def _estimate(self) -> List[int]:
+        """Offset each query should be fetched to, walking the rotation on expected yields."""
+        need = (self.target - len(self.tracks)) * SLACK
+        reach = [self.start + t for t in self._taken]
+        live = [not self._exhausted_at(q, reach[q]) for q in range(len(self.queries))]
+        turn, expected = self._turn, 0.0
+        while expected < need and any(live):
+            q = turn % len(self.queries)
+            turn += 1
+            if not live[q]:
+                continue
+            reach[q] += BLOCK
+            expected += BLOCK * self.stats.rate(self.queries[q])
+            live[q] = reach[q] - self.start < MAX_DEPTH and not self._exhausted_at(q, reach[q])
+        return reach
+
+    def _exhausted_at(self, q: int, offset: int) -> bool:
+        return self._ended[q] and offset >= self.start + len(self._items[q])
+
+    def add(self, params: Dict[str, Any], page: Any) -> List[dict]:
+        """Record one fetched page; returns the tracks it settled, in answer order."""
+        q = self.queries.index(params["q"])
+        off = int(params["offset"])
+        if isinstance(page, BaseException):
+            self._pages[q][off] = page
+        else:
+            items = page.get("tracks", {}).get("items", [])
+            self._pages[q][off] = items
+            if len(items) < int(params["limit"]):
+                self._pages[q][off + len(items)] = None  # end of results
+        self._absorb(q)
+        return self._walk()
+
+    def _absorb(self, q: int) -> None:
+        pages, items = self._pages[q], self._items[q]
+        while not self._ended[q] and self._failed[q] is None:
+            off = self.start + len(items)
+            if off not in pages:
+                return
+            got = pages.pop(off)
+            if isinstance(got, BaseException):
+                self._failed[q] = got
+            elif not got:  # the end marker, or an empty page
+                self._ended[q] = True
+            else:
+                items.extend(got)
+            if len(items) >= MAX_DEPTH:
+                del items[MAX_DEPTH:]
+                self._ended[q] = True
+
+    # --- the answer ---
+
+    def _walk(self) -> List[dict]:
+        out: List[dict] = []
+        n = len(self.queries)
+        while not self.done:
+            if len(self.tracks) >= self.limit:
+                self._finish()
+                break
+            q, skipped = self._turn % n, 0
+            while self._exhausted_at(q, self.start + self._taken[q]):
+                skipped += 1
+                if skipped == n:  # every query has run out
+                    self._finish()
+                    return out
+                self._turn += 1
+                q = self._turn % n
+            items, taken = self._items[q], self._taken[q]
+            if len(items) < taken + BLOCK and not self._ended[q]:
+                if self._failed[q] is not None:
+                    raise self._failed[q]  # only once the answer actually needs that page
+                return out  # wait for more of q
+            for t in items[taken:taken + BLOCK]:
+                self._taken[q] += 1
+                tid = t.get("id")
+                if not tid or tid in self._seen:
+                    continue
+                self._seen.add(tid)
+                self.origin[tid] = self.queries[q]
+                self._new[q] += 1
+                self.tracks.append(t)
+                out.append(t)
+                if len(self.tracks) >= self.limit:
+                    break
+            self._turn += 1
+        return out
+
+    def _finish(self) -> None:
+        self.done = True
+        if not self._learned:
+            self._learned = True
+            for q, query in enumerate(self.queries):
+                self.stats.observe(query, self._new[q], self._taken[q])
+
+    @property
+    def metrics(self) -> Dict[str, Any]:
+        n = len(self.tracks)
+        return {"search_calls": self.calls, "rounds": self.rounds, "tracks": n,
+                "calls_per_track": round(self.calls / n, 3) if n else None}
+
+
+async def run_plan(get: SpotifyGet, plan: PagePlan, concurrency: int | None = None, cache: bool = True) -> PagePlan:
+    """Fetch rounds until `plan` is settled; `plan.tracks` is the answer."""
+    while True:
+        calls = plan.next_calls()
+        if not calls:
+            return plan
+        for params, page in zip(calls, await fetch_pages(get, calls, concurrency=concurrency, cache=cache)):
+            plan.add(params, page)
+
+
+async def iter_plan(get: SpotifyGet, plan: PagePlan, concurrency: int | None = None,
+                    cache: bool = True) -> AsyncIterator[dict]:
+    """`run_plan`, yielding each answer track as soon as the pages before it are in.
+
+    Rounds are fetched only when the consumer asks for more than has landed,
+    so one that stops early never pays for the rest of `limit`.
+    """
+    while True:
+        calls = plan.next_calls()
+        if not calls:
+            return
+        pages = iter_pages(get, calls, concurrency, cache)
+        try:
+            i = 0
+            async for page in pages:
+                for t in plan.add(calls[i], page):
+                    yield t
+                i += 1
+                if plan.done:
+                    return
+        finally:
+            await pages.aclose()
+
+
+async def run_plans_shared(get: SpotifyGet, plans: List[PagePlan], concurrency: int | None = None,
+                           cache: bool = True) -> int:
+    """`run_plan` for many plans at once, each round's calls shared across them
+    (see `fetch_pages_shared`); returns the number of upstream calls made."""
+    upstream = 0
+    while True:
+        rounds = [p.next_calls() for p in plans]
+        if not any(rounds):
+            return upstream
+        pages, n = await fetch_pages_shared(get, rounds, concurrency=concurrency, cache=cache)
+        upstream += n
+        for plan, calls, got in zip(plans, rounds, pages):
+            for params, page in zip(calls, got):
+                plan.add(params, page)
@@ -0,0 +1,155 @@
+"""Speculative fetches that keep the response cache ahead of the shuffle flow.
+
+After `/api/recommend` serves (mood, variant=n) the next click asks for n+1,
+whose offsets are fully predictable, so `Prefetcher.after_serve` fetches
+n+1..n+ahead in the background. `Prefetcher.warm` does the same for every
+preset at variant 0 on startup. Both run in the BATCH lane, behind a small
+semaphore, and stand down while interactive calls are queued for budget.
+
+`pages` counts the cache entries prefetches stored and `used` the ones a
+live request was then served from the cache (see `backend.cache.speculation`),
+so `hit_rate` is the share of speculative Spotify calls that paid off. With
+the shared SQLite cache, a hit in another worker isn't seen.
+"""
+from __future__ import annotations
+import asyncio, os
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, Optional, Set
+
+from backend.cache import speculation
+from backend.scheduler import BATCH, lane
+
+PREFETCH_AHEAD = int(os.getenv("PREFETCH_AHEAD", "1"))  # 2 also fetches n+2
+PREFETCH_CONCURRENCY = int(os.getenv("PREFETCH_CONCURRENCY", "2"))
+PREFETCH_MAX_PENDING = int(os.getenv("PREFETCH_MAX_PENDING", "32"))
+WARM_ON_STARTUP = os.getenv("WARM_ON_STARTUP", "1") != "0"
+WARM_LIMIT = int(os.getenv("WARM_LIMIT", "12"))  # /api/recommend's default limit
+
+Fetch = Callable[[str, int, int], Awaitable[Any]]  # (mood key, limit, variant)
+
+
+class Prefetcher:
+    def __init__(
+        self,
+        fetch: Fetch,
+        ahead: int = PREFETCH_AHEAD,
+        concurrency: int = PREFETCH_CONCURRENCY,
+        max_pending: int = PREFETCH_MAX_PENDING,
+        busy: Callable[[], bool] = lambda: False,
+        remember: int = 4096,
+    ):
+        self.fetch = fetch
+        self.ahead = ahead
+        self.concurrency = concurrency
+        self.max_pending = max_pending
+        self.busy = busy  # True while live traffic is waiting on the rate budget
+        self._sem: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self._inflight: Set[Hashable] = set()
+        self._done: "OrderedDict[Hashable, None]" = OrderedDict()  # prefetched, not yet requested
+        self._remember = remember
+        self.stats: Dict[str, Any] = {
+            "scheduled": 0,
+            "completed": 0,
+            "failed": 0,
+            "skipped_busy": 0,
+            "skipped_budget": 0,
+            "pages": 0,
+            "used": 0,
+            "warmed": 0,
+        }
+
+    def _reset_if_new_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop, self._sem = loop, asyncio.Semaphore(max(1, self.concurrency))
+            self._tasks, self._inflight = set(), set()
+
+    def note_request(self, key: str, limit: int, variant: int) -> bool:
+        """Record a live request; True if a prefetch had already fetched it."""
+        k = (key, limit, variant)
+        if k in self._done:
+            del self._done[k]  # may be prefetched again once it expires
+            return True
+        return False
+
+    # called by ResponseCache for entries stored under `speculation`
+    def stored(self, cache_key: str) -> None:
+        self.stats["pages"] += 1
+
+    def served(self, cache_key: str) -> None:
+        self.stats["used"] += 1
+
+    def after_serve(self, key: str, limit: int, variant: int) -> None:
+        """Schedule variants n+1..n+ahead of a request that was just served."""
+        for v in range(variant + 1, variant + 1 + self.ahead):
+            self.schedule(key, limit, v)
+
+    def schedule(self, key: str, limit: int, variant: int) -> bool:
+        self._reset_if_new_loop()
+        k = (key, limit, variant)
+        if k in self._done or k in self._inflight:
+            return False
+        if len(self._tasks) >= self.max_pending:
+            self.stats["skipped_budget"] += 1
+            return False
+        self.stats["scheduled"] += 1
+        self._inflight.add(k)
+        task = asyncio.create_task(self._run(k))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return True
+
+    async def _run(self, k: tuple) -> bool:
+        self._inflight.add(k)
+        try:
+            async with self._sem:
+                if self.busy():
+                    self.stats["skipped_busy"] += 1
+                    return False
+                token = speculation.set(self)
+                try:
+                    with lane(BATCH):
+                        await self.fetch(*k)
+                except Exception:
+                    self.stats["failed"] += 1
+                    return False
+                finally:
+                    speculation.reset(token)
+        finally:
+            self._inflight.discard(k)
+        self.stats["completed"] += 1
+        self._done[k] = None
+        self._done.move_to_end(k)
+        while len(self._done) > self._remember:
+            self._done.popitem(last=False)
+        return True
+
+    async def warm(self, keys: Iterable[str], limit: int = WARM_LIMIT) -> int:
+        """Fetch variant 0 of every key under the same limits; returns how many landed."""
+        self._reset_if_new_loop()
+        results = await asyncio.gather(*(self._run((k, limit, 0)) for k in keys))
+        self.stats["warmed"] += sum(results)
+        return sum(results)
+
+    def start_warm(self, keys: Iterable[str], limit: int = WARM_LIMIT) -> asyncio.Task:
+        """`warm()` as a tracked background task (cancelled by `cancel()`)."""
+        self._reset_if_new_loop()
+        task = asyncio.create_task(self.warm(list(keys), limit))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def drain(self) -> None:
+        if self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+    def cancel(self) -> None:
+        for task in list(self._tasks):
+            task.cancel()
+
+    @property
+    def hit_rate(self) -> float:
+        pages = self.stats["pages"]
+        return self.stats["used"] / pages if pages else 0.0
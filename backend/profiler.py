@@ -0,0 +1,321 @@
+"""On-demand sampling profiler and event-loop stall detector for live requests.
+
+Everything happens in one monitor thread beside the event loop, so the loop
+runs no profiling code of its own, apart from one heartbeat callback per
+tick and a dict write per request.
+
+Stacks: every `interval_ms`, `sys._current_frames()` gives the frame the loop
+thread is executing. The stack is folded root-first into `a;b;c` and
+counted, which is the collapsed format of flamegraph.pl and speedscope.
+Samples are rooted at the route of the request whose task was running; time
+in the selector is counted as `(idle)`.
+
+Stalls: each tick the monitor posts a heartbeat with `call_soon_threadsafe`.
+A heartbeat still unanswered after `block_ms` means a synchronous section is
+holding the loop, or a backlog long enough to have the same effect. The loop
+thread's stack is captured right then, while it is still inside the
+offender. Once the heartbeat lands, the stall is recorded with its full
+length, against the request whose task (or a task it spawned) was running.
+
+The monitor runs only during a profiling session. Start one with
+`POST /api/debug/profile` (see backend.routers.debug). A session ends after
+`seconds`, or after `requests` finished requests when that is set. With
+LOOP_WATCHDOG=1, stall detection stays on outside sessions. Sessions are per
+process: with several workers, profile the one that answers the POST.
+"""
+from __future__ import annotations
+import asyncio, itertools, os, sys, threading, time, weakref
+from collections import Counter, deque
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional
+
+from agentic_playlist.tracing.metrics import LOOP_BLOCKED_SECONDS, route_template
+
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN") or None  # unset: the debug routes answer 404
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_BLOCK_MS = float(os.getenv("PROFILE_BLOCK_MS", "50"))
+LOOP_WATCHDOG = os.getenv("LOOP_WATCHDOG", "0") != "0"
+MAX_SESSION_S = 300.0
+MAX_DEPTH = 96  # frames kept per stack, leaf side
+STALL_FRAMES = 12  # leaf frames kept in a stall record
+RECENT_STALLS = 64
+
+loop_stats: Dict[str, Any] = {"stalls": 0, "stall_ms_max": 0.0, "sessions": 0, "samples": 0}
+recent_stalls: Deque[Dict[str, Any]] = deque(maxlen=RECENT_STALLS)
+
+_IDLE_LEAVES = {"select", "poll", "epoll", "control", "_poll"}  # selector waits: the loop has nothing to do
+_ROOT = str(Path(__file__).resolve().parents[1])
+
+
+@dataclass
+class RequestInfo:
+    method: str
+    path: str
+    route: str = ""  # the route template, once routing has matched
+    stalls: List[Dict[str, Any]] = field(default_factory=list)
+
+    @property
+    def label(self) -> str:
+        return f"{self.method} {self.route or self.path}"
+
+
+_request: ContextVar[Optional[RequestInfo]] = ContextVar("profiled_request", default=None)
+
+
+def _frame_name(code) -> str:
+    path = code.co_filename
+    if path.startswith(_ROOT):
+        path = path[len(_ROOT) + 1:]
+    else:
+        path = "/".join(Path(path).parts[-2:])
+    return f"{code.co_name} ({path}:{code.co_firstlineno})"
+
+
+def fold(frame, depth: int = MAX_DEPTH) -> List[str]:
+    """Frame names from the root to `frame`, keeping the `depth` nearest the leaf."""
+    names: List[str] = []
+    while frame is not None and len(names) < depth:
+        names.append(_frame_name(frame.f_code))
+        frame = frame.f_back
+    names.reverse()
+    return names
+
+
+def _idle(frame) -> bool:
+    return frame is not None and frame.f_code.co_name in _IDLE_LEAVES and "selectors" in frame.f_code.co_filename
+
+
+class Session:
+    _ids = itertools.count(1)
+
+    def __init__(self, seconds: float, requests: int = 0, interval_ms: float = PROFILE_INTERVAL_MS,
+                 block_ms: float = PROFILE_BLOCK_MS):
+        self.id = next(self._ids)
+        self.interval_s = max(interval_ms, 0.5) / 1000
+        self.block_s = block_ms / 1000
+        self.started = time.time()
+        self.deadline = time.monotonic() + min(seconds, MAX_SESSION_S)
+        self.max_requests = requests
+        self.requests = 0
+        self.samples: Counter = Counter()
+        self.stalls: List[Dict[str, Any]] = []
+        self.ended: Optional[float] = None
+
+    @property
+    def running(self) -> bool:
+        return self.ended is None
+
+    def expired(self) -> bool:
+        return time.monotonic() >= self.deadline or bool(self.max_requests and self.requests >= self.max_requests)
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {n}\n" for stack, n in self.samples.most_common())
+
+    def report(self) -> Dict[str, Any]:
+        total = sum(self.samples.values())
+        idle = sum(n for s, n in self.samples.items() if s.endswith("(idle)"))
+        return {
+            "id": self.id,
+            "running": self.running,
+            "started": self.started,
+            "seconds": round((self.ended or time.time()) - self.started, 3),
+            "interval_ms": self.interval_s * 1000,
+            "block_ms": self.block_s * 1000,
+            "requests": self.requests,
+            "samples": total,
+            "busy_share": round(1 - idle / total, 3) if total else None,
+            "stalls": self.stalls,
+        }
+
+
+class LoopMonitor:
+    """The thread that samples and watches one event loop."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, interval_s: float, block_s: float):
+        self.loop = loop
+        self.interval_s = interval_s
+        self.block_s = block_s
+        self.session: Optional[Session] = None
+        self._loop_thread = threading.get_ident()  # built on the loop
+        self._tasks: "weakref.WeakKeyDictionary[asyncio.Task, RequestInfo]" = weakref.WeakKeyDictionary()
+        self._stop = threading.Event()
+        self._ping_sent: Optional[float] = None  # heartbeat in flight since
+        self._stall: Optional[Dict[str, Any]] = None  # captured while the loop is held
+        prev = loop.get_task_factory()
+        if isinstance(getattr(prev, "__self__", None), LoopMonitor):
+            prev = prev.__self__._prev_factory  # a monitor still closing: chain past it
+        self._prev_factory = prev
+        loop.set_task_factory(self._task_factory)
+        self._thread = threading.Thread(target=self._run, name="loop-monitor", daemon=True)
+        self._thread.start()
+
+    @property
+    def active(self) -> bool:
+        return not self._stop.is_set()
+
+    # --- on the loop ---
+
+    def _task_factory(self, loop, coro, **kw):
+        if self._prev_factory is not None:
+            task = self._prev_factory(loop, coro, **kw)
+        else:
+            task = asyncio.Task(coro, loop=loop, **kw)
+        info = _request.get()  # the creating task's context
+        if info is not None:
+            self._tasks[task] = info
+        return task
+
+    def track(self, info: RequestInfo) -> None:
+        task = asyncio.current_task()
+        if task is not None:
+            self._tasks[task] = info
+
+    def _pong(self, sent: float) -> None:
+        waited = time.monotonic() - sent
+        stall, self._stall = self._stall, None
+        self._ping_sent = None
+        if stall is not None or waited >= self.block_s:
+            self._record(stall or {"route": "-", "stack": []}, waited)
+
+    def _record(self, stall: Dict[str, Any], waited: float) -> None:
+        info = stall.pop("_info", None)
+        if info is not None:
+            stall["route"] = info.label  # routing may have matched since the capture
+            info.stalls.append(stall)
+        stall["ms"] = round(waited * 1000, 1)
+        loop_stats["stalls"] += 1
+        loop_stats["stall_ms_max"] = max(loop_stats["stall_ms_max"], stall["ms"])
+        recent_stalls.append(stall)
+        if self.session is not None and self.session.running:
+            self.session.stalls.append(stall)
+        LOOP_BLOCKED_SECONDS.observe(waited, stall["route"])
+
+    def close(self) -> None:
+        """Stop the thread; call on the loop."""
+        self._stop.set()
+        if self.loop.get_task_factory() == self._task_factory:
+            self.loop.set_task_factory(self._prev_factory)
+
+    # --- on the monitor thread ---
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_s):
+            now = time.monotonic()
+            frame = sys._current_frames().get(self._loop_thread)
+            self._heartbeat(now, frame)
+            session = self.session
+            if session is not None and session.running:
+                if session.expired():
+                    session.ended = time.time()
+                elif frame is not None:
+                    session.samples[self._stack(frame)] += 1
+                    loop_stats["samples"] += 1
+            elif not LOOP_WATCHDOG:
+                self._stop.set()  # a new session starts a new monitor from here on
+                try:
+                    self.loop.call_soon_threadsafe(self.close)  # the task factory is the loop's to reset
+                except RuntimeError:
+                    pass
+                return
+
+    def _heartbeat(self, now: float, frame) -> None:
+        sent = self._ping_sent
+        if sent is None:
+            self._ping_sent = now
+            try:
+                self.loop.call_soon_threadsafe(self._pong, now)
+            except RuntimeError:  # loop closed
+                self._stop.set()
+        elif self._stall is None and now - sent >= self.block_s and frame is not None:
+            info = self._current_request()
+            self._stall = {"at": time.time(), "route": info.label if info else "-", "_info": info,
+                           "stack": fold(frame, STALL_FRAMES)}
+
+    def _current_request(self) -> Optional[RequestInfo]:
+        task = asyncio.current_task(self.loop)
+        return self._tasks.get(task) if task is not None else None
+
+    def _stack(self, frame) -> str:
+        if _idle(frame):
+            return "(idle)"
+        info = self._current_request()
+        return ";".join([info.label if info else "(loop)"] + fold(frame))
+
+
+_monitor: Optional[LoopMonitor] = None
+_last: Optional[Session] = None
+
+
+def current_session() -> Optional[Session]:
+    return _last
+
+
+def start_session(seconds: float, requests: int = 0, interval_ms: float = PROFILE_INTERVAL_MS,
+                  block_ms: float = PROFILE_BLOCK_MS) -> Session:
+    """Profile the running loop; raises RuntimeError while another session runs."""
+    global _monitor, _last
+    if _last is not None and _last.running:
+        raise RuntimeError(f"profile session {_last.id} is still running")
+    session = Session(seconds, requests, interval_ms, block_ms)
+    loop = asyncio.get_running_loop()
+    if _monitor is not None and _monitor.loop is not loop:
+        _monitor._stop.set()  # left over from a loop that is gone
+    if _monitor is None or not _monitor.active:
+        _monitor = LoopMonitor(loop, session.interval_s, session.block_s)
+    else:
+        _monitor.interval_s, _monitor.block_s = session.interval_s, session.block_s
+    _monitor.session = session
+    _last = session
+    loop_stats["sessions"] += 1
+    return session
+
+
+def stop_session() -> Optional[Session]:
+    if _last is not None and _last.running:
+        _last.ended = time.time()
+    return _last
+
+
+def start_watchdog() -> None:
+    """LOOP_WATCHDOG=1: stall detection from startup, without sampling."""
+    global _monitor
+    if LOOP_WATCHDOG and (_monitor is None or not _monitor.active):
+        _monitor = LoopMonitor(asyncio.get_running_loop(), PROFILE_BLOCK_MS / 4000, PROFILE_BLOCK_MS / 1000)
+
+
+def shutdown() -> None:
+    global _monitor
+    stop_session()
+    if _monitor is not None:
+        _monitor.close()
+        _monitor = None
+
+
+class ProfilingMiddleware:
+    """ASGI middleware: ties the tasks of each /api request to it, so samples
+    and stalls name their route, and counts requests toward a session's limit.
+    The profiler's own routes are left out of both."""
+
+    def __init__(self, app, prefix: str = "/api", exclude: str = "/api/debug"):
+        self.app = app
+        self.prefix = prefix
+        self.exclude = exclude
+
+    async def __call__(self, scope, receive, send):
+        monitor = _monitor
+        path = scope.get("path", "")
+        if monitor is None or not monitor.active or scope["type"] != "http" or not path.startswith(self.prefix) or path.startswith(self.exclude):
+            return await self.app(scope, receive, send)
+        info = RequestInfo(scope.get("method", ""), scope["path"])
+        token = _request.set(info)
+        monitor.track(info)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            info.route = route_template(scope)
+            _request.reset(token)
+            session = monitor.session
+            if session is not None and session.running:
+                session.requests += 1
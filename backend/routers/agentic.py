@@ -1,56 +1,76 @@
 from __future__ import annotations
 from typing import List, Dict, Any
-from fastapi import APIRouter, Query
+import asyncio, json, os
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import Response
 from pydantic import BaseModel, Field
 
-from backend.mood_map import MOOD_PRESETS
+from backend.cache import ResponseCache, make_backend
+from backend.catalog_index import get_index
+from backend.vibe import resolve_mood
+from agentic_playlist.agents.compliance import policy_version
 from agentic_playlist.agents.orchestrator import Orchestrator
+from agentic_playlist.config import rerank_config, tracing_config
+from agentic_playlist.tracing.metrics import STAGE_SECONDS
+from agentic_playlist.tracing.store import read_trace, sweep, trace_name
 from agentic_playlist.tracing.tracer import Tracer
 from agentic_playlist.tools.music_catalog import MusicCatalog
+from backend.scheduler import BATCH, lane
+from backend.streaming import stream_response
 import pathlib
 
-# Rule-based scoring: map free-text to a vibe profile, then to seed genres.
-LEX = {
-    "cozy": {"words": {"fireplace","blanket","candle","warm","cocoa","snow","reading","rain","chai"}, "genres": ["acoustic","singer-songwriter","indie","folk","chill","lo-fi","piano"]},
-    "focus": {"words": {"study","focus","deep work","flow","concentrate","essay","reading"}, "genres": ["lo-fi","ambient","piano","classical","chill"]},
-    "party": {"words": {"club","dancefloor","party","friday","dj","festival","rave", "dance"}, "genres": ["dance","edm","house","pop","hip-hop"]},
-    "hype": {"words": {"gym","workout","max","pr","anthem","hype","run"}, "genres": ["edm","electro","dance","hip-hop","pop"]},
-    "sad": {"words": {"heartbreak","alone","cry","melancholy","nostalgic","blue", "sad"}, "genres": ["indie","indie-pop","singer-songwriter","alt-rock","pop"]},
-    "romantic": {"words": {"date","romantic","kiss","slow","candlelight","valentine", "love"}, "genres": ["r-n-b","soul","latin","pop","indie-pop"]},
-    "dark": {"words": {"noir","brooding","night","storm","industrial"}, "genres": ["industrial","electro","rock","trap","alt-rock"]},
-    "rage": {"words": {"rage","sprint","angry","angry gym","metal","mosh", "rock", "hard rock"}, "genres": ["rock","metal","trap","alt-rock","edm"]},
-}
-
-DEFAULT_GENRES = ["pop","indie","singer-songwriter","chill"]
-
-def parse_vibe(text: str) -> List[str]:
-    """Return a list of seed genres inferred from free-text."""
-    s = (text or "").lower()
-    # Shortcut seasonal/scene cues
-    if any(w in s for w in ["fireplace","snow","blanket","cocoa","candle","knit","sweater","winter"]):
-        return ["acoustic","singer-songwriter","indie","folk","chill","piano"][:3]
-    if any(w in s for w in ["rain","rainy","monsoon"]):
-        return ["lo-fi","indie","chill","ambient","piano"][:3]
-    if any(w in s for w in ["gym","lift","sprint","pr","max","preworkout"]):
-        return ["edm","electro","hip-hop","dance","pop"][:3]
-    if any(w in s for w in ["club","night out","party","rave","dj"]):
-        return ["dance","edm","house","pop","hip-hop"][:3]
-
-    # Score-based: count lexicon hits
-    scores: Dict[str,int] = {}
-    for label, conf in LEX.items():
-        hits = sum(1 for w in conf["words"] if w in s)
-        if hits:
-            scores[label] = hits
-    if scores:
-        # pick top label
-        label = max(scores, key=scores.get)
-        return LEX[label]["genres"][:3]
-
-    # Fallback
-    return DEFAULT_GENRES[:3]
 
 router = APIRouter()
+BUDGETS = {"curator_max_calls": 8, "critic_max_calls": 3, "compliance_max_calls": 3}
+TRACING = tracing_config()
+RERANK = rerank_config()
+TRACES_DIR = pathlib.Path("agentic_playlist/traces")
+_sweeper: asyncio.Task | None = None
+
+# Finished runs, keyed by their full configuration plus the policy and
+# catalog versions; runs are deterministic so a hit is the same answer.
+run_cache = ResponseCache(
+    backend=make_backend("agentic_runs", int(os.getenv("AGENTIC_CACHE_MAX_ENTRIES", "1024")), 16 * 1024 * 1024),
+    ttl=float(os.getenv("AGENTIC_CACHE_TTL", "600")),
+)
+_cached_policy: str | None = None
+
+
+def _run_key(key: str, limit: int, seed: int, variant: int) -> str:
+    global _cached_policy
+    policy = policy_version()
+    if policy != _cached_policy:
+        if _cached_policy is not None:
+            run_cache.clear()  # every cached playlist predates the new policy
+        _cached_policy = policy
+    index = get_index()
+    return run_cache.make_key("agentic/recommend", {
+        "mood": key, "limit": limit, "seed": seed, "variant": variant,
+        "budgets": json.dumps(BUDGETS, sort_keys=True), "rerank": json.dumps(RERANK, sort_keys=True),
+        "policy": policy, "catalog": index.version if index is not None else "live",
+    })
+
+
+async def _sweep_traces() -> None:
+    # retention: drop old traces, then oldest-first down to the count/size caps
+    while True:
+        await asyncio.to_thread(
+            sweep, TRACES_DIR, TRACING["retention_age_s"], TRACING["retention_max_files"], TRACING["retention_max_bytes"]
+        )
+        await asyncio.sleep(TRACING["sweep_every_s"])
+
+
+@router.on_event("startup")
+async def _start_sweeper():
+    global _sweeper
+    if TRACING["sweep_every_s"]:
+        _sweeper = asyncio.create_task(_sweep_traces())
+
+
+@router.on_event("shutdown")
+async def _stop_sweeper():
+    if _sweeper is not None:
+        _sweeper.cancel()
 
 class AgentTrack(BaseModel):
     title: str
@@ -74,37 +94,140 @@ async def agentic_recommend(
     limit: int = Query(10, ge=1, le=50),
     seed: int = Query(42, ge=0),
     variant: int = Query(0, ge=0),
+    nocache: bool = Query(False),
+):
+    key = (mood or "").strip().lower()
+    # identical concurrent runs share one pipeline; nocache runs it fresh (and re-caches)
+    body = await run_cache.get_or_fetch(
+        _run_key(key, limit, seed, variant), lambda: _run(key, limit, seed, variant, nocache), bypass=nocache
+    )
+    return AgenticResponse(**_live_trace(body))
+
+
+async def _run(key: str, limit: int, seed: int, variant: int, nocache: bool) -> Dict[str, Any]:
+    res, tracer, orch = _prepare_run(key, limit, seed, variant, nocache)
+    failed = True
+    try:
+        # agent runs yield Spotify budget to interactive /api/recommend traffic
+        with lane(BATCH):
+            result = await orch.arun()
+        failed = False
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Catalog lookup exceeded the tool timeout")
+    finally:
+        tracer.finish(error=failed)  # settles tail sampling; failed runs are always kept
+        with STAGE_SECONDS.time("trace_flush"):
+            await tracer.aflush()  # trace_url must be readable once we respond
+    return {
+    #    "mood": key,
+        "mood": f"{key} ({res.parsed_from})",
+        "seed": result["seed"],
+        "count": len(result["playlist"]),
+        "playlist": [AgentTrack(**t).model_dump() for t in result["playlist"]],
+        "metrics": result["metrics"],
+        "trace_url": _trace_url(tracer),  # a cache hit hands back the original run's trace, while it lasts
+    }
+
+
+@router.get("/recommend/stream")
+async def agentic_recommend_stream(
+    mood: str = Query(...),
+    limit: int = Query(10, ge=1, le=50),
+    seed: int = Query(42, ge=0),
+    variant: int = Query(0, ge=0),
+    nocache: bool = Query(False),
+    format: str = Query("sse", pattern="^(sse|ndjson)$"),
 ):
+    """`/recommend` as a stream: a `track` event per accepted track, then a `summary`
+    carrying `metrics` and `trace_url`."""
     key = (mood or "").strip().lower()
-    preset = MOOD_PRESETS.get(key)
-    if preset:
-        seed_genres = preset.get("seed_genres", [])
-        parsed_from = "preset"
-    else:
-        seed_genres = parse_vibe(key)
-        parsed_from = "vibe"
-
-    traces_dir = pathlib.Path("agentic_playlist/traces")
-    traces_dir.mkdir(parents=True, exist_ok=True)
-    trace_path = traces_dir / f"agent-run-{key}-seed{seed}-v{variant}.jsonl"
-    tracer = Tracer(trace_path)
-
-    catalog = MusicCatalog(tracer=tracer, limit=limit, variant=variant, seed_genres=seed_genres)
+    cached = None if nocache else await run_cache.aget(_run_key(key, limit, seed, variant))
+    if cached is not None:
+        return stream_response(_replay(_live_trace(cached)), format)
+    res, tracer, orch = _prepare_run(key, limit, seed, variant, nocache)
+
+    async def events():
+        failed = True
+        summary = None
+        try:
+            with lane(BATCH):
+                async for event, data in orch.astream():
+                    if event == "track":
+                        yield "track", AgentTrack(**data).model_dump()
+                    else:
+                        summary = data
+            failed = False
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=504, detail="Catalog lookup exceeded the tool timeout")
+        finally:
+            tracer.finish(error=failed)
+            with STAGE_SECONDS.time("trace_flush"):
+                await tracer.aflush()
+        body = {
+            "mood": f"{key} ({res.parsed_from})",
+            "seed": summary["seed"],
+            "count": len(summary["playlist"]),
+            "playlist": [AgentTrack(**t).model_dump() for t in summary["playlist"]],
+            "metrics": summary["metrics"],
+            "trace_url": _trace_url(tracer),
+        }
+        await run_cache.aset(_run_key(key, limit, seed, variant), body)  # same answer as /recommend
+        yield "summary", {k: v for k, v in body.items() if k != "playlist"}
+
+    return stream_response(events(), format)
+
+
+async def _replay(body: Dict[str, Any]):
+    for t in body["playlist"]:
+        yield "track", t
+    yield "summary", {k: body[k] for k in ("mood", "seed", "count", "metrics", "trace_url")}
+
+
+def _prepare_run(key: str, limit: int, seed: int, variant: int, nocache: bool):
+    res = resolve_mood(key)  # shared memo with /api/recommend
+
+    TRACES_DIR.mkdir(parents=True, exist_ok=True)
+    trace_path = TRACES_DIR / trace_name("agent-run", key, seed, variant, TRACING["format"])
+    tracer = Tracer(
+        trace_path,
+        buffered=bool(TRACING["buffered"]),
+        sample_rate=float(TRACING["sample_rate"]),
+        sampling=TRACING["sampling"],
+        rotate_bytes=TRACING["rotate_bytes"],
+        rotate_age_s=TRACING["rotate_age_s"],
+    )
+
+    catalog = MusicCatalog(tracer=tracer, limit=limit, variant=variant, seed_genres=list(res.seed_genres),
+                           queries=res.queries, cache=not nocache)
     orch = Orchestrator(
-        cfg={"seed": seed, "playlist_size": limit, "budgets": {
-            "curator_max_calls": 8, "critic_max_calls": 3, "compliance_max_calls": 3
-        }},
+        cfg={"seed": seed, "playlist_size": limit, "budgets": dict(BUDGETS), "rerank": dict(RERANK)},
         tracer=tracer,
         catalog=catalog,
     )
-    result = await orch.arun()
-    trace_rel = f"/traces/{trace_path.name}"  # <-- URL that maps to the static mount
-    return AgenticResponse(
-    #    mood=key,
-        mood=f"{key} ({parsed_from})",
-        seed=result["seed"],
-        count=len(result["playlist"]),
-        playlist=[AgentTrack(**t) for t in result["playlist"]],
-        metrics=result["metrics"],
-        trace_url=trace_rel,
-    )
+    return res, tracer, orch
+
+
+def _trace_url(tracer: Tracer) -> str | None:
+    if not tracer.kept:
+        return None
+    if tracer.path.suffix == ".jsonl":
+        return f"/traces/{tracer.path.name}"  # <-- URL that maps to the static mount
+    return f"/api/agentic/traces/{tracer.path.name}"  # binary: decoded by trace_file()
+
+
+def _live_trace(body: Dict[str, Any]) -> Dict[str, Any]:
+    # a cached run outlives its trace once retention sweeps the file: no dead links
+    url = body.get("trace_url")
+    if url and not (TRACES_DIR / url.rsplit("/", 1)[-1]).is_file():
+        return {**body, "trace_url": None}
+    return body
+
+
+@router.get("/traces/{name}")
+async def trace_file(name: str):
+    """A trace decoded to JSON lines (works for .m2t as well as .jsonl)."""
+    path = TRACES_DIR / name
+    if pathlib.Path(name).name != name or not path.is_file():
+        raise HTTPException(status_code=404, detail="Trace not found")
+    body = await asyncio.to_thread(lambda: "".join(json.dumps(r) + "\n" for r in read_trace(path)))
+    return Response(content=body, media_type="application/x-ndjson")
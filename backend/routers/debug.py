@@ -0,0 +1,68 @@
+from __future__ import annotations
+import hmac
+from typing import Any, Dict
+
+from fastapi import APIRouter, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+
+from backend import profiler
+
+router = APIRouter()
+
+
+def _guard(token: str | None) -> None:
+    # off unless PROFILE_TOKEN is set; a 404 doesn't advertise the surface
+    if not profiler.PROFILE_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not token or not hmac.compare_digest(token, profiler.PROFILE_TOKEN):
+        raise HTTPException(status_code=403, detail="Bad profile token")
+
+
+def _report() -> Dict[str, Any]:
+    session = profiler.current_session()
+    return {
+        "session": session.report() if session else None,
+        "loop": profiler.loop_stats,
+        "recent_stalls": list(profiler.recent_stalls),
+    }
+
+
+@router.post("/profile")
+async def start_profile(
+    seconds: float = Query(10.0, gt=0, le=profiler.MAX_SESSION_S),
+    requests: int = Query(0, ge=0, le=100_000),  # 0: run for `seconds`
+    interval_ms: float = Query(profiler.PROFILE_INTERVAL_MS, ge=1, le=1000),
+    block_ms: float = Query(profiler.PROFILE_BLOCK_MS, ge=1, le=10_000),
+    x_profile_token: str | None = Header(None),
+):
+    """Sample this worker's event loop for the next `seconds` or `requests`,
+    flagging every stall over `block_ms`; read it back with GET."""
+    _guard(x_profile_token)
+    try:
+        profiler.start_session(seconds, requests, interval_ms, block_ms)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return _report()
+
+
+@router.get("/profile")
+async def profile_status(x_profile_token: str | None = Header(None)):
+    _guard(x_profile_token)
+    return _report()
+
+
+@router.delete("/profile")
+async def stop_profile(x_profile_token: str | None = Header(None)):
+    _guard(x_profile_token)
+    profiler.stop_session()
+    return _report()
+
+
+@router.get("/profile/collapsed", response_class=PlainTextResponse)
+async def profile_collapsed(x_profile_token: str | None = Header(None)):
+    """The last session's samples as collapsed stacks (flamegraph.pl, speedscope)."""
+    _guard(x_profile_token)
+    session = profiler.current_session()
+    if session is None:
+        raise HTTPException(status_code=404, detail="No profile session yet")
+    return PlainTextResponse(session.collapsed())
@@ -0,0 +1,186 @@
+from __future__ import annotations
+import asyncio, heapq, itertools, os, random, time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+import httpx
+
+# Priority lanes: lower number wins. Interactive API traffic is the default;
+# agentic runs and precompute jobs opt into BATCH with `lane(BATCH)`.
+INTERACTIVE = 0
+BATCH = 1
+
+current_lane: ContextVar[int] = ContextVar("spotify_lane", default=INTERACTIVE)
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+@contextmanager
+def lane(priority: int) -> Iterator[None]:
+    """Tag every Spotify call made inside the block (and tasks it spawns)."""
+    token = current_lane.set(priority)
+    try:
+        yield
+    finally:
+        current_lane.reset(token)
+
+
+def retry_after_seconds(r: httpx.Response) -> Optional[float]:
+    value = r.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class OutboundScheduler:
+    """Token-bucket budget for outbound Spotify calls with priority lanes.
+
+    Calls take one token each; when the bucket is empty callers queue and are
+    released lowest-lane first (FIFO within a lane). A 429 pauses the whole
+    bucket for Retry-After, since Spotify's limit is per app, not per request.
+    429/5xx are retried with jittered exponential backoff. A Retry-After over
+    `max_retry_after` is not waited out: the response goes back to the caller
+    and the bucket keeps serving everyone else.
+    """
+
+    def __init__(
+        self,
+        rate: float = 20.0,
+        burst: int = 40,
+        max_retries: int = 3,
+        base_backoff: float = 0.25,
+        max_backoff: float = 8.0,
+        max_retry_after: float = 30.0,
+        rng: random.Random | None = None,
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.max_retry_after = max_retry_after
+        self._rng = rng or random.Random()
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._seq = itertools.count()
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._pump: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.stats: Dict[str, Any] = {
+            "sent": 0,
+            "queued": 0,
+            "queue_depth": 0,
+            "max_queue_depth": 0,
+            "throttled_s": 0.0,
+            "rate_limited": 0,
+            "retries": 0,
+            "gave_up": 0,
+            "retry_after_too_long": 0,
+            "paused_s": 0.0,
+        }
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _wait_time(self) -> float:
+        self._refill()
+        now = time.monotonic()
+        if now < self._paused_until:
+            return self._paused_until - now
+        if self._tokens >= 1:
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+    def pause(self, seconds: float) -> None:
+        until = time.monotonic() + seconds
+        if until > self._paused_until:
+            self.stats["paused_s"] += until - max(self._paused_until, time.monotonic())
+            self._paused_until = until
+
+    async def acquire(self, priority: int | None = None) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop, self._waiters, self._pump = loop, [], None
+        if not self._waiters and self._wait_time() == 0:
+            self._tokens -= 1
+            return
+        prio = current_lane.get() if priority is None else priority
+        fut = loop.create_future()
+        heapq.heappush(self._waiters, (prio, next(self._seq), fut))
+        self.stats["queued"] += 1
+        self.stats["queue_depth"] = len(self._waiters)
+        self.stats["max_queue_depth"] = max(self.stats["max_queue_depth"], len(self._waiters))
+        if self._pump is None or self._pump.done():
+            self._pump = loop.create_task(self._release_waiters())
+        t0 = time.monotonic()
+        try:
+            await fut
+        finally:
+            self.stats["throttled_s"] += time.monotonic() - t0
+
+    async def _release_waiters(self) -> None:
+        while self._waiters:
+            wait = self._wait_time()
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+            _, _, fut = heapq.heappop(self._waiters)
+            self.stats["queue_depth"] = len(self._waiters)
+            if fut.done():  # caller gave up while queued
+                continue
+            self._tokens -= 1
+            fut.set_result(None)
+
+    def _backoff(self, attempt: int) -> float:
+        # full jitter keeps retrying workers from stampeding together
+        return self._rng.uniform(0, min(self.max_backoff, self.base_backoff * 2 ** attempt))
+
+    async def send(
+        self, do_request: Callable[[], Awaitable[httpx.Response]], priority: int | None = None
+    ) -> httpx.Response:
+        """Run `do_request` under the budget, retrying 429/5xx.
+
+        Returns the last response; callers still decide how to surface a
+        non-200 once retries are exhausted.
+        """
+        attempt = 0
+        while True:
+            await self.acquire(priority)
+            self.stats["sent"] += 1
+            r = await do_request()
+            if r.status_code not in RETRY_STATUSES:
+                return r
+            if attempt >= self.max_retries:
+                self.stats["gave_up"] += 1
+                return r
+            delay = retry_after_seconds(r)
+            if delay is not None and delay > self.max_retry_after:
+                self.stats["retry_after_too_long"] += 1
+                return r
+            if r.status_code == 429:
+                self.stats["rate_limited"] += 1
+                delay = delay if delay is not None else self._backoff(attempt)
+                self.pause(delay + self._rng.uniform(0, 0.1 * delay + 0.01))
+            else:
+                await asyncio.sleep(delay if delay is not None else self._backoff(attempt))
+            self.stats["retries"] += 1
+            attempt += 1
+
+
+spotify_scheduler = OutboundScheduler(
+    rate=float(os.getenv("SPOTIFY_RATE_PER_S", "20")),
+    burst=int(os.getenv("SPOTIFY_RATE_BURST", "40")),
+    max_retries=int(os.getenv("SPOTIFY_MAX_RETRIES", "3")),
+    max_retry_after=float(os.getenv("SPOTIFY_MAX_RETRY_AFTER_S", "30")),
+)
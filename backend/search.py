@@ -0,0 +1,187 @@
+from __future__ import annotations
+import asyncio, os
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List
+from backend.catalog_index import MAX_PAGE, get_index
+
+# Upper bound on simultaneous Spotify search calls issued for one request.
+SEARCH_CONCURRENCY = int(os.getenv("SPOTIFY_SEARCH_CONCURRENCY", "4"))
+
+SpotifyGet = Callable[..., Awaitable[dict]]
+
+
+def build_queries_from_genres(seed_genres: List[str]) -> List[str]:
+    sg = [g for g in (seed_genres or [])][:3] or ["pop"]
+    # Build 2–4 queries using only genre filters; avoid title keyword bias entirely
+    queries: List[str] = []
+    for g in sg:
+        queries.append(f'genre:"{g}"')
+    if len(sg) >= 2:
+        queries.append("(" + " OR ".join([f'genre:"{g}"' for g in sg[:2]]) + ")")
+    return queries
+
+
+def query_genre(q: str | None) -> str | None:
+    """The genre a single-genre query (`genre:"x"`) searches, else None."""
+    if q and q.startswith('genre:"') and q.endswith('"') and q.count('genre:') == 1:
+        return q[len('genre:"'):-1]
+    return None
+
+
+async def fetch_pages(
+    get: SpotifyGet, params_list: List[Dict[str, Any]], concurrency: int | None = None, cache: bool = True
+) -> List[Any]:
+    """Run every search call at once (bounded by `concurrency`).
+
+    Results come back in the same order as `params_list`; failures are returned
+    in place instead of raised so `merge_pages` can decide whether they matter.
+    Pages covered by the local catalog index are served without a call
+    (unless `cache=False` asks for fresh data).
+    """
+    one = _page_fetcher(get, concurrency, cache)
+    return await asyncio.gather(*(one(p) for p in params_list), return_exceptions=True)
+
+
+def _page_fetcher(get: SpotifyGet, concurrency: int | None, cache: bool) -> Callable[[Dict[str, Any]], Awaitable[dict]]:
+    sem = asyncio.Semaphore(max(1, concurrency or SEARCH_CONCURRENCY))
+    index = get_index() if cache else None
+
+    async def one(params: Dict[str, Any]) -> dict:
+        if index is not None:
+            page = index.page(params)
+            if page is not None:
+                return page
+        async with sem:
+            return await get("search", params=params, cache=cache)
+
+    return one
+
+
+async def iter_pages(
+    get: SpotifyGet, params_list: List[Dict[str, Any]], concurrency: int | None = None, cache: bool = True
+) -> AsyncIterator[Any]:
+    """`fetch_pages`, but each page is yielded as soon as it and all before it are in.
+
+    Calls still start together; closing the generator early cancels the ones
+    nobody is waiting for any more.
+    """
+    one = _page_fetcher(get, concurrency, cache)
+    tasks = [asyncio.ensure_future(one(p)) for p in params_list]
+    try:
+        for task in tasks:
+            try:
+                yield await task
+            except Exception as e:  # same contract as gather(return_exceptions=True)
+                yield e
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def _window_key(params: Dict[str, Any]) -> tuple:
+    return tuple(sorted((k, v) for k, v in params.items() if k not in ("offset", "limit")))
+
+
+def plan_windows(params_list: List[Dict[str, Any]], max_limit: int = MAX_PAGE) -> List[Dict[str, Any]]:
+    """Fewest search calls whose result windows cover every requested page.
+
+    Requests for the same query (type/market) are grouped; their
+    `[offset, offset + limit)` ranges are merged greedily into windows of at
+    most `max_limit` results, so overlapping or nearby pages share one call.
+    """
+    groups: Dict[tuple, List[tuple]] = {}
+    for p in params_list:
+        off, lim = int(p.get("offset", 0)), int(p.get("limit", 20))
+        groups.setdefault(_window_key(p), []).append((off, off + lim))
+    windows: List[Dict[str, Any]] = []
+    for key, spans in groups.items():
+        spans.sort()
+        start, end = spans[0]
+        for a, b in spans[1:]:
+            if max(end, b) - start <= max_limit:
+                end = max(end, b)
+                continue
+            windows.append({**dict(key), "offset": start, "limit": end - start})
+            start, end = a, b
+        windows.append({**dict(key), "offset": start, "limit": end - start})
+    return windows
+
+
+async def fetch_pages_shared(
+    get: SpotifyGet, params_lists: List[List[Dict[str, Any]]], concurrency: int | None = None, cache: bool = True
+) -> tuple[List[List[Any]], int]:
+    """`fetch_pages` for many requests at once, deduplicating the upstream calls.
+
+    Pages the local catalog covers are served from it; the rest are planned
+    into shared windows (`plan_windows`), fetched once each, and sliced back
+    into the exact page every request asked for. Returns the per-request page
+    lists and the number of upstream calls made.
+    """
+    index = get_index() if cache else None
+    out: List[List[Any]] = [[None] * len(pl) for pl in params_lists]
+    pending: List[tuple] = []
+    for i, pl in enumerate(params_lists):
+        for j, p in enumerate(pl):
+            page = index.page(p) if index is not None else None
+            if page is not None:
+                out[i][j] = page
+            else:
+                pending.append((i, j, p))
+
+    windows = plan_windows([p for _, _, p in pending])
+    fetched = await fetch_pages(get, windows, concurrency=concurrency, cache=cache) if windows else []
+    by_key: Dict[tuple, List[tuple]] = {}
+    for w, page in zip(windows, fetched):
+        by_key.setdefault(_window_key(w), []).append((w["offset"], w["offset"] + w["limit"], page))
+
+    for i, j, p in pending:
+        off, lim = int(p.get("offset", 0)), int(p.get("limit", 20))
+        start, _, page = next(w for w in by_key[_window_key(p)] if w[0] <= off and off + lim <= w[1])
+        if isinstance(page, BaseException):
+            out[i][j] = page
+            continue
+        items = page.get("tracks", {}).get("items", [])
+        out[i][j] = {"tracks": {"items": items[off - start:off - start + lim], "offset": off, "limit": lim}}
+    return out, len(windows)
+
+
+def merge_pages(pages: List[Any], limit: int) -> List[dict]:
+    """First-seen dedupe by track id over pages in query order.
+
+    Mirrors the old sequential loop: a failed page only raises if we actually
+    reach it before `limit` tracks were collected.
+    """
+    seen: set[str] = set()
+    results: List[dict] = []
+    for page in pages:
+        if isinstance(page, BaseException):
+            raise page
+        for t in page.get("tracks", {}).get("items", []):
+            tid = t.get("id")
+            if not tid or tid in seen:
+                continue
+            seen.add(tid)
+            results.append(t)
+            if len(results) >= limit:
+                return results
+    return results
+
+
+async def merge_stream(pages: AsyncIterator[Any], limit: int) -> AsyncIterator[dict]:
+    """`merge_pages` over an async page stream, yielding each track as it clears dedupe."""
+    seen: set[str] = set()
+    n = 0
+    try:
+        async for page in pages:
+            if isinstance(page, BaseException):
+                raise page
+            for t in page.get("tracks", {}).get("items", []):
+                tid = t.get("id")
+                if not tid or tid in seen:
+                    continue
+                seen.add(tid)
+                yield t
+                n += 1
+                if n >= limit:
+                    return
+    finally:
+        await pages.aclose()
@@ -1,9 +1,16 @@
 from __future__ import annotations
 import os, time
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, AsyncIterator, List, Sequence
 import httpx
 from fastapi import HTTPException
 from dotenv import load_dotenv
+from backend.search import build_queries_from_genres
+from backend.pagination import PagePlan, iter_plan, run_plan
+from backend.cache import spotify_cache, token_store, TOKEN_KEY
+from backend.token_manager import TokenManager
+from backend.http_client import get_client, close_client
+from backend import scheduler
+from agentic_playlist.tracing.metrics import SPOTIFY_SECONDS, SPOTIFY_UPSTREAM, STAGE_SECONDS
 
 load_dotenv()
 CLIENT_ID = os.getenv("SPOTIFY_CLIENT_ID")
@@ -11,38 +18,51 @@ CLIENT_SECRET = os.getenv("SPOTIFY_CLIENT_SECRET")
 if not CLIENT_ID or not CLIENT_SECRET:
     raise RuntimeError("Missing SPOTIFY_CLIENT_ID or SPOTIFY_CLIENT_SECRET")
 
-_http: Optional[httpx.AsyncClient] = None
-_token: Dict[str, Any] = {"access_token": None, "expires_at": 0}
+# overridable so tests and load runs can point at a local fake server
+API_BASE = os.getenv("SPOTIFY_API_BASE", "https://api.spotify.com/v1").rstrip("/")
+ACCOUNTS_URL = os.getenv("SPOTIFY_ACCOUNTS_URL", "https://accounts.spotify.com/api/token")
 
 async def _httpc() -> httpx.AsyncClient:
-    global _http
-    if _http is None:
-        _http = httpx.AsyncClient(timeout=30)
-    return _http
+    return await get_client()
 
-async def get_token() -> str:
-    now = time.time()
-    if _token["access_token"] and now < _token["expires_at"] - 30:
-        return _token["access_token"]
+async def _request_token() -> dict:
     c = await _httpc()
     r = await c.post(
-        "https://accounts.spotify.com/api/token",
+        ACCOUNTS_URL,
         data={"grant_type": "client_credentials"},
         auth=(CLIENT_ID, CLIENT_SECRET),
     )
     if r.status_code != 200:
         raise HTTPException(status_code=502, detail=f"Spotify auth failed: {r.text}")
-    data = r.json()
-    _token["access_token"] = data["access_token"]
-    _token["expires_at"] = now + int(data.get("expires_in", 3600))
-    return _token["access_token"]
+    return r.json()
+
+# one manager per process, shared by app.py and the agentic bridge
+token_manager = TokenManager(_request_token, store=token_store, key=TOKEN_KEY)
+
+async def get_token() -> str:
+    with STAGE_SECONDS.time("token"):
+        return await token_manager.get()
+
+async def spotify_get(path: str, params: dict | None = None, cache: bool = True) -> dict:
+    key = spotify_cache.make_key(path, params)
+    t0, status = time.perf_counter(), "error"
+    try:
+        out = await spotify_cache.get_or_fetch(key, lambda: _spotify_fetch(path, params), bypass=not cache)
+        status = "200"
+        return out
+    except HTTPException as e:
+        status = str(e.status_code)
+        raise
+    finally:
+        SPOTIFY_SECONDS.observe(time.perf_counter() - t0, path.strip("/"), status)
 
-async def spotify_get(path: str, params: dict | None = None) -> dict:
+async def _spotify_fetch(path: str, params: dict | None = None) -> dict:
     tok = await get_token()
     headers = {"Authorization": f"Bearer {tok}", "Accept": "application/json"}
     c = await _httpc()
-    url = f"https://api.spotify.com/v1/{path.strip('/')}"
-    r = await c.get(url, headers=headers, params=params)
+    url = f"{API_BASE}/{path.strip('/')}"
+    r = await scheduler.spotify_scheduler.send(lambda: c.get(url, headers=headers, params=params))
+    SPOTIFY_UPSTREAM.inc(path.strip("/"), r.status_code)
     if r.status_code != 200:
         try:
             detail = r.json()
@@ -51,34 +71,28 @@ async def spotify_get(path: str, params: dict | None = None) -> dict:
         raise HTTPException(status_code=r.status_code, detail=f"Spotify error {r.status_code} @ {path}: {detail}")
     return r.json()
 
-async def search_tracks_by_genres_only(seed_genres: List[str], limit: int, variant: int = 0) -> list[dict]:
-    sg = [g for g in (seed_genres or [])][:3] or ["pop"]
-    queries: List[str] = [f'genre:"{g}"' for g in sg]
-    if len(sg) >= 2:
-        queries.append("(" + " OR ".join([f'genre:"{g}"' for g in sg[:2]]) + ")")
+async def search_tracks_by_genres_only(
+    seed_genres: List[str], limit: int, variant: int = 0, concurrency: int | None = None, cache: bool = True,
+    queries: Sequence[str] | None = None, plan: PagePlan | None = None,
+) -> list[dict]:
+    plan = plan or search_plan(seed_genres, limit, variant, queries)
+    await run_plan(spotify_get, plan, concurrency=concurrency, cache=cache)
+    return plan.tracks
 
-    seen: set[str] = set()
-    results: list[dict] = []
-    per_call = min(max(limit, 1), 20)
-    base_offset = (variant * 7) % 120
+async def stream_tracks_by_genres_only(
+    seed_genres: List[str], limit: int, variant: int = 0, concurrency: int | None = None, cache: bool = True,
+    queries: Sequence[str] | None = None, plan: PagePlan | None = None,
+) -> AsyncIterator[dict]:
+    """`search_tracks_by_genres_only`, yielding raw tracks as the pages before them land."""
+    plan = plan or search_plan(seed_genres, limit, variant, queries)
+    async for t in iter_plan(spotify_get, plan, concurrency, cache):
+        yield t
 
-    for i, q in enumerate(queries):
-        data = await spotify_get(
-            "search",
-            params={"q": q, "type": "track", "limit": per_call, "offset": base_offset + i * 5, "market": "US"},
-        )
-        for t in data.get("tracks", {}).get("items", []):
-            tid = t.get("id")
-            if not tid or tid in seen:
-                continue
-            seen.add(tid)
-            results.append(t)
-            if len(results) >= limit:
-                return results
-    return results
+def search_plan(seed_genres: List[str], limit: int, variant: int = 0, queries: Sequence[str] | None = None,
+                target: int | None = None) -> PagePlan:
+    queries = list(queries) if queries is not None else build_queries_from_genres(seed_genres)
+    return PagePlan(queries, limit, variant, market="US", target=target)
 
 async def shutdown_http():
-    global _http
-    if _http is not None:
-        await _http.aclose()
-        _http = None
+    await token_manager.stop()
+    await close_client()
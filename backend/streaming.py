@@ -0,0 +1,47 @@
+"""Server-sent events / NDJSON framing for the streaming recommend routes.
+
+Generators yield `(event, data)` pairs: any number of `track` events, then a
+final `summary` (or `error` once headers are already on the wire).
+"""
+from __future__ import annotations
+import json, logging
+from typing import Any, AsyncIterator, Tuple
+
+import httpx
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+
+MEDIA_TYPES = {"sse": "text/event-stream", "ndjson": "application/x-ndjson"}
+
+Event = Tuple[str, Any]
+
+log = logging.getLogger(__name__)
+
+
+def encode(event: str, data: Any, fmt: str) -> str:
+    body = json.dumps(data, separators=(",", ":"))
+    if fmt == "sse":
+        return f"event: {event}\ndata: {body}\n\n"
+    return json.dumps({"event": event, "data": data}, separators=(",", ":")) + "\n"
+
+
+async def _frames(events: AsyncIterator[Event], fmt: str) -> AsyncIterator[str]:
+    try:
+        async for event, data in events:
+            yield encode(event, data, fmt)
+    except HTTPException as e:
+        yield encode("error", {"status": e.status_code, "detail": e.detail}, fmt)
+    except (httpx.TransportError, httpx.TimeoutException):
+        # past the headers a raise would only cut the stream; tell the client instead
+        log.exception("stream failed talking to Spotify")
+        yield encode("error", {"status": 502, "detail": "Upstream request failed"}, fmt)
+    except Exception:
+        log.exception("stream failed")
+        yield encode("error", {"status": 500, "detail": "Internal Server Error"}, fmt)
+    finally:
+        await events.aclose()
+
+
+def stream_response(events: AsyncIterator[Event], fmt: str = "sse") -> StreamingResponse:
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}  # keep proxies from buffering
+    return StreamingResponse(_frames(events, fmt), media_type=MEDIA_TYPES[fmt], headers=headers)
@@ -0,0 +1,136 @@
+from __future__ import annotations
+import asyncio, time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from backend.cache import CacheBackend
+
+
+class TokenManager:
+    """Client-credentials token holder with single-flight refresh.
+
+    `fetch` performs the accounts request and returns Spotify's token payload
+    (`access_token`, `expires_in`). Only one refresh runs at a time; every
+    concurrent caller awaits it. A background task renews `renew_ahead`
+    seconds before the `margin` cut-off so request paths normally never wait
+    on auth. Tokens are mirrored into `store` so other workers can adopt them.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[], Awaitable[Dict[str, Any]]],
+        store: CacheBackend | None = None,
+        key: str = "spotify:client_credentials",
+        margin: float = 30.0,
+        renew_ahead: float = 120.0,
+        retry_after: float = 5.0,
+    ):
+        self._fetch = fetch
+        self.store = store
+        self.key = key
+        self.margin = margin
+        self.renew_ahead = renew_ahead
+        self.retry_after = retry_after
+        self._token: Dict[str, Any] = {"access_token": None, "expires_at": 0}
+        self._issued_at = 0.0
+        self._refresh: Optional[asyncio.Task] = None
+        self._renewer: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.stats: Dict[str, Any] = {
+            "refreshes": 0,
+            "failures": 0,
+            "coalesced": 0,
+            "adopted": 0,
+            "background_refreshes": 0,
+            "last_latency_ms": 0.0,
+            "max_latency_ms": 0.0,
+            "total_latency_ms": 0.0,
+            "last_error": None,
+        }
+
+    def _usable(self, tok: Optional[Dict[str, Any]], now: float) -> bool:
+        return bool(tok and tok.get("access_token") and now < tok["expires_at"] - self.margin)
+
+    async def _adopt_shared(self, now: float) -> bool:
+        if self.store is None:
+            return False
+        shared = await self.store.aget(self.key)
+        if self._usable(shared, now) and shared["expires_at"] > self._token["expires_at"]:
+            self._token = dict(shared)
+            self._issued_at = now
+            self.stats["adopted"] += 1
+            return True
+        return False
+
+    async def get(self) -> str:
+        self._ensure_renewer()
+        now = time.time()
+        if self._usable(self._token, now) or await self._adopt_shared(now):
+            return self._token["access_token"]
+        return await self.refresh()
+
+    async def refresh(self) -> str:
+        """Start a refresh, or join the one already in flight."""
+        if self._refresh is None or self._refresh.done():
+            self._refresh = asyncio.create_task(self._do_refresh())
+        else:
+            self.stats["coalesced"] += 1
+        # shield: one caller giving up must not cancel the refresh for the rest
+        return await asyncio.shield(self._refresh)
+
+    async def _do_refresh(self) -> str:
+        t0 = time.perf_counter()
+        try:
+            data = await self._fetch()
+        except Exception as e:
+            self.stats["failures"] += 1
+            self.stats["last_error"] = str(e)
+            raise
+        finally:
+            ms = (time.perf_counter() - t0) * 1000
+            self.stats["last_latency_ms"] = ms
+            self.stats["max_latency_ms"] = max(self.stats["max_latency_ms"], ms)
+            self.stats["total_latency_ms"] += ms
+        self.stats["refreshes"] += 1
+        ttl = int(data.get("expires_in", 3600))
+        self._issued_at = time.time()
+        self._token = {"access_token": data["access_token"], "expires_at": self._issued_at + ttl}
+        if self.store is not None:
+            await self.store.aset(self.key, dict(self._token), ttl=ttl)
+        return self._token["access_token"]
+
+    def _ensure_renewer(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # tasks from a previous (closed) loop can't be awaited here
+            self._loop, self._refresh, self._renewer = loop, None, None
+        if self._renewer is None or self._renewer.done():
+            self._renewer = asyncio.create_task(self._renew_loop())
+
+    def _renew_due(self) -> float:
+        exp = self._token["expires_at"]
+        # never renew before half the lifetime, or short-lived tokens would spin
+        return max(exp - self.margin - self.renew_ahead, self._issued_at + (exp - self._issued_at) / 2)
+
+    async def _renew_loop(self) -> None:
+        while True:
+            now = time.time()
+            if self._token["access_token"] and self._renew_due() > now:
+                await asyncio.sleep(self._renew_due() - now)
+                continue
+            if await self._adopt_shared(now) and self._renew_due() > time.time():
+                continue
+            try:
+                await self.refresh()
+                self.stats["background_refreshes"] += 1
+            except Exception:
+                await asyncio.sleep(self.retry_after)
+
+    async def stop(self) -> None:
+        for task in (self._renewer, self._refresh):
+            if task is not None and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except (asyncio.CancelledError, Exception):
+                    pass
+        self._renewer = self._refresh = None
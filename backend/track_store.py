@@ -0,0 +1,289 @@
+"""Memory-mapped columnar store for the local track catalog.
+
+Same `page()` / `tracks_for_genre()` surface as `CatalogIndex`, but nothing
+is parsed on open: the file is mmapped and every column is a zero-copy view,
+so worker processes share one copy through the page cache.
+
+Layout (little-endian whatever the host, every section 8-byte aligned;
+big-endian hosts decode swapped copies instead of zero-copy views):
+
+    b"M2PCOL01" | u32 header_len | header JSON
+    strings       utf-8 blob of every interned string (index 0 is "")
+    str_offsets   u32[n_strings + 1]
+    id, name, album, image, preview, url      u32[n_tracks] string ids each
+    artist_ptr    u32[n_tracks + 1]  CSR into artist_ids
+    artist_ids    u32[...]           ids into artist_names
+    artist_names  u32[n_artists]     string ids
+    genre_bits    n_genres x u64[ceil(n_tracks / 64)] membership bitsets
+    query_ptr     u32[n_queries + 1] CSR into query_rows
+    query_rows    u32[...]           track rows in Spotify's result order
+    exhausted     u8[n_queries]
+
+Build one from a JSON snapshot:
+
+    python -m backend.track_store --src backend/data/catalog.json --out backend/data/catalog.m2p
+"""
+from __future__ import annotations
+import argparse, hashlib, json, mmap, os, struct, sys
+from array import array
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+MAGIC = b"M2PCOL01"
+STRING_COLUMNS = ("id", "name", "album", "image", "preview", "url")
+_SWAP = sys.byteorder != "little"
+
+
+def _pad(n: int) -> int:
+    return (8 - n % 8) % 8
+
+
+def _le(a: array) -> bytes:
+    if _SWAP:
+        a = array(a.typecode, a)
+        a.byteswap()
+    return a.tobytes()
+
+
+class TrackStore:
+    def __init__(self, path: Path | str):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        buf = memoryview(self._mm)
+        if bytes(buf[:8]) != MAGIC:
+            raise ValueError(f"{self.path} is not a columnar track store")
+        (hlen,) = struct.unpack_from("<I", buf, 8)
+        head = json.loads(bytes(buf[12:12 + hlen]))
+        self.header = head
+        self.market = head["market"]
+        self.created_at = head["created_at"]
+        self.version = head["version"]
+        self.n_tracks = head["n_tracks"]
+        self.genre_names: List[str] = head["genres"]
+        self.query_names: List[str] = head["queries"]
+        self._genre_pos = {g: i for i, g in enumerate(self.genre_names)}
+        self._query_pos = {q: i for i, q in enumerate(self.query_names)}
+        sec = head["sections"]
+
+        def view(name: str, fmt: str = "I") -> memoryview:
+            off, size = sec[name]
+            raw = buf[off:off + size]
+            if fmt == "B":
+                return raw
+            if _SWAP:
+                col = array(fmt)
+                col.frombytes(raw)
+                col.byteswap()
+                return memoryview(col)
+            return raw.cast(fmt)
+
+        self._strings = view("strings", "B")
+        self._str_off = view("str_offsets")
+        self._cols = {c: view(c) for c in STRING_COLUMNS}
+        self._artist_ptr = view("artist_ptr")
+        self._artist_ids = view("artist_ids")
+        self._artist_names = view("artist_names")
+        self._genre_bits = view("genre_bits", "Q")
+        self._words = (self.n_tracks + 63) // 64
+        self._query_ptr = view("query_ptr")
+        self._query_rows = view("query_rows")
+        self._exhausted = view("exhausted", "B")
+        self.stats = {"hits": 0, "misses": 0}
+
+    def string(self, i: int) -> str:
+        return str(self._strings[self._str_off[i]:self._str_off[i + 1]], "utf-8")
+
+    def column(self, name: str, row: int) -> str:
+        return self.string(self._cols[name][row])
+
+    def artists(self, row: int) -> List[str]:
+        ids = self._artist_ids[self._artist_ptr[row]:self._artist_ptr[row + 1]]
+        return [self.string(self._artist_names[a]) for a in ids]
+
+    def artist_ids(self, row: int) -> List[int]:
+        return list(self._artist_ids[self._artist_ptr[row]:self._artist_ptr[row + 1]])
+
+    def track(self, row: int) -> dict:
+        """Spotify-shaped track object, like catalog_index.expand()."""
+        image, url = self.column("image", row), self.column("url", row)
+        return {
+            "id": self.column("id", row),
+            "name": self.column("name", row),
+            "artists": [{"name": a} for a in self.artists(row)],
+            "album": {"name": self.column("album", row), "images": [{"url": image}] if image else []},
+            "preview_url": self.column("preview", row) or None,
+            "external_urls": {"spotify": url} if url else {},
+        }
+
+    def query_rows(self, q: str) -> Optional[memoryview]:
+        i = self._query_pos.get(q)
+        if i is None:
+            return None
+        return self._query_rows[self._query_ptr[i]:self._query_ptr[i + 1]]
+
+    def page(self, params: Dict[str, Any]) -> Optional[dict]:
+        rows = self.query_rows(params.get("q", ""))
+        if (
+            rows is None
+            or params.get("type", "track") != "track"
+            or params.get("market", self.market) != self.market
+        ):
+            self.stats["misses"] += 1
+            return None
+        offset, limit = int(params.get("offset", 0)), int(params.get("limit", 20))
+        if offset + limit > len(rows) and not self._exhausted[self._query_pos[params["q"]]]:
+            self.stats["misses"] += 1
+            return None
+        self.stats["hits"] += 1
+        items = [self.track(r) for r in rows[offset:offset + limit]]
+        return {"tracks": {"items": items, "offset": offset, "limit": limit}}
+
+    def genre_bitset(self, genre: str) -> Optional[memoryview]:
+        g = self._genre_pos.get(genre)
+        if g is None:
+            return None
+        return self._genre_bits[g * self._words:(g + 1) * self._words]
+
+    def in_genre(self, row: int, genre: str) -> bool:
+        bits = self.genre_bitset(genre)
+        return bool(bits is not None and bits[row >> 6] >> (row & 63) & 1)
+
+    def genres_of(self, row: int) -> List[str]:
+        w, b = row >> 6, row & 63
+        return [g for i, g in enumerate(self.genre_names) if self._genre_bits[i * self._words + w] >> b & 1]
+
+    def tracks_for_genre(self, genre: str) -> List[str]:
+        rows = self.query_rows(f'genre:"{genre}"')
+        return [self.column("id", r) for r in rows] if rows is not None else []
+
+    def close(self) -> None:
+        for attr in list(vars(self)):
+            if isinstance(getattr(self, attr), memoryview):
+                getattr(self, attr).release()
+        self._cols.clear()
+        self._mm.close()
+
+
+def build(index, path: Path | str) -> Path:
+    """Write a `CatalogIndex` (JSON snapshot) out in the columnar layout."""
+    strings: Dict[str, int] = {"": 0}
+    artists: Dict[str, int] = {}
+
+    def intern(s: Optional[str]) -> int:
+        s = s or ""
+        i = strings.get(s)
+        if i is None:
+            i = strings[s] = len(strings)
+        return i
+
+    ids = list(index.tracks)
+    row_of = {tid: r for r, tid in enumerate(ids)}
+    cols = {c: array("I") for c in STRING_COLUMNS}
+    artist_ptr, artist_ids, artist_names = array("I", [0]), array("I"), array("I")
+    for tid in ids:
+        rec = index.tracks[tid]
+        for c, v in zip(STRING_COLUMNS, (rec[0], rec[1], rec[3], rec[4], rec[5], rec[6])):
+            cols[c].append(intern(v))
+        for name in rec[2]:
+            a = artists.get(name)
+            if a is None:
+                a = artists[name] = len(artists)
+                artist_names.append(intern(name))
+            artist_ids.append(a)
+        artist_ptr.append(len(artist_ids))
+
+    genres = sorted(index.genres)
+    words = (len(ids) + 63) // 64
+    bits = array("Q", bytes(8 * words * len(genres)))
+    for g_i, g in enumerate(genres):
+        for tid in index.genres[g]:
+            r = row_of[tid]
+            bits[g_i * words + (r >> 6)] |= 1 << (r & 63)
+
+    queries = list(index.queries)
+    query_ptr, query_rows, exhausted = array("I", [0]), array("I"), bytearray()
+    for q in queries:
+        query_rows.extend(row_of[tid] for tid in index.queries[q]["ids"])
+        query_ptr.append(len(query_rows))
+        exhausted.append(1 if index.queries[q]["exhausted"] else 0)
+
+    blob, str_off = bytearray(), array("I", [0])
+    for s in strings:  # dicts keep insertion order == string id
+        blob += s.encode("utf-8")
+        str_off.append(len(blob))
+
+    sections = [("strings", bytes(blob)), ("str_offsets", _le(str_off))]
+    sections += [(c, _le(cols[c])) for c in STRING_COLUMNS]
+    sections += [
+        ("artist_ptr", _le(artist_ptr)),
+        ("artist_ids", _le(artist_ids)),
+        ("artist_names", _le(artist_names)),
+        ("genre_bits", _le(bits)),
+        ("query_ptr", _le(query_ptr)),
+        ("query_rows", _le(query_rows)),
+        ("exhausted", bytes(exhausted)),
+    ]
+    digest = hashlib.sha1()
+    for _, data in sections:
+        digest.update(data)
+    head = {
+        "market": index.market,
+        "created_at": index.created_at,
+        "version": digest.hexdigest()[:12],
+        "n_tracks": len(ids),
+        "genres": genres,
+        "queries": queries,
+        "sections": {},
+    }
+
+    # header size depends on the offsets it records; reserve generously, then fill in
+    def layout(reserve: int) -> int:
+        off = 12 + reserve
+        off += _pad(off)
+        for name, data in sections:
+            head["sections"][name] = [off, len(data)]
+            off += len(data) + _pad(len(data))
+        return off
+
+    reserve = 4096
+    while True:
+        layout(reserve)
+        raw_head = json.dumps(head, separators=(",", ":")).encode()
+        if len(raw_head) <= reserve:
+            break
+        reserve = len(raw_head) + 1024
+    raw_head = raw_head.ljust(reserve)
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(MAGIC + struct.pack("<I", reserve) + raw_head)
+        f.write(b"\0" * _pad(f.tell()))
+        for _, data in sections:
+            f.write(data)
+            f.write(b"\0" * _pad(len(data)))
+    os.replace(tmp, path)
+    return path
+
+
+def is_track_store(path: Path | str) -> bool:
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def main() -> None:
+    from backend.catalog_index import CatalogIndex, DEFAULT_PATH
+
+    p = argparse.ArgumentParser(description="Convert a JSON catalog snapshot into the columnar mmap format")
+    p.add_argument("--src", type=str, default=str(DEFAULT_PATH))
+    p.add_argument("--out", type=str, default=str(DEFAULT_PATH.with_suffix(".m2p")))
+    args = p.parse_args()
+    out = build(CatalogIndex.load(args.src), args.out)
+    store = TrackStore(out)
+    print(f"Wrote {out}: {store.n_tracks} tracks, {len(store.query_names)} queries, {out.stat().st_size} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+from __future__ import annotations
+import os, re
+from functools import lru_cache
+from typing import Any, Dict, FrozenSet, List, NamedTuple, Tuple
+
+from backend.mood_map import MOOD_PRESETS
+from backend.search import build_queries_from_genres
+
+# --- Vibe Parser ---
+# Rule-based scoring: map free-text to a vibe profile, then to seed genres.
+LEX = {
+    "cozy": {"words": {"fireplace","blanket","candle","warm","cocoa","snow","reading","rain","chai"}, "genres": ["acoustic","singer-songwriter","indie","folk","chill","lo-fi","piano"]},
+    "focus": {"words": {"study","focus","deep work","flow","concentrate","essay","reading"}, "genres": ["lo-fi","ambient","piano","classical","chill"]},
+    "party": {"words": {"club","dancefloor","party","friday","dj","festival","rave", "dance"}, "genres": ["dance","edm","house","pop","hip-hop"]},
+    "hype": {"words": {"gym","workout","max","pr","anthem","hype","run"}, "genres": ["edm","electro","dance","hip-hop","pop"]},
+    "sad": {"words": {"heartbreak","alone","cry","melancholy","nostalgic","blue", "sad"}, "genres": ["indie","indie-pop","singer-songwriter","alt-rock","pop"]},
+    "romantic": {"words": {"date","romantic","kiss","slow","candlelight","valentine", "love"}, "genres": ["r-n-b","soul","latin","pop","indie-pop"]},
+    "dark": {"words": {"noir","brooding","night","storm","industrial"}, "genres": ["industrial","electro","rock","trap","alt-rock"]},
+    "rage": {"words": {"rage","sprint","angry","angry gym","metal","mosh", "rock", "hard rock"}, "genres": ["rock","metal","trap","alt-rock","edm"]},
+}
+
+DEFAULT_GENRES = ["pop","indie","singer-songwriter","chill"]
+
+# Shortcut seasonal/scene cues, checked in order before lexicon scoring.
+SHORTCUTS: List[Tuple[List[str], List[str]]] = [
+    (["fireplace","snow","blanket","cocoa","candle","knit","sweater","winter"], ["acoustic","singer-songwriter","indie","folk","chill","piano"]),
+    (["rain","rainy","monsoon"], ["lo-fi","indie","chill","ambient","piano"]),
+    (["gym","lift","sprint","pr","max","preworkout"], ["edm","electro","hip-hop","dance","pop"]),
+    (["club","night out","party","rave","dj"], ["dance","edm","house","pop","hip-hop"]),
+]
+
+
+class PhraseMatcher:
+    """Every phrase occurring anywhere in a text, found in one left-to-right pass.
+
+    The phrases are folded into a trie and the trie is compiled into a single
+    regex (one branch per distinct next character, greedy optional tails), so
+    the regex engine walks the automaton in C instead of a Python loop per
+    character. At each position it yields the longest phrase starting there;
+    every shorter phrase starting at the same position is a prefix of that
+    one, so those are precomputed. The result is exactly the set of phrases
+    for which `phrase in text` is true, overlaps included.
+    """
+
+    def __init__(self, phrases):
+        phrases = sorted({p for p in phrases if p})
+        trie: Dict[str, dict] = {}
+        for p in phrases:
+            node = trie
+            for ch in p:
+                node = node.setdefault(ch, {})
+            node[""] = {}  # end-of-phrase marker
+        body = self._compile(trie) if trie else "(?!)"
+        self._re = re.compile(body)
+        pset = set(phrases)
+        self._prefixes: Dict[str, FrozenSet[str]] = {
+            p: frozenset(p[:i] for i in range(1, len(p) + 1) if p[:i] in pset) for p in phrases
+        }
+
+    @classmethod
+    def _compile(cls, node: dict) -> str:
+        branches = [re.escape(ch) + cls._compile(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        # a phrase may end here: the rest is optional, greedy so the longest wins
+        return f"(?:{body})?" if "" in node else body
+
+    def find(self, text: str) -> set:
+        found: set = set()
+        search, prefixes = self._re.search, self._prefixes
+        m = search(text)
+        while m is not None:
+            found |= prefixes[m.group()]
+            m = search(text, m.start() + 1)
+        return found
+
+
+# built once at import from every cue and lexicon word
+_MATCHER = PhraseMatcher(
+    [w for cues, _ in SHORTCUTS for w in cues] + [w for conf in LEX.values() for w in conf["words"]]
+)
+_SHORTCUT_SETS = [(frozenset(cues), genres) for cues, genres in SHORTCUTS]
+_LEX_SETS = [(label, frozenset(conf["words"])) for label, conf in LEX.items()]
+
+
+def parse_vibe(text: str) -> List[str]:
+    """Return a list of seed genres inferred from free-text."""
+    s = (text or "").lower()
+    found = _MATCHER.find(s)
+
+    # Shortcut seasonal/scene cues
+    for cues, genres in _SHORTCUT_SETS:
+        if found & cues:
+            return genres[:3]
+
+    # Score-based: count lexicon hits
+    scores: Dict[str, int] = {}
+    for label, words in _LEX_SETS:
+        hits = len(found & words)
+        if hits:
+            scores[label] = hits
+    if scores:
+        # pick top label
+        label = max(scores, key=scores.get)
+        return LEX[label]["genres"][:3]
+
+    # Fallback
+    return DEFAULT_GENRES[:3]
+
+
+# --- Normalization + memo ---
+# Free-text vibes repeat a lot ("rainy day", "gym"). Normalize them to a
+# canonical key, then memoize key -> (seed genres, prebuilt search queries).
+VIBE_MEMO_SIZE = int(os.getenv("VIBE_MEMO_SIZE", "4096"))
+
+_KEY_SEP = "|"  # in no phrase, so no phrase can span two parts of a key
+
+
+def normalize_vibe(text: str) -> str:
+    """Canonical form of a vibe: the lexicon phrases it contains, sorted and joined.
+
+    `parse_vibe` looks at nothing else, and the phrases found in a key are
+    exactly the ones found in the text, so `parse_vibe(normalize_vibe(t)) ==
+    parse_vibe(t)`. Case, word order, repeats and filler words all fold
+    away; punctuation inside a phrase does not ("night-out" is not
+    "night out"), just as in `parse_vibe`.
+    """
+    return _KEY_SEP.join(sorted(_MATCHER.find((text or "").lower())))
+
+
+class MoodResolution(NamedTuple):
+    seed_genres: Tuple[str, ...]
+    queries: Tuple[str, ...]
+    parsed_from: str  # "preset" or "vibe"
+
+
+@lru_cache(maxsize=VIBE_MEMO_SIZE)
+def _resolve_normalized(norm: str) -> MoodResolution:
+    genres = tuple(parse_vibe(norm))
+    return MoodResolution(genres, tuple(build_queries_from_genres(list(genres))), "vibe")
+
+
+@lru_cache(maxsize=VIBE_MEMO_SIZE)
+def resolve_mood(key: str) -> MoodResolution:
+    """Preset lookup, else memoized vibe parse; shared by both recommend routes.
+
+    The outer cache is keyed on the raw (stripped, lower-cased) mood so exact
+    repeats skip normalization too; spelling variants meet in the inner one.
+    """
+    preset = MOOD_PRESETS.get(key)
+    if preset:
+        genres = tuple(preset.get("seed_genres", []))
+        return MoodResolution(genres, tuple(build_queries_from_genres(list(genres))), "preset")
+    return _resolve_normalized(normalize_vibe(key))
+
+
+def vibe_memo_stats() -> Dict[str, Any]:
+    out = {}
+    for name, fn in (("raw", resolve_mood), ("normalized", _resolve_normalized)):
+        info = fn.cache_info()
+        total = info.hits + info.misses
+        out[name] = {
+            "hits": info.hits,
+            "misses": info.misses,
+            "size": info.currsize,
+            "maxsize": info.maxsize,
+            "hit_rate": info.hits / total if total else 0.0,
+        }
+    return out
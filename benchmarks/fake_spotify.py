@@ -0,0 +1,185 @@
+"""Local stand-in for Spotify's accounts and v1/search endpoints.
+
+Serves deterministic track pages so tests and load runs need no credentials
+or network. Latency, random 5xx errors and 429s are configurable, and every
+call is counted so callers can assert on upstream traffic.
+
+    with FakeSpotify(latency_s=0.02) as fake:
+        os.environ["SPOTIFY_API_BASE"] = fake.api_base
+        os.environ["SPOTIFY_ACCOUNTS_URL"] = fake.accounts_url
+
+It also runs standalone, for a backend started in another process;
+`GET /stats` returns the call counters:
+
+    python -m benchmarks.fake_spotify --port 8765 --latency 0.02 --rate-limit-every 50
+"""
+from __future__ import annotations
+import argparse, json, random, re, threading, time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+GENRE_RE = re.compile(r'genre:"([^"]+)"')
+MAX_RESULTS = 1000  # Spotify stops paging search results here
+
+
+def fake_track(genre: str, i: int) -> dict:
+    return {
+        "id": f"{genre}-{i}",
+        "name": f"{genre.title()} Song {i}",
+        "artists": [{"name": f"{genre.title()} Artist {i % 7}"}],
+        "album": {"name": f"{genre.title()} Album {i // 10}", "images": [{"url": f"https://img.example/{genre}/{i}.jpg"}]},
+        "preview_url": None,
+        "external_urls": {"spotify": f"https://open.spotify.com/track/{genre}-{i}"},
+    }
+
+
+def search_items(q: str, offset: int, limit: int) -> List[dict]:
+    """`genre:"x"` pages through x; an OR query interleaves its genres."""
+    genres = GENRE_RE.findall(q) or ["pop"]
+    items = []
+    for i in range(offset, min(offset + limit, MAX_RESULTS)):
+        g = genres[i % len(genres)]
+        items.append(fake_track(g, i // len(genres)))
+    return items
+
+
+class FakeSpotify:
+    def __init__(
+        self,
+        latency_s: float = 0.0,
+        error_rate: float = 0.0,
+        rate_limit_every: int = 0,
+        retry_after: float = 1.0,
+        scripted_statuses: Optional[List[int]] = None,
+        token_ttl: int = 3600,
+        seed: int = 0,
+        port: int = 0,
+    ):
+        self.latency_s = latency_s
+        self.error_rate = error_rate
+        self.rate_limit_every = rate_limit_every  # every Nth search answers 429
+        self.retry_after = retry_after
+        self.scripted_statuses = list(scripted_statuses or [])  # consumed before anything else
+        self.token_ttl = token_ttl
+        self.port = port  # 0 picks a free one
+        self.calls: Counter = Counter()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def api_base(self) -> str:
+        return f"{self.base_url}/v1"
+
+    @property
+    def accounts_url(self) -> str:
+        return f"{self.base_url}/api/token"
+
+    def start(self) -> "FakeSpotify":
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status: int, body: dict, headers: Optional[Dict[str, str]] = None):
+                raw = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(raw)))
+                for k, v in (headers or {}).items():
+                    self.send_header(k, v)
+                self.end_headers()
+                self.wfile.write(raw)
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                if urlparse(self.path).path != "/api/token":
+                    return self._send(404, {"error": "not found"})
+                with fake._lock:
+                    fake.calls["token"] += 1
+                    n = fake.calls["token"]
+                self._send(200, {"access_token": f"fake-token-{n}", "token_type": "Bearer", "expires_in": fake.token_ttl})
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path == "/stats":
+                    with fake._lock:
+                        return self._send(200, {str(k): v for k, v in fake.calls.items()})
+                if url.path != "/v1/search":
+                    return self._send(404, {"error": "not found"})
+                params = {k: v[0] for k, v in parse_qs(url.query).items()}
+                status = fake._next_status()
+                if fake.latency_s:
+                    time.sleep(fake.latency_s)
+                if status == 429:
+                    return self._send(429, {"error": {"status": 429, "message": "rate limited"}},
+                                      {"Retry-After": f"{fake.retry_after:g}"})
+                if status != 200:
+                    return self._send(status, {"error": {"status": status, "message": "upstream error"}})
+                items = search_items(params.get("q", ""), int(params.get("offset", 0)), int(params.get("limit", 20)))
+                self._send(200, {"tracks": {"items": items, "offset": int(params.get("offset", 0)), "total": MAX_RESULTS}})
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", self.port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def _next_status(self) -> int:
+        with self._lock:
+            self.calls["search"] += 1
+            n = self.calls["search"]
+            if self.scripted_statuses:
+                status = self.scripted_statuses.pop(0)
+            elif self.rate_limit_every and n % self.rate_limit_every == 0:
+                status = 429
+            elif self.error_rate and self._rng.random() < self.error_rate:
+                status = 503
+            else:
+                status = 200
+            self.calls[status] += 1
+            return status
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> "FakeSpotify":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def main() -> None:
+    p = argparse.ArgumentParser()
+    p.add_argument("--port", type=int, default=8765)
+    p.add_argument("--latency", type=float, default=0.0, help="seconds added to every search")
+    p.add_argument("--error-rate", type=float, default=0.0, help="share of searches answering 503")
+    p.add_argument("--rate-limit-every", type=int, default=0, help="every Nth search answers 429")
+    p.add_argument("--retry-after", type=float, default=1.0)
+    args = p.parse_args()
+    fake = FakeSpotify(latency_s=args.latency, port=args.port, error_rate=args.error_rate,
+                       rate_limit_every=args.rate_limit_every, retry_after=args.retry_after).start()
+    print(f"SPOTIFY_API_BASE={fake.api_base}\nSPOTIFY_ACCOUNTS_URL={fake.accounts_url}", flush=True)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        fake.stop()
+
+
+if __name__ == "__main__":
+    main()
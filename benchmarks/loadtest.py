@@ -0,0 +1,222 @@
+"""Load test for the recommend routes against a fake Spotify.
+
+    python -m benchmarks.loadtest --rps 20 --duration 15 --latency 0.02
+    python -m benchmarks.loadtest --routes agentic --nocache --error-rate 0.02 --rate-limit-every 40
+    python -m benchmarks.loadtest --max-p99-ms 250 --max-calls 4     # exit 1 past either
+
+By default, the app runs in this process behind httpx's ASGI transport. Its
+upstream is a `FakeSpotify` with the given latency, 503 rate and 429 cadence,
+so no credentials or network are needed. To load a real server instead, start
+`python -m benchmarks.fake_spotify`, run uvicorn with the SPOTIFY_API_BASE and
+SPOTIFY_ACCOUNTS_URL it prints, then pass `--url` and `--fake-url`.
+
+Requests go out open-loop at `--rps`. Each is sent in its time slot whether
+or not earlier ones have finished, and its latency is counted from that
+slot. A server that falls behind therefore shows up as a longer tail, not as
+fewer requests. Moods and variants rotate across requests, so repeats hit
+the response caches the way real traffic does; `--nocache` bypasses them.
+
+Each route runs in its own phase. The report gives p50/p95/p99/max latency,
+errors by status, and upstream search and token calls per request, taken
+from the fake's counters.
+"""
+from __future__ import annotations
+import argparse, asyncio, json, math, os, sys, time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+from benchmarks.fake_spotify import FakeSpotify
+
+ROUTES = {"recommend": "/api/recommend", "agentic": "/api/agentic/recommend"}
+MOODS = ["happy", "chill", "focus", "workout", "sad", "rainy day", "late night drive", "sunday morning coffee"]
+
+Counters = Callable[[], Awaitable[Dict[str, int]]]
+
+
+def percentile(sorted_ms: List[float], p: float) -> Optional[float]:
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_ms:
+        return None
+    return sorted_ms[max(0, math.ceil(p / 100 * len(sorted_ms)) - 1)]
+
+
+@dataclass
+class RouteReport:
+    route: str
+    sent: int
+    seconds: float
+    latencies_ms: List[float] = field(default_factory=list, repr=False)
+    errors: Counter = field(default_factory=Counter)
+    upstream: Dict[str, int] = field(default_factory=dict)  # search/token calls made during the phase
+
+    def summary(self) -> Dict[str, Any]:
+        lat = sorted(self.latencies_ms)
+        r = lambda v: None if v is None else round(v, 2)
+        out = {
+            "route": self.route,
+            "requests": self.sent,
+            "errors": dict(self.errors),
+            "rps": round(self.sent / self.seconds, 1) if self.seconds else None,
+            "p50_ms": r(percentile(lat, 50)),
+            "p95_ms": r(percentile(lat, 95)),
+            "p99_ms": r(percentile(lat, 99)),
+            "max_ms": r(lat[-1] if lat else None),
+        }
+        if self.upstream:
+            out["search_calls_per_request"] = round(self.upstream.get("search", 0) / max(self.sent, 1), 3)
+            out["token_calls"] = self.upstream.get("token", 0)
+            out["upstream_429"] = self.upstream.get("429", 0)
+        return out
+
+
+def request_params(route: str, i: int, moods: List[str], variants: int, limit: int, nocache: bool) -> Dict[str, Any]:
+    """The i-th request of a phase: moods rotate fastest, then variants."""
+    params = {"mood": moods[i % len(moods)], "variant": (i // len(moods)) % variants, "limit": limit}
+    if route == "agentic":
+        params["seed"] = 42
+    if nocache:
+        params["nocache"] = "true"
+    return params
+
+
+async def drive(client: httpx.AsyncClient, route: str, rps: float, duration: float,
+                params_for: Callable[[int], Dict[str, Any]], counters: Counters | None = None) -> RouteReport:
+    """One open-loop phase against `route`; see the module docstring."""
+    n = max(1, int(rps * duration))
+    loop = asyncio.get_running_loop()
+    report = RouteReport(route=route, sent=n, seconds=0.0)
+    before = await counters() if counters else {}
+    t0 = loop.time()
+
+    async def one(i: int) -> None:
+        slot = t0 + i / rps
+        await asyncio.sleep(max(0.0, slot - loop.time()))
+        try:
+            status: Any = (await client.get(ROUTES[route], params=params_for(i))).status_code
+        except httpx.HTTPError as e:
+            status = type(e).__name__
+        report.latencies_ms.append((loop.time() - slot) * 1000)
+        if status != 200:
+            report.errors[str(status)] += 1
+
+    await asyncio.gather(*(one(i) for i in range(n)))
+    report.seconds = loop.time() - t0
+    if counters:
+        after = await counters()
+        report.upstream = {k: after.get(k, 0) - before.get(k, 0) for k in ("search", "token", "429")}
+    return report
+
+
+def check(summaries: List[Dict[str, Any]], max_p99_ms: float | None, max_calls: float | None,
+          max_error_rate: float) -> List[str]:
+    """Threshold violations, one line each; empty when the run passes."""
+    out = []
+    for s in summaries:
+        if max_p99_ms is not None and s["p99_ms"] is not None and s["p99_ms"] > max_p99_ms:
+            out.append(f"{s['route']}: p99 {s['p99_ms']} ms > {max_p99_ms}")
+        calls = s.get("search_calls_per_request")
+        if max_calls is not None and calls is not None and calls > max_calls:
+            out.append(f"{s['route']}: {calls} search calls/request > {max_calls}")
+        rate = sum(s["errors"].values()) / max(s["requests"], 1)
+        if rate > max_error_rate:
+            out.append(f"{s['route']}: error rate {rate:.3f} > {max_error_rate}")
+    return out
+
+
+def _local_counters(fake: FakeSpotify) -> Counters:
+    async def read() -> Dict[str, int]:
+        return {str(k): v for k, v in fake.calls.items()}
+    return read
+
+
+def _remote_counters(fake_url: str) -> Counters:
+    async def read() -> Dict[str, int]:
+        async with httpx.AsyncClient() as c:
+            return (await c.get(f"{fake_url.rstrip('/')}/stats")).json()
+    return read
+
+
+async def run(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    fake = None
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=args.timeout)
+        counters = _remote_counters(args.fake_url) if args.fake_url else None
+    else:
+        fake = FakeSpotify(latency_s=args.latency, error_rate=args.error_rate,
+                           rate_limit_every=args.rate_limit_every, retry_after=args.retry_after).start()
+        # read at import by backend.spotify_client, so set before the app loads
+        os.environ["SPOTIFY_API_BASE"] = fake.api_base
+        os.environ["SPOTIFY_ACCOUNTS_URL"] = fake.accounts_url
+        os.environ.setdefault("SPOTIFY_CLIENT_ID", "loadtest")
+        os.environ.setdefault("SPOTIFY_CLIENT_SECRET", "loadtest")
+        from backend.app import app
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://app", timeout=args.timeout)
+        counters = _local_counters(fake)
+
+    moods = [m.strip() for m in args.moods.split(",") if m.strip()]
+    summaries = []
+    try:
+        for route in args.routes.split(","):
+            params_for = lambda i, route=route: request_params(route, i, moods, args.variants, args.limit, args.nocache)
+            report = await drive(client, route, args.rps, args.duration, params_for, counters)
+            summaries.append(report.summary())
+    finally:
+        await client.aclose()
+        if fake is not None:
+            from backend.spotify_client import shutdown_http
+            from agentic_playlist.tracing.tracer import shutdown_writer
+            await shutdown_http()
+            shutdown_writer()
+            fake.stop()
+    return summaries
+
+
+def main() -> None:
+    p = argparse.ArgumentParser()
+    p.add_argument("--routes", default="recommend,agentic", help=f"comma-separated, of {sorted(ROUTES)}")
+    p.add_argument("--rps", type=float, default=20.0)
+    p.add_argument("--duration", type=float, default=10.0, help="seconds per route")
+    p.add_argument("--moods", default=",".join(MOODS))
+    p.add_argument("--variants", type=int, default=4)
+    p.add_argument("--limit", type=int, default=10)
+    p.add_argument("--nocache", action="store_true")
+    p.add_argument("--timeout", type=float, default=30.0)
+    p.add_argument("--latency", type=float, default=0.02, help="fake upstream seconds per search")
+    p.add_argument("--error-rate", type=float, default=0.0)
+    p.add_argument("--rate-limit-every", type=int, default=0)
+    p.add_argument("--retry-after", type=float, default=1.0)
+    p.add_argument("--url", help="load this running server instead of an in-process app")
+    p.add_argument("--fake-url", help="base URL of the standalone fake the --url server talks to")
+    p.add_argument("--json", action="store_true", help="print the summaries as JSON")
+    p.add_argument("--max-p99-ms", type=float)
+    p.add_argument("--max-calls", type=float, help="search calls per request")
+    p.add_argument("--max-error-rate", type=float, default=0.01)
+    args = p.parse_args()
+    if (bad := [r for r in args.routes.split(",") if r not in ROUTES]):
+        p.error(f"unknown route(s) {bad}")
+
+    t0 = time.perf_counter()
+    summaries = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(summaries, indent=2))
+    else:
+        print(f"{'route':<11}{'reqs':>6}{'rps':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}"
+              f"{'calls/req':>11}{'errors':>8}")
+        for s in summaries:
+            fmt = lambda v: "-" if v is None else f"{v:.1f}"
+            calls = s.get("search_calls_per_request")
+            print(f"{s['route']:<11}{s['requests']:>6}{fmt(s['rps']):>7}{fmt(s['p50_ms']):>9}{fmt(s['p95_ms']):>9}"
+                  f"{fmt(s['p99_ms']):>9}{fmt(s['max_ms']):>9}{'-' if calls is None else calls:>11}"
+                  f"{sum(s['errors'].values()):>8}")
+        print(f"total {time.perf_counter() - t0:.1f}s")
+    failures = check(summaries, args.max_p99_ms, args.max_calls, args.max_error_rate)
+    for line in failures:
+        print(f"FAIL {line}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Micro-benchmarks for the per-request hot paths, run with pytest-benchmark.
+
+    pip install pytest-benchmark
+    python -m pytest benchmarks/micro.py --benchmark-only
+    python -m pytest benchmarks/micro.py --benchmark-autosave          # keep a baseline
+    python -m pytest benchmarks/micro.py --benchmark-compare --benchmark-compare-fail=mean:15%
+
+The file is not named test_*.py, so the regular test run does not pick it up.
+Inputs are seeded, and sized like a real request (a 30-track candidate list).
+Where one exists, the columnar filter path is also timed at its own scale.
+"""
+from __future__ import annotations
+import random
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from agentic_playlist.agents.compliance import Compliance
+from agentic_playlist.agents.critic import Critic
+from agentic_playlist.agents.policy import Policy
+from agentic_playlist.tools.columnar import TrackColumns, review_rows
+from agentic_playlist.tools.filters import dedupe_by_artist, ensure_diversity
+from agentic_playlist.tracing.tracer import Tracer, TraceWriter
+from backend.vibe import parse_vibe
+
+GENRES = ["pop", "rock", "jazz", "indie", "lo-fi", "house", "soul", None]
+PROMPTS = {
+    "short": "rainy day",
+    "long": "late night drive through the city with the windows down, a bit melancholic but hopeful, "
+            "think synthwave and dream pop, nothing too loud, maybe some lo-fi beats to study to " * 3,
+}
+
+
+def tracks(n: int, seed: int = 0):
+    rng = random.Random(seed)
+    artists = max(1, n // 2)
+    return [{"id": str(i), "title": f"Song {i}", "artist": f"Artist {rng.randrange(artists)}",
+             "genre": rng.choice(GENRES), "market": "US"} for i in range(n)]
+
+
+@pytest.fixture
+def tracer(tmp_path):
+    writer = TraceWriter(max_queue=10**6, batch=4096)
+    yield Tracer(tmp_path / "bench.jsonl", writer=writer)
+    writer.close()
+
+
+@pytest.mark.parametrize("prompt", sorted(PROMPTS))
+def test_parse_vibe(benchmark, prompt):
+    assert benchmark(parse_vibe, PROMPTS[prompt])
+
+
+def test_filters_list(benchmark, tracer):
+    pool = tracks(30)
+    assert benchmark(lambda: ensure_diversity(dedupe_by_artist(pool, tracer), tracer))
+
+
+def test_filters_columnar_3000(benchmark, tracer):
+    pool = tracks(3000)
+    assert len(benchmark(lambda: review_rows(TrackColumns.from_tracks(pool), tracer)))
+
+
+def test_critic_review(benchmark, tracer):
+    pool = tracks(30)
+    # a fresh critic per round: its call budget would otherwise short-circuit
+    assert benchmark(lambda: Critic(max_calls=1, tracer=tracer).review(pool))
+
+
+def test_compliance_enforce(benchmark, tracer):
+    pool = tracks(30)
+    policy = Policy([f"Artist {i}" for i in range(0, 15, 3)], ["US"])
+    assert benchmark(lambda: Compliance(max_calls=1, tracer=tracer, policy=policy).enforce(pool))
+
+
+@pytest.mark.parametrize("mode", ["buffered", "direct", "sampled_out"])
+def test_tracer_span(benchmark, tmp_path, mode):
+    writer = TraceWriter(max_queue=10**7, batch=4096) if mode == "buffered" else None
+    t = Tracer(tmp_path / "span.jsonl", writer=writer, sample_rate=0.0 if mode == "sampled_out" else 1.0)
+    details = {"artist": "Artist 1", "genre": "pop"}
+    benchmark(t.span, agent="critic", tool="filters.dedupe", details=details, status="drop")
+    if writer is not None:
+        writer.close()
@@ -0,0 +1,67 @@
+"""Search pagination: the old fixed offsets vs the adaptive planner.
+
+    python -m benchmarks.pagination --limit 50 --variants 20
+
+Runs every preset mood over `--variants` shuffle clicks against
+`fake_spotify.search_items` (OR queries overlap their genres' own results)
+and reports upstream calls, tracks delivered and calls per delivered track.
+The old scheme asks each query for one page of at most 20 at
+`base_offset + i * 5`; the planner learns yields as the run goes.
+"""
+from __future__ import annotations
+import argparse, asyncio
+
+from backend.mood_map import MOOD_PRESETS
+from backend.pagination import PagePlan, YieldStats, run_plan
+from backend.search import build_queries_from_genres, fetch_pages, merge_pages
+from benchmarks.fake_spotify import search_items
+
+
+def counting_get():
+    calls = [0]
+
+    async def get(path, params=None, cache=True):
+        calls[0] += 1
+        return {"tracks": {"items": search_items(params["q"], params["offset"], params["limit"])}}
+
+    return get, calls
+
+
+def old_params(queries, limit, variant):
+    per_call = min(max(limit, 1), 20)
+    base_offset = (variant * 7) % 120
+    return [{"q": q, "type": "track", "limit": per_call, "offset": base_offset + i * 5, "market": "US"}
+            for i, q in enumerate(queries)]
+
+
+async def run(limit: int, variants: int):
+    moods = [build_queries_from_genres(p.get("seed_genres", [])) for p in MOOD_PRESETS.values()]
+    old_get, old_calls = counting_get()
+    new_get, new_calls = counting_get()
+    stats = YieldStats()
+    old_tracks = new_tracks = short = 0
+    for v in range(variants):
+        for queries in moods:
+            r = v % len(queries)
+            queries = queries[r:] + queries[:r]
+            old = merge_pages(await fetch_pages(old_get, old_params(queries, limit, v), cache=False), limit)
+            plan = await run_plan(new_get, PagePlan(queries, limit, v, stats=stats), cache=False)
+            old_tracks += len(old)
+            new_tracks += len(plan.tracks)
+            short += len(old) < limit
+    return old_calls[0], old_tracks, new_calls[0], new_tracks, short
+
+
+def main() -> None:
+    p = argparse.ArgumentParser()
+    p.add_argument("--limit", type=int, default=50)
+    p.add_argument("--variants", type=int, default=20)
+    args = p.parse_args()
+    old_calls, old_tracks, new_calls, new_tracks, short = asyncio.run(run(args.limit, args.variants))
+    print(f"{'scheme':<10}{'calls':>8}{'tracks':>8}{'calls/track':>13}")
+    print(f"{'fixed':<10}{old_calls:>8}{old_tracks:>8}{old_calls / old_tracks:>13.3f}   ({short} underfilled)")
+    print(f"{'planner':<10}{new_calls:>8}{new_tracks:>8}{new_calls / new_tracks:>13.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Compliance policy: compiled per-artist index vs the old joined-string set.
+
+    python -m benchmarks.policy --deny 2000000 --tracks 100000
+
+Builds a synthetic denylist, then reports build time, memory held by the
+index (tracemalloc) and per-track check latency for the plain and hashed
+layouts, next to the old `artist in set(denylist)` check on the joined
+credit (which misses multi-artist tracks entirely).
+"""
+from __future__ import annotations
+import argparse, random, time, tracemalloc
+
+from agentic_playlist.agents.policy import Policy
+
+
+def build(deny, hashed: bool):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    policy = Policy(deny, ["US"], hashed=hashed)
+    build_s = time.perf_counter() - t0
+    held, _ = tracemalloc.get_traced_memory()  # what the policy keeps, not build garbage
+    tracemalloc.stop()
+    return policy, build_s, held
+
+
+def main() -> None:
+    p = argparse.ArgumentParser()
+    p.add_argument("--deny", type=int, default=1_000_000)
+    p.add_argument("--tracks", type=int, default=100_000)
+    args = p.parse_args()
+    rng = random.Random(0)
+
+    deny = [f"Denied Artist {i}" for i in range(args.deny)]
+    tracks = []
+    for i in range(args.tracks):
+        names = [f"Artist {rng.randrange(10**9)}" for _ in range(rng.randint(1, 3))]
+        if rng.random() < 0.05:
+            names.append(rng.choice(deny))
+        tracks.append({"artist": ", ".join(names), "artists": names, "region": "US"})
+
+    old = set(deny)
+    t0 = time.perf_counter()
+    old_blocked = sum(1 for t in tracks if t["artist"] in old)
+    old_us = (time.perf_counter() - t0) / len(tracks) * 1e6
+    print(f"{'layout':<10}{'build s':>10}{'index MB':>10}{'us/track':>10}{'blocked':>10}")
+    print(f"{'old':<10}{'-':>10}{'-':>10}{old_us:>10.2f}{old_blocked:>10}")
+
+    for hashed in (False, True):
+        policy, build_s, held = build(deny, hashed)
+        t0 = time.perf_counter()
+        blocked = sum(1 for t in tracks if policy.check(t) is not None)
+        us = (time.perf_counter() - t0) / len(tracks) * 1e6
+        name = "hashed" if hashed else "set"
+        print(f"{name:<10}{build_s:>10.2f}{held / 2**20:>10.1f}{us:>10.2f}{blocked:>10}")
+
+
+if __name__ == "__main__":
+    main()
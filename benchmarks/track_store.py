@@ -0,0 +1,77 @@
+"""Cold-open time and RSS: JSON catalog index vs the mmapped columnar store.
+
+    python -m benchmarks.track_store --tracks 500000
+
+Builds a synthetic catalog, writes it in both formats, then opens each one
+in a fresh interpreter and reports open time, RSS growth and page latency.
+"""
+from __future__ import annotations
+import argparse, json, subprocess, sys, tempfile, time
+from pathlib import Path
+
+from backend.catalog_index import CatalogIndex, compact
+from backend.track_store import build
+from benchmarks.fake_spotify import fake_track
+
+PROBE = r"""
+import json, sys, time
+def rss_kb():
+    for line in open("/proc/self/status"):
+        if line.startswith("VmRSS:"):
+            return int(line.split()[1])
+    return 0
+from backend.catalog_index import load_catalog
+before = rss_kb()
+t0 = time.perf_counter()
+index = load_catalog(sys.argv[1])
+open_s = time.perf_counter() - t0
+params = {"q": sys.argv[2], "offset": 40, "limit": 20, "type": "track", "market": "US"}
+t0 = time.perf_counter()
+for _ in range(1000):
+    index.page(params)
+page_us = (time.perf_counter() - t0) * 1000
+print(json.dumps({"open_ms": open_s * 1000, "rss_mb": (rss_kb() - before) / 1024, "page_us": page_us}))
+"""
+
+
+def synthetic(n_tracks: int, n_genres: int, per_query: int) -> CatalogIndex:
+    tracks, queries = {}, {}
+    genres = [f"g{i}" for i in range(n_genres)]
+    per_genre = n_tracks // n_genres
+    for g in genres:
+        ids = []
+        for i in range(per_genre):
+            t = fake_track(g, i)
+            tracks[t["id"]] = compact(t)
+            ids.append(t["id"])
+        queries[f'genre:"{g}"'] = {"ids": ids[:per_query], "exhausted": len(ids) <= per_query}
+    return CatalogIndex(tracks, queries, created_at=time.time())
+
+
+def probe(path: Path, query: str) -> dict:
+    out = subprocess.run([sys.executable, "-c", PROBE, str(path), query], check=True, capture_output=True, text=True)
+    return json.loads(out.stdout)
+
+
+def main() -> None:
+    p = argparse.ArgumentParser()
+    p.add_argument("--tracks", type=int, default=200_000)
+    p.add_argument("--genres", type=int, default=100)
+    p.add_argument("--per-query", type=int, default=1000)
+    args = p.parse_args()
+
+    index = synthetic(args.tracks, args.genres, args.per_query)
+    with tempfile.TemporaryDirectory() as d:
+        js, col = Path(d) / "catalog.json", Path(d) / "catalog.m2p"
+        index.save(js)
+        build(index, col)
+        del index
+        print(f"{'format':<10}{'size MB':>10}{'open ms':>10}{'RSS MB':>10}{'page us':>10}")
+        for name, path in (("json", js), ("columnar", col)):
+            r = probe(path, 'genre:"g0"')
+            size = path.stat().st_size / 2**20
+            print(f"{name:<10}{size:>10.1f}{r['open_ms']:>10.1f}{r['rss_mb']:>10.1f}{r['page_us']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
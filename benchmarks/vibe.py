@@ -0,0 +1,81 @@
+"""parse_vibe: compiled matcher vs the old per-word substring scan.
+
+    python -m benchmarks.vibe --phrases 5000 --words 400
+
+Times both on long prompts, first with the shipped lexicon and then with a
+synthetic one grown to `--phrases` entries.
+"""
+from __future__ import annotations
+import argparse, random, string, time
+from typing import Dict, List
+
+from backend.vibe import LEX, SHORTCUTS, PhraseMatcher, parse_vibe
+
+
+def scan_parse(text: str, lex: Dict[str, set]) -> str | None:
+    """Old algorithm shape: one `in` scan per word per label."""
+    s = text.lower()
+    for shortcut, _ in SHORTCUTS:
+        if any(w in s for w in shortcut):
+            return "shortcut"
+    scores = {label: sum(1 for w in words if w in s) for label, words in lex.items()}
+    scores = {k: v for k, v in scores.items() if v}
+    return max(scores, key=scores.get) if scores else None
+
+
+def compiled_parse(text: str, matcher: PhraseMatcher, lex: Dict[str, frozenset]) -> str | None:
+    found = matcher.find(text.lower())
+    for shortcut, _ in SHORTCUTS:
+        if found.intersection(shortcut):
+            return "shortcut"
+    scores = {label: len(found & words) for label, words in lex.items()}
+    scores = {k: v for k, v in scores.items() if v}
+    return max(scores, key=scores.get) if scores else None
+
+
+def bench(fn, texts: List[str], repeat: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        for t in texts:
+            fn(t)
+    return (time.perf_counter() - t0) / (repeat * len(texts)) * 1e6
+
+
+def main() -> None:
+    p = argparse.ArgumentParser()
+    p.add_argument("--phrases", type=int, default=5000)
+    p.add_argument("--words", type=int, default=400, help="words per prompt")
+    p.add_argument("--repeat", type=int, default=20)
+    args = p.parse_args()
+    rng = random.Random(0)
+
+    vocab = [w for conf in LEX.values() for w in conf["words"]]
+    cues = [w for c, _ in SHORTCUTS for w in c]
+
+    def word() -> str:
+        # filler must not contain a cue ("pr", "dj", ...) or the old scan exits early
+        while True:
+            w = "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 9)))
+            if not any(c in w for c in cues + vocab):
+                return w
+
+    lex_words = [w for w in vocab if w not in cues]
+    texts = [" ".join(rng.choice(lex_words) if rng.random() < 0.02 else word() for _ in range(args.words)) for _ in range(20)]
+
+    print(f"prompt length ~{sum(map(len, texts)) // len(texts)} chars")
+    t_old = bench(lambda t: scan_parse(t, {k: v["words"] for k, v in LEX.items()}), texts, args.repeat)
+    t_new = bench(parse_vibe, texts, args.repeat)
+    print(f"shipped lexicon ({len(vocab)} words): scan {t_old:8.1f} us   compiled {t_new:8.1f} us")
+
+    big = {f"label{i}": {word()[:rng.randint(4, 6)] for _ in range(args.phrases // 50)} for i in range(50)}
+    t0 = time.perf_counter()
+    matcher = PhraseMatcher([w for ws in big.values() for w in ws] + cues)
+    build_ms = (time.perf_counter() - t0) * 1000
+    frozen = {k: frozenset(v) for k, v in big.items()}
+    t_old = bench(lambda t: scan_parse(t, big), texts, max(1, args.repeat // 4))
+    t_new = bench(lambda t: compiled_parse(t, matcher, frozen), texts, args.repeat)
+    print(f"grown lexicon ({args.phrases} phrases): scan {t_old:8.1f} us   compiled {t_new:8.1f} us   (build {build_ms:.0f} ms)")
+
+
+if __name__ == "__main__":
+    main()